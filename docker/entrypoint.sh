@@ -30,10 +30,20 @@ case "$1" in
     python manage.py collectstatic --no-input
     python manage.py loaddata contracttypes operationprogramstatuses operationprogramtypes groups grouppermissions changeoprequeststatuses changeopprocessstatuses organizations users
 
-    gunicorn --chdir opct --access-logfile - --bind :8000 opct.wsgi:application -t 1200
+    # gunicorn workers write metrics to this directory, /metrics adds them up. Values of previous runs are removed
+    export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+    gunicorn -c opct/gunicorn.conf.py --chdir opct --access-logfile - --bind :8000 opct.wsgi:application -t 1200
   ;;
   worker)
     echo "starting worker"
-    python manage.py rqworker email_sender --worker-class rqworkers.opctWorker.OpctWorker
+    # first deadline scan, every scan schedules the next one
+    python manage.py scandeadlines
+    # old job executions are purged daily the same way
+    python manage.py purgejobexecutions
+    # one worker for each entry of RQ_WORKER_QUEUES, jobs left in old queues are moved first
+    python manage.py runworkers
   ;;
 esac
\ No newline at end of file
@@ -0,0 +1,7 @@
+# given to gunicorn with -c, the default ./gunicorn.conf.py is looked up before --chdir is applied
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # live gauges of dead workers are removed, their counters and histograms are kept
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,36 @@
+from prometheus_client import Counter, Histogram
+
+# metrics of web processes. Under gunicorn every worker writes its values to files in PROMETHEUS_MULTIPROC_DIR
+# and they are added up when they are scraped, metrics of rq workers are read from Redis (rqworkers.metrics)
+
+MEGABYTE = 1024 * 1024
+
+REQUEST_DURATION = Histogram("opct_http_request_duration_seconds", "Time to answer a request",
+                             ["view", "method", "status"])
+REQUEST_QUERIES = Histogram("opct_http_request_queries", "SQL queries run by a request", ["view"],
+                            buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, float("inf")))
+UPLOAD_SIZE = Histogram("opct_upload_size_bytes", "Bytes received by an upload", ["kind"],
+                        buckets=(64 * 1024, MEGABYTE, 5 * MEGABYTE, 10 * MEGABYTE, 50 * MEGABYTE, 100 * MEGABYTE,
+                                 500 * MEGABYTE, float("inf")))
+UPLOAD_DURATION = Histogram("opct_upload_duration_seconds", "Time to receive an upload", ["kind"],
+                            buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float("inf")))
+IMPORT_ROWS = Counter("opct_import_rows", "Rows read by file imports", ["kind"])
+IMPORT_ROWS_PER_SECOND = Histogram("opct_import_rows_per_second", "Rows read per second by a file import", ["kind"],
+                                   buckets=(10, 100, 500, 1000, 5000, 10000, 50000, 100000, float("inf")))
+
+
+def observe_request(view_name, method, status, duration, query_count):
+    view_name = view_name or "unknown"
+    REQUEST_DURATION.labels(view_name, method, status).observe(duration)
+    REQUEST_QUERIES.labels(view_name).observe(query_count)
+
+
+def observe_upload(kind, size, duration):
+    UPLOAD_SIZE.labels(kind).observe(size)
+    UPLOAD_DURATION.labels(kind).observe(duration)
+
+
+def observe_import(kind, rows, duration):
+    IMPORT_ROWS.labels(kind).inc(rows)
+    if duration > 0:
+        IMPORT_ROWS_PER_SECOND.labels(kind).observe(rows / duration)
@@ -0,0 +1,187 @@
+import cProfile
+import collections
+import contextlib
+import contextvars
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+from opct.metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+# timings of request handled in current thread
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """Queries run by a request and seconds it spent in database and serializers"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0
+        self.serializer_time = 0
+        self.serializing = False
+        # same statement run many times with different parameters usually means a query inside a loop
+        self.statements = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.query_count += 1
+            self.statements[sql] += 1
+
+    def get_header(self, total_time):
+        return 'db;dur={0:.1f};desc="{1} queries", serializer;dur={2:.1f}, total;dur={3:.1f}'.format(
+            self.query_time * 1000, self.query_count, self.serializer_time * 1000, total_time * 1000)
+
+    def get_repeated_statements(self):
+        return [(count, sql) for sql, count in self.statements.most_common(settings.SLOW_REQUEST_STATEMENTS)
+                if count > 1]
+
+
+def timed_data(data):
+    """Serializer data property that adds time spent to current request, nested serializers are counted once"""
+
+    def get_data(serializer):
+        timings = current_timings.get()
+        if timings is None or timings.serializing:
+            return data.fget(serializer)
+        timings.serializing = True
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            timings.serializing = False
+            timings.serializer_time += time.perf_counter() - start
+
+    get_data.timed = True
+    return property(get_data)
+
+
+# every serializer builds its data in BaseSerializer.data
+if not getattr(BaseSerializer.data.fget, "timed", False):
+    BaseSerializer.data = timed_data(BaseSerializer.data)
+
+
+class ServerTimingMiddleware:
+    """
+    Send time spent by each request in database, serializers and in total in Server-Timing header, total time and
+    queries are recorded in metrics too. Requests slower than SLOW_REQUEST_THRESHOLD seconds are logged with their
+    most repeated SQL statements
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        total_time = time.perf_counter() - start
+
+        response["Server-Timing"] = timings.get_header(total_time)
+        view_name = request.resolver_match.view_name if request.resolver_match is not None else None
+        observe_request(view_name, request.method, response.status_code, total_time, timings.query_count)
+        if total_time > settings.SLOW_REQUEST_THRESHOLD:
+            statements = "".join("\n{0} times: {1}".format(count, sql[:500])
+                                 for count, sql in timings.get_repeated_statements())
+            logger.warning("slow request %s %s (%s) took %.3fs: %s queries in %.3fs, serializers %.3fs%s",
+                           request.method, request.path, view_name, total_time, timings.query_count,
+                           timings.query_time, timings.serializer_time, statements)
+        return response
+
+
+def is_staff(request):
+    """Session user or user of API token, only checked when profiling is requested"""
+    if request.user.is_authenticated:
+        return request.user.is_staff
+    try:
+        user = Request(request, authenticators=[authenticator() for authenticator in
+                                                api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+    except APIException:
+        return False
+    return user.is_staff
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request of a staff user when it is asked with `profile` query parameter or `X-Profile` header. Value is
+    `cpu` to run view under cProfile, `memory` to trace allocations with tracemalloc or `all`. Response is replaced by
+    a text report with top functions by cumulative time and top allocation sites, status of view response is sent in
+    X-Profiled-Status header. Other requests only pay for a lookup of the parameter
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get("profile") or request.META.get("HTTP_X_PROFILE")
+        if mode not in ("cpu", "memory", "all") or not is_staff(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile() if mode in ("cpu", "all") else None
+        # tracing started by someone else is not touched
+        trace_memory = mode in ("memory", "all") and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start(settings.PROFILE_TRACEBACK_FRAMES)
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+            duration = time.perf_counter() - start
+            if trace_memory:
+                # taken before reports are built, so their allocations are left out
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+
+        sections = []
+        if profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(settings.PROFILE_TOP)
+            sections.append("cProfile, top {0} functions by cumulative time:\n{1}".format(
+                settings.PROFILE_TOP, output.getvalue()))
+        if trace_memory:
+            # memory used by profiler itself is not shown
+            statistics = snapshot.filter_traces([tracemalloc.Filter(False, cProfile.__file__)]).statistics(
+                "traceback")[:settings.PROFILE_TOP]
+            sites = "\n".join("{0}\n    {1}".format(stat, "\n    ".join(stat.traceback.format()))
+                              for stat in statistics)
+            sections.append("tracemalloc, {0:.1f} KiB still allocated, peak {1:.1f} KiB, top {2} allocation sites:"
+                            "\n{3}".format(current / 1024, peak / 1024, settings.PROFILE_TOP, sites))
+
+        view_name = request.resolver_match.view_name if request.resolver_match is not None else None
+        header = "{0} {1} ({2}) answered {3} in {4:.3f}s".format(request.method, request.get_full_path(), view_name,
+                                                                  response.status_code, duration)
+        report = HttpResponse("\n\n".join([header] + sections), content_type="text/plain; charset=utf-8")
+        report["X-Profiled-Status"] = response.status_code
+        # view response is not sent, it is closed with the report so files and generators of streaming responses are
+        # released. Closing it now would send request_finished before request ends
+        report._resource_closers.append(response.close)
+        return report
@@ -55,6 +55,8 @@ LOCAL_APPS = ["rest_api", "rqworkers"]
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    # first one, so total time covers every other middleware
+    "opct.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -64,6 +66,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.locale.LocaleMiddleware",
+    # last one, so only view is profiled
+    "opct.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "opct.urls"
@@ -97,6 +101,8 @@ DATABASES = {
         "PASSWORD": config("DB_PASS"),
         "HOST": config("DB_HOST"),
         "PORT": config("DB_PORT"),
+        # seconds a connection is kept between requests or jobs run by OpctSimpleWorker
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=0, cast=int),
     }
 }
 
@@ -140,6 +146,34 @@ STATIC_URL = "/static/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "files")
 MEDIA_URL = "/files/"
 
+# Attachments are authorized by Django and delivered by nginx from an internal location (X-Accel-Redirect),
+# without nginx (development) Django streams them
+USE_X_ACCEL_REDIRECT = config("USE_X_ACCEL_REDIRECT", default=False, cast=bool)
+PROTECTED_MEDIA_URL = "/protected-files/"
+ATTACHMENT_CACHE_MAX_AGE = 60 * 60 * 24
+
+# Storage of attached files. With "rest_api.storages.S3Storage" files are kept in a S3 compatible service (MinIO)
+# and clients upload them directly with presigned urls
+ATTACHMENT_STORAGE = config("ATTACHMENT_STORAGE", default="django.core.files.storage.FileSystemStorage")
+S3_ENDPOINT_URL = config("S3_ENDPOINT_URL", default="http://localhost:9000")
+S3_BUCKET_NAME = config("S3_BUCKET_NAME", default="opct")
+S3_ACCESS_KEY_ID = config("S3_ACCESS_KEY_ID", default="")
+S3_SECRET_ACCESS_KEY = config("S3_SECRET_ACCESS_KEY", default="")
+S3_REGION = config("S3_REGION", default="us-east-1")
+S3_PRESIGNED_URL_EXPIRATION = 60 * 60
+S3_REQUEST_TIMEOUT = 60
+
+# Attachments are processed in background to know their real type, pages and to build a preview image
+ATTACHMENT_PREVIEW_SIZE = 320
+ATTACHMENT_PREVIEW_QUALITY = 75
+ATTACHMENT_PROCESSING_TIMEOUT = 60
+
+# Resumable uploads of message files, partial files are kept outside MEDIA_ROOT until the message is posted
+UPLOAD_SESSION_ROOT = os.path.join(BASE_DIR, "uploads")
+UPLOAD_CHUNK_MAX_SIZE = 1024 * 1024 * 10
+MESSAGE_FILE_MAX_SIZE = 1024 * 1024 * 300
+MESSAGE_MAX_SIZE = 1024 * 1024 * 300
+
 AUTH_USER_MODEL = "rest_api.User"
 
 # Default primary key field type
@@ -156,6 +190,7 @@ CORS_ALLOW_HEADERS = (
     "accept",
     "origin",
     "authorization",
+    "content-range",
 )
 
 # REST parameters
@@ -184,14 +219,40 @@ REDIS_CONF = {
     "DEFAULT_TIMEOUT": 60 * 60 * 24,
 }
 
+# queues are drained in this order, a job in "high" is taken before any job in "default" or "low"
 RQ_QUEUES = {
-    "email_sender": REDIS_CONF,
+    "high": REDIS_CONF,
+    "default": REDIS_CONF,
+    "low": REDIS_CONF,
+}
+# queue of each job, urgent emails are never delayed by long running jobs
+RQ_JOB_QUEUES = {
+    "send_email": "high",
+    "send_notification_events": "high",
+    "send_notification_digests": "default",
+    "scan_deadlines": "default",
+    "process_file_blob": "low",
+    "purge_job_executions": "low",
 }
+# queues of each worker process started by runworkers command, in priority order. First process only takes urgent
+# jobs, so emails are sent even when every other process runs a long job. In environment processes are separated by
+# ";" and queues by ",", for instance: high;high,default,low;high,default,low
+RQ_WORKER_QUEUES = config("RQ_WORKER_QUEUES", default="high;high,default,low",
+                          cast=lambda value: [queues.split(",") for queues in value.split(";")])
+RQ_WORKER_CLASS = config("RQ_WORKER_CLASS", default="rqworkers.opctWorker.OpctWorker")
 
 RQ = {"DEFAULT_RESULT_TTL": 60 * 60 * 24}
 
+# jobs waiting longer than this in queue (seconds) are logged by worker
+RQ_LATENCY_WARNING = config("RQ_LATENCY_WARNING", default=30, cast=float)
+
+# jobs failed by transient errors are retried after RQ_RETRY_BACKOFF seconds, the wait doubles on each retry. Jobs
+# failed after every retry are kept in failed job registry of their queue until they are requeued
+RQ_MAX_RETRIES = config("RQ_MAX_RETRIES", default=3, cast=int)
+RQ_RETRY_BACKOFF = config("RQ_RETRY_BACKOFF", default=30, cast=int)
+
 # Custom handler to failed jobs
-RQ_EXCEPTION_HANDLERS = []
+RQ_EXCEPTION_HANDLERS = ["rqworkers.jobs.handle_job_exception"]
 
 # Email configuration
 EMAIL_HOST = config("EMAIL_HOST")
@@ -204,6 +265,30 @@ EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 SERVER_EMAIL = config("SERVER_EMAIL")
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL")
 
+# emails to many users are sent in batches through one SMTP connection, throttled to the rate accepted by relay
+# (messages per second, 0 disables it)
+EMAIL_BATCH_SIZE = 50
+EMAIL_RATE_LIMIT = config("EMAIL_RATE_LIMIT", default=10, cast=float)
+# notification events drained from outbox in each transaction
+NOTIFICATION_BATCH_SIZE = 100
+# deadlines are scanned every DEADLINE_SCAN_INTERVAL seconds, reminders are sent DEADLINE_REMINDER_DAYS before them
+DEADLINE_SCAN_INTERVAL = config("DEADLINE_SCAN_INTERVAL", default=60 * 60, cast=int)
+DEADLINE_REMINDER_DAYS = config("DEADLINE_REMINDER_DAYS", default=3, cast=int)
+# job executions are kept JOB_EXECUTION_RETENTION_DAYS, older ones are deleted once a day in batches
+JOB_EXECUTION_RETENTION_DAYS = config("JOB_EXECUTION_RETENTION_DAYS", default=90, cast=int)
+JOB_EXECUTION_PURGE_INTERVAL = 60 * 60 * 24
+JOB_EXECUTION_PURGE_BATCH_SIZE = 1000
+
+# requests slower than SLOW_REQUEST_THRESHOLD seconds are logged with their SLOW_REQUEST_STATEMENTS most repeated SQL
+# statements
+SLOW_REQUEST_THRESHOLD = config("SLOW_REQUEST_THRESHOLD", default=1, cast=float)
+SLOW_REQUEST_STATEMENTS = 5
+# bearer token of Prometheus scraper, /metrics is disabled without it
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+# lines of profile reports asked by staff users and frames kept for each allocation site
+PROFILE_TOP = 30
+PROFILE_TRACEBACK_FRAMES = 5
+
 AUTHENTICATION_BACKENDS = ["opct.backend.OPCTModelBackend"]
 
 USE_X_FORWARDED_HOST = True
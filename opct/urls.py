@@ -22,11 +22,15 @@ from opct import settings
 from rest_api.views.change_op_process import ChangeOPProcessMessageViewSet, \
     ChangeOPProcessMessageFileViewset, ChangeOPProcessViewSet, ChangeOPProcessStatusViewSet, ChangeOPProcessLogViewSet
 from rest_api.views.change_op_request import ChangeOPRequestViewSet, ChangeOPRequestStatusViewSet
-from rest_api.views.helper import login, verify, send_email, change_op_request_reasons, UserViewSet, \
+from rest_api.views.deadline import DeadlineAPIView
+from rest_api.views.helper import login, verify, change_op_request_reasons, UserViewSet, \
     OrganizationViewSet, ContractTypeViewSet, ChangePasswordAPIView
+from rest_api.views.job_execution import JobExecutionViewSet
+from rest_api.views.metrics import metrics
 from rest_api.views.operation_program import OperationProgramViewSet, OperationProgramTypeViewSet, \
     OPChangeLogViewset, OperationProgramStatusViewSet, OPChangeLogViewSet
 from rest_api.views.route_dictionary import UploadRouteDictionaryFileAPIView, RouteDictionaryViewSet
+from rest_api.views.search import SearchAPIView
 
 router = routers.DefaultRouter()
 router.register(r"users", UserViewSet)
@@ -45,15 +49,18 @@ router.register(r"operation-program-statuses", OperationProgramStatusViewSet)
 router.register(r"change-op-processes", ChangeOPProcessViewSet)
 router.register(r"change-op-process-statuses", ChangeOPProcessStatusViewSet)
 router.register(r"route-definitions", RouteDictionaryViewSet)
+router.register(r"job-executions", JobExecutionViewSet)
 
 urlpatterns = [
     path("", RedirectView.as_view(url="/api/")),
     path("api/", include(router.urls)),
     path("api/login", login, name="login"),
     path("api/verify/", verify, name="verify"),
-    path("api/send-mail/", send_email, name="send-email"),
     path("api/change-op-request-reasons/", change_op_request_reasons, name="change-op-request-reasons"),
     path("api/change-password/", ChangePasswordAPIView.as_view(), name="change-password"),
+    path("api/search/", SearchAPIView.as_view(), name="search"),
+    path("api/deadlines/", DeadlineAPIView.as_view(), name="deadlines"),
+    path("metrics", metrics, name="metrics"),
     path("auth/", include("rest_framework.urls", namespace="rest_framework")),
     path("admin/upload-route-dictionary", UploadRouteDictionaryFileAPIView.as_view(), name="upload-route-dictionary"),
     path("admin/", admin.site.urls),
@@ -27,6 +27,7 @@ class UserAdmin(DjangoUserAdmin):
                     "access_to_organizations",
                     "access_to_users",
                     "access_to_upload_route_dictionary",
+                    "notification_frequency",
                 )
             },
         ),
@@ -106,6 +107,7 @@ class OrganizationAdmin(admin.ModelAdmin):
 class ChangeOPProcessMessageFile(NestedStackedInline):
     model = models.ChangeOPProcessMessageFile
     fk_name = "change_op_process_message"
+    raw_id_fields = ["blob"]
 
 
 class ChangeOPProcessMessage(NestedStackedInline):
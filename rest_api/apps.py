@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RestApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "rest_api"
+
+    def ready(self):
+        from rest_api import signals  # noqa: F401
@@ -14,3 +14,9 @@ class CustomValidation(APIException):
             self.detail = {field: force_str(detail)}
         else:
             self.detail = {"detail": force_str(self.default_detail)}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Los archivos superan el tamaño máximo permitido."
+    default_code = "upload_too_large"
@@ -0,0 +1,213 @@
+import contextlib
+import hashlib
+import io
+import logging
+import mimetypes
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+SNIFF_SIZE = 8 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+# signatures at the beginning of the file
+MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", "image/bmp"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"PK\x05\x06", "application/zip"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+]
+# office open xml and open document files are zip files, their content tells the real type
+ZIP_MIME_TYPES = [
+    ("word/", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ("xl/", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    ("ppt/", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+]
+# legacy office files share the same container, only the extension tells them apart
+OLE_MIME_TYPES = {
+    ".doc": "application/msword",
+    ".xls": "application/vnd.ms-excel",
+    ".ppt": "application/vnd.ms-powerpoint",
+}
+PDF_PAGES_REGEX = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def sniff_mime_type(header, filename):
+    """Real MIME type from the first bytes of a file, extension is only used when content is ambiguous"""
+    extension = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    for magic_number, mime_type in MAGIC_NUMBERS:
+        if header.startswith(magic_number):
+            if mime_type == "application/x-ole-storage":
+                return OLE_MIME_TYPES.get(extension, mime_type)
+            return mime_type
+    if header[8:12] == b"WEBP" and header.startswith(b"RIFF"):
+        return "image/webp"
+    if b"\x00" not in header:
+        try:
+            header.decode("utf-8")
+        except UnicodeDecodeError as e:
+            # a multibyte character may be cut at the end of the header
+            if e.start < len(header) - 3:
+                return "application/octet-stream"
+        guessed_type = mimetypes.guess_type(filename)[0]
+        if guessed_type is not None and guessed_type.startswith("text/"):
+            return guessed_type
+        return "text/plain"
+    return "application/octet-stream"
+
+
+def get_zip_mime_type(file, mime_type):
+    try:
+        with zipfile.ZipFile(file) as zip_file:
+            names = zip_file.namelist()
+            if "mimetype" in names:
+                # open document format
+                return zip_file.read("mimetype").decode("ascii").strip() or mime_type
+            if "[Content_Types].xml" in names:
+                for prefix, office_mime_type in ZIP_MIME_TYPES:
+                    if any(name.startswith(prefix) for name in names):
+                        return office_mime_type
+    except (zipfile.BadZipFile, UnicodeDecodeError):
+        pass
+    return mime_type
+
+
+def count_office_pages(file, mime_type):
+    with zipfile.ZipFile(file) as zip_file:
+        if mime_type == ZIP_MIME_TYPES[1][1]:
+            workbook = zip_file.read("xl/workbook.xml")
+            return len(re.findall(rb"<(?:\w+:)?sheet\b", workbook))
+        # word documents store pages and presentations slides counted by the application that saved them
+        app_properties = zip_file.read("docProps/app.xml")
+        match = re.search(rb"<(?:\w+:)?(?:Pages|Slides)>(\d+)<", app_properties)
+        return int(match.group(1)) if match else None
+
+
+def count_pdf_pages(path):
+    if shutil.which("pdfinfo") is not None:
+        result = subprocess.run(["pdfinfo", path], capture_output=True,
+                                timeout=settings.ATTACHMENT_PROCESSING_TIMEOUT)
+        match = re.search(rb"^Pages:\s+(\d+)", result.stdout, re.MULTILINE)
+        if match:
+            return int(match.group(1))
+    # without poppler page objects are counted, it does not work when they are inside compressed object streams.
+    # Matches starting in the last bytes of a chunk are counted with the next one, when what follows them is known
+    count = 0
+    tail = b""
+    with open(path, "rb") as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(READ_CHUNK_SIZE), b""):
+            data = tail + chunk
+            limit = len(data) - 32
+            count += sum(1 for match in PDF_PAGES_REGEX.finditer(data) if match.start() < limit)
+            tail = data[max(limit, 0):]
+    count += len(PDF_PAGES_REGEX.findall(tail))
+    return count or None
+
+
+def make_thumbnail(image):
+    image.thumbnail((settings.ATTACHMENT_PREVIEW_SIZE, settings.ATTACHMENT_PREVIEW_SIZE))
+    if image.mode not in ("RGB", "L"):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        image = image.convert("RGBA")
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=settings.ATTACHMENT_PREVIEW_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def make_image_preview(path):
+    with Image.open(path) as image:
+        page_count = getattr(image, "n_frames", 1)
+        return page_count, make_thumbnail(image)
+
+
+def make_pdf_preview(path):
+    if shutil.which("pdftoppm") is None:
+        return None
+    with tempfile.TemporaryDirectory() as output_dir:
+        subprocess.run(["pdftoppm", "-png", "-f", "1", "-l", "1", "-singlefile", "-scale-to",
+                        str(settings.ATTACHMENT_PREVIEW_SIZE), path, output_dir + "/preview"],
+                       check=True, capture_output=True, timeout=settings.ATTACHMENT_PROCESSING_TIMEOUT)
+        with Image.open(output_dir + "/preview.png") as image:
+            return make_thumbnail(image)
+
+
+@contextlib.contextmanager
+def local_copy(field_file):
+    """Path of file content in local disk, remote storages are downloaded to a temporary file"""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile() as local_file, field_file.open("rb") as remote_file:
+        shutil.copyfileobj(remote_file, local_file, READ_CHUNK_SIZE)
+        local_file.flush()
+        yield local_file.name
+
+
+def process_file_blob(blob):
+    """
+    Verify checksum, sniff MIME type, count pages and build a preview of blob content. Results are saved on blob
+    """
+    errors = []
+    with local_copy(blob.file) as path:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file:
+            header = file.read(SNIFF_SIZE)
+            sha256.update(header)
+            for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        if sha256.hexdigest() != blob.sha256:
+            errors.append("SHA-256 del contenido no coincide: {0}".format(sha256.hexdigest()))
+
+        filename = blob.change_op_process_message_files.values_list("filename", flat=True).first() or ""
+        mime_type = sniff_mime_type(header, filename)
+        if mime_type == "application/zip":
+            mime_type = get_zip_mime_type(path, mime_type)
+
+        page_count = None
+        preview = None
+        try:
+            if mime_type == "application/pdf":
+                page_count = count_pdf_pages(path)
+                preview = make_pdf_preview(path)
+            elif mime_type.startswith("image/"):
+                page_count, preview = make_image_preview(path)
+            elif mime_type in [office_mime_type for _, office_mime_type in ZIP_MIME_TYPES]:
+                page_count = count_office_pages(path, mime_type)
+        except (OSError, KeyError, zipfile.BadZipFile, UnidentifiedImageError, Image.DecompressionBombError,
+                subprocess.SubprocessError) as e:
+            logger.warning("blob %s could not be processed: %s", blob.pk, e)
+            errors.append(str(e))
+
+    blob.mime_type = mime_type
+    blob.page_count = page_count
+    if preview is not None:
+        blob.preview.save("{0}.jpg".format(blob.sha256), ContentFile(preview), save=False)
+    blob.processing_error = "\n".join(errors)
+    blob.processed_at = timezone.now()
+    blob.save(update_fields=["mime_type", "page_count", "preview", "processing_error", "processed_at"])
+    return blob
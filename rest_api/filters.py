@@ -0,0 +1,46 @@
+import django_filters
+from django.contrib.postgres.search import SearchQuery
+
+from rest_api.models import ChangeOPProcess, ChangeOPRequest, ChangeOPRequestStatus, SEARCH_CONFIG
+from rqworkers.models import SendMailJobExecution
+
+
+class ChangeOPProcessFilter(django_filters.FilterSet):
+    """
+    Structured filters for change OP processes, every field is backed by a database index.
+    Ranges are given as `<field>_after` and `<field>_before` query parameters.
+    """
+    created_at = django_filters.IsoDateTimeFromToRangeFilter()
+    op_release_date = django_filters.DateFromToRangeFilter()
+    q = django_filters.CharFilter(method="filter_full_text")
+
+    class Meta:
+        model = ChangeOPProcess
+        fields = ["status", "counterpart", "contract_type", "operation_program", "created_at", "op_release_date"]
+
+    def filter_full_text(self, queryset, name, value):
+        return queryset.filter(search_vector=SearchQuery(value, config=SEARCH_CONFIG))
+
+
+class ChangeOPRequestFilter(django_filters.FilterSet):
+    """
+    Filters for change OP requests, status accepts many values: `?status=1&status=2`
+    """
+    status = django_filters.ModelMultipleChoiceFilter(queryset=ChangeOPRequestStatus.objects.all())
+
+    class Meta:
+        model = ChangeOPRequest
+        fields = ["status"]
+
+
+class JobExecutionFilter(django_filters.FilterSet):
+    """
+    Filters for email job executions, status accepts many values: `?status=failed&status=running`. Enqueue time
+    range is given as `enqueueTimestamp_after` and `enqueueTimestamp_before` query parameters
+    """
+    status = django_filters.MultipleChoiceFilter(choices=SendMailJobExecution.STATUS_CHOICES)
+    enqueueTimestamp = django_filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = SendMailJobExecution
+        fields = ["status", "enqueueTimestamp"]
@@ -0,0 +1,21 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_api.models import ChangeOPProcessMessageUpload
+
+
+class Command(BaseCommand):
+    help = "delete resumable uploads not updated in the last days, with their partial files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=2, help="days without activity. Default: 2")
+
+    def handle(self, *args, **options):
+        limit = timezone.now() - datetime.timedelta(days=options["days"])
+        deleted = 0
+        for upload_obj in ChangeOPProcessMessageUpload.objects.filter(updated_at__lt=limit).iterator():
+            upload_obj.delete()
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS("{0} uploads deleted".format(deleted)))
@@ -0,0 +1,33 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    help = ("delete attached files kept under the directory of their process, they were copied to blobs by migration "
+            "0095_move_files_to_blobs. Run it after migrations were applied")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="show files without deleting them")
+
+    def handle(self, *args, **options):
+        applied = MigrationExecutor(connection).loader.applied_migrations
+        if ("rest_api", "0096_remove_changeopprocessmessagefile_file") not in applied:
+            self.stderr.write("files have not been moved to blobs yet, run migrate first")
+            return
+
+        deleted = 0
+        directories, _ = default_storage.listdir("")
+        # files were saved as <change_op_process_id>/<filename>, blobs and previews are in other directories
+        for directory in filter(str.isdigit, directories):
+            _, filenames = default_storage.listdir(directory)
+            for filename in filenames:
+                name = "{0}/{1}".format(directory, filename)
+                if options["dry_run"]:
+                    self.stdout.write(name)
+                else:
+                    default_storage.delete(name)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS("{0} files {1}".format(deleted, "found" if options["dry_run"] else
+                                                                            "deleted")))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from rest_api.file_processing import process_file_blob
+from rest_api.models import FileBlob
+from rqworkers.tasks import process_file_blob_job
+
+
+class Command(BaseCommand):
+    help = "process attached files not processed yet: checksum, MIME type, pages and preview"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="process every file again")
+        parser.add_argument("--sync", action="store_true", help="process files whithout worker")
+
+    def handle(self, *args, **options):
+        queryset = FileBlob.objects.order_by("id")
+        if not options["all"]:
+            queryset = queryset.filter(processed_at__isnull=True)
+
+        count = 0
+        for blob in queryset.iterator():
+            if options["sync"]:
+                process_file_blob(blob)
+            else:
+                process_file_blob_job.delay(blob.pk)
+            count += 1
+        self.stdout.write(self.style.SUCCESS("{0} files {1}".format(count, "processed" if options["sync"] else
+                                                                          "enqueued")))
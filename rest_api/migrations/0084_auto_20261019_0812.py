@@ -0,0 +1,24 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0083_alter_changeopprocess_title'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changeopprocess',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Fecha de creación'),
+        ),
+        migrations.AlterField(
+            model_name='changeopprocess',
+            name='op_release_date',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='Fecha de implementación'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:13
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Func, TextField, Value
+
+
+def build_search_vectors(apps, schema_editor):
+    ChangeOPProcess = apps.get_model('rest_api', 'ChangeOPProcess')
+    ChangeOPRequest = apps.get_model('rest_api', 'ChangeOPRequest')
+    ChangeOPProcessMessage = apps.get_model('rest_api', 'ChangeOPProcessMessage')
+
+    ChangeOPProcess.objects.update(search_vector=SearchVector('title', weight='A', config='spanish'))
+    ChangeOPProcessMessage.objects.update(search_vector=SearchVector('message', weight='B', config='spanish'))
+    for reason, reason_display in ChangeOPRequest._meta.get_field('reason').choices:
+        ChangeOPRequest.objects.filter(reason=reason).update(
+            search_vector=SearchVector('title', weight='A', config='spanish') +
+            SearchVector(Value(reason_display), weight='B', config='spanish') +
+            SearchVector(Func('related_routes', Value(' '), function='array_to_string', output_field=TextField()),
+                         weight='B', config='simple'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0084_auto_20261019_0812'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeopprocess',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='changeopprocessmessage',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='changeoprequest',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='changeopprocess',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='changeopprocess_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeopprocessmessage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='changeopprocessmsg_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeoprequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='changeoprequest_search_idx'),
+        ),
+        migrations.RunPython(build_search_vectors, migrations.RunPython.noop),
+    ]
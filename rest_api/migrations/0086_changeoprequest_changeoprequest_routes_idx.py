@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:17
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0085_auto_20261019_0813'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeoprequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['related_routes'], name='changeoprequest_routes_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0086_changeoprequest_changeoprequest_routes_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeOPProcessMessageUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de actualización')),
+                ('filename', models.CharField(max_length=128)),
+                ('size', models.BigIntegerField(help_text='The size, in bytes, of the whole file.')),
+                ('offset', models.BigIntegerField(default=0, help_text='Bytes received without gaps from the beginning of the file.')),
+                ('completed', models.BooleanField(default=False)),
+                ('change_op_process', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='change_op_process_message_uploads', to='rest_api.changeopprocess', verbose_name='Proceso de cambio de PO')),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Carga de archivo para mensaje de proceso de cambio de PO',
+                'verbose_name_plural': 'Cargas de archivos para mensajes de procesos de cambio de PO',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import rest_api.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0087_changeopprocessmessageupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField(help_text='The size, in bytes, of the content.')),
+                ('file', models.FileField(max_length=200, upload_to=rest_api.models.get_blob_upload_to, verbose_name='Archivo')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Referencias')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Contenido de archivo',
+                'verbose_name_plural': 'Contenidos de archivos',
+            },
+        ),
+        migrations.AddField(
+            model_name='changeopprocessmessageupload',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='changeopprocessmessagefile',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='change_op_process_message_files', to='rest_api.fileblob', verbose_name='Contenido'),
+        ),
+    ]
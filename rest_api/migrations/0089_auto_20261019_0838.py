@@ -0,0 +1,25 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:38
+
+from django.db import migrations, models
+import rest_api.models
+import rest_api.storages
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0088_auto_20261019_0832'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeopprocessmessageupload',
+            name='direct',
+            field=models.BooleanField(default=False, help_text='File is uploaded by the client straight to storage.'),
+        ),
+        migrations.AlterField(
+            model_name='fileblob',
+            name='file',
+            field=models.FileField(max_length=200, storage=rest_api.storages.get_attachment_storage, upload_to=rest_api.models.get_blob_upload_to, verbose_name='Archivo'),
+        ),
+    ]
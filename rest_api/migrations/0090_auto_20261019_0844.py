@@ -0,0 +1,40 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:44
+
+from django.db import migrations, models
+import rest_api.models
+import rest_api.storages
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0089_auto_20261019_0838'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileblob',
+            name='mime_type',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Tipo MIME'),
+        ),
+        migrations.AddField(
+            model_name='fileblob',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Páginas'),
+        ),
+        migrations.AddField(
+            model_name='fileblob',
+            name='preview',
+            field=models.FileField(blank=True, max_length=200, storage=rest_api.storages.get_attachment_storage, upload_to=rest_api.models.get_preview_upload_to, verbose_name='Vista previa'),
+        ),
+        migrations.AddField(
+            model_name='fileblob',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de procesamiento'),
+        ),
+        migrations.AddField(
+            model_name='fileblob',
+            name='processing_error',
+            field=models.TextField(blank=True, default='', verbose_name='Error de procesamiento'),
+        ),
+    ]
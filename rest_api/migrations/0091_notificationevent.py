@@ -0,0 +1,36 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0090_auto_20261019_0844'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de creación')),
+                ('type', models.CharField(choices=[('status_change', 'Cambio de estado'), ('op_change', 'Cambio de programa de operación'), ('new_message', 'Nuevo mensaje'), ('new_change_op_request', 'Nueva solicitud de cambio'), ('change_op_request_change', 'Cambio en solicitud de cambio'), ('operation_program_change', 'Modificación de programa de operación')], max_length=50)),
+                ('description', models.TextField(verbose_name='Descripción')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de envío')),
+                ('change_op_process', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_events', to='rest_api.changeopprocess', verbose_name='Proceso de cambio de PO')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Evento a notificar',
+                'verbose_name_plural': 'Eventos a notificar',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationevent',
+            index=models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='notificationevent_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0091_notificationevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_frequency',
+            field=models.PositiveIntegerField(choices=[(0, 'Inmediata'), (60, 'Resumen cada hora'), (1440, 'Resumen diario')], default=60, verbose_name='Frecuencia de notificaciones'),
+        ),
+    ]
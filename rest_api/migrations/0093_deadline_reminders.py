@@ -0,0 +1,27 @@
+# Generated by Django 3.2.14 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0092_user_notification_frequency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeopprocessdeadline',
+            name='breached_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de incumplimiento'),
+        ),
+        migrations.AddField(
+            model_name='changeopprocessdeadline',
+            name='reminded_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de recordatorio'),
+        ),
+        migrations.AddIndex(
+            model_name='changeopprocessdeadline',
+            index=models.Index(condition=models.Q(('breached_at__isnull', True)), fields=['deadline'], name='deadline_open_idx'),
+        ),
+    ]
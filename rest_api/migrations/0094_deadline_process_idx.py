@@ -0,0 +1,17 @@
+# Generated by Django 3.2.14 on 2026-10-19 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0093_deadline_reminders'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeopprocessdeadline',
+            index=models.Index(fields=['deadline', 'change_op_process'], name='deadline_process_idx'),
+        ),
+    ]
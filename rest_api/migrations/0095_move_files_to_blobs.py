@@ -0,0 +1,58 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:05
+
+import hashlib
+
+from django.db import migrations
+import rest_api.models
+
+
+def move_files_to_blobs(apps, schema_editor):
+    """
+    Files are copied to blobs but not deleted, this migration can be rolled back until the old files are removed with
+    deletemovedattachments command
+    """
+    ChangeOPProcessMessageFile = apps.get_model('rest_api', 'ChangeOPProcessMessageFile')
+    FileBlob = apps.get_model('rest_api', 'FileBlob')
+
+    for message_file in ChangeOPProcessMessageFile.objects.filter(blob__isnull=True).exclude(file='').iterator():
+        sha256 = hashlib.sha256()
+        with message_file.file.open('rb') as file:
+            for chunk in file.chunks():
+                sha256.update(chunk)
+        blob, created = FileBlob.objects.get_or_create(sha256=sha256.hexdigest(),
+                                                       defaults=dict(size=message_file.file.size))
+        if not blob.file:
+            name = rest_api.models.get_blob_upload_to(blob, blob.sha256)
+            if blob.file.storage.exists(name):
+                # content copied by an attempt rolled back before
+                blob.file.name = name
+            else:
+                with message_file.file.open('rb') as file:
+                    blob.file.name = blob.file.storage.save(name, file)
+        blob.ref_count += 1
+        blob.save()
+        message_file.blob = blob
+        message_file.save()
+
+
+def move_blobs_to_files(apps, schema_editor):
+    ChangeOPProcessMessageFile = apps.get_model('rest_api', 'ChangeOPProcessMessageFile')
+    FileBlob = apps.get_model('rest_api', 'FileBlob')
+
+    # files with the same content keep sharing it
+    for message_file in ChangeOPProcessMessageFile.objects.filter(file='').select_related('blob').iterator():
+        message_file.file.name = message_file.blob.file.name
+        message_file.blob = None
+        message_file.save()
+    FileBlob.objects.update(ref_count=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0094_deadline_process_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_files_to_blobs, move_blobs_to_files),
+    ]
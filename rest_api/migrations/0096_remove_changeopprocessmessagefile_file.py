@@ -0,0 +1,30 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import rest_api.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0095_move_files_to_blobs'),
+    ]
+
+    operations = [
+        # with a default the column can be added again when this migration is rolled back
+        migrations.AlterField(
+            model_name='changeopprocessmessagefile',
+            name='file',
+            field=models.FileField(blank=True, default='', upload_to=rest_api.models.get_upload_to, verbose_name='Archivo'),
+        ),
+        migrations.RemoveField(
+            model_name='changeopprocessmessagefile',
+            name='file',
+        ),
+        migrations.AlterField(
+            model_name='changeopprocessmessagefile',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='change_op_process_message_files', to='rest_api.fileblob', verbose_name='Contenido'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0096_remove_changeopprocessmessagefile_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeopprocessstatus',
+            name='is_closed',
+            field=models.BooleanField(default=False, verbose_name='Cerrado'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:20
+
+from django.db import migrations
+from django.utils import timezone
+
+# statuses of changeopprocessstatuses fixture that close a process, ids may differ between databases
+CLOSED_STATUS_NAMES = [
+    "Rechazado",
+    "Cerrada por no responder observaciones",
+    "Cerrada por no entrega de alguno de los anexos-po: 1, 2, 3 o 4",
+    "Aprobado para ser incluido en Programa de Operación",
+    "Cerrado por falta de antecedentes",
+    "No se llegó a acuerdo en la modificación",
+    "Cerrada",
+    "Aceptada",
+]
+
+
+def mark_past_deadlines(apps, schema_editor):
+    """
+    Deadlines already passed when reminders were added are not notified, otherwise first scan sends a breach notice
+    for every historical deadline
+    """
+    ChangeOPProcessStatus = apps.get_model('rest_api', 'ChangeOPProcessStatus')
+    ChangeOPProcessDeadline = apps.get_model('rest_api', 'ChangeOPProcessDeadline')
+
+    ChangeOPProcessStatus.objects.filter(name__in=CLOSED_STATUS_NAMES).update(is_closed=True)
+    now = timezone.now()
+    ChangeOPProcessDeadline.objects.filter(deadline__lt=now, breached_at__isnull=True).update(
+        reminded_at=now, breached_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0097_changeopprocessstatus_is_closed'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_past_deadlines, migrations.RunPython.noop),
+    ]
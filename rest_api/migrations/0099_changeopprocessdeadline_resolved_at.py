@@ -0,0 +1,26 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0098_backfill_deadline_reminders'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='changeopprocessdeadline',
+            name='deadline_open_idx',
+        ),
+        migrations.AddField(
+            model_name='changeopprocessdeadline',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de cierre'),
+        ),
+        migrations.AddIndex(
+            model_name='changeopprocessdeadline',
+            index=models.Index(condition=models.Q(('breached_at__isnull', True), ('resolved_at__isnull', True)), fields=['deadline'], name='deadline_open_idx'),
+        ),
+    ]
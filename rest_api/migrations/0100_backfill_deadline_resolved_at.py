@@ -0,0 +1,23 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:32
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def resolve_closed_deadlines(apps, schema_editor):
+    """ Deadlines of processes already closed are left out of the scan """
+    ChangeOPProcessDeadline = apps.get_model('rest_api', 'ChangeOPProcessDeadline')
+
+    ChangeOPProcessDeadline.objects.filter(change_op_process__status__is_closed=True, resolved_at__isnull=True).update(
+        resolved_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rest_api', '0099_changeopprocessdeadline_resolved_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_closed_deadlines, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,24 @@
-import datetime
+import hashlib
+import os
+import uuid
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.contrib.auth.models import Group
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.files import File
+from django.db import connection, models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from rest_api.storages import get_attachment_storage
+
+# text search configuration used to build and query search vectors
+SEARCH_CONFIG = "spanish"
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -186,15 +198,51 @@ class User(AbstractUser):
 
     role = models.CharField("Rol", max_length=30, choices=ROLE_CHOICES)
 
+    # minutes between notification emails, events in between are sent together in one digest
+    NOTIFICATION_IMMEDIATE = 0
+    NOTIFICATION_HOURLY = 60
+    NOTIFICATION_DAILY = 60 * 24
+    NOTIFICATION_FREQUENCY_CHOICES = [
+        (NOTIFICATION_IMMEDIATE, "Inmediata"),
+        (NOTIFICATION_HOURLY, "Resumen cada hora"),
+        (NOTIFICATION_DAILY, "Resumen diario"),
+    ]
+    notification_frequency = models.PositiveIntegerField("Frecuencia de notificaciones",
+                                                         choices=NOTIFICATION_FREQUENCY_CHOICES,
+                                                         default=NOTIFICATION_HOURLY)
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
 
 
+class SearchVectorManager(models.Manager):
+    """Keeps the full-text search vector of a record up to date, it is built from `search_fields` (name, weight)"""
+    search_fields = []
+
+    def get_search_vector(self, obj):
+        vector = None
+        for name, weight in self.search_fields:
+            field_vector = SearchVector(name, weight=weight, config=SEARCH_CONFIG)
+            vector = field_vector if vector is None else vector + field_vector
+        return vector
+
+    def update_search_vector(self, obj):
+        self.filter(pk=obj.pk).update(search_vector=self.get_search_vector(obj))
+
+
+class ChangeOPProcessManager(SearchVectorManager):
+    search_fields = [("title", "A")]
+
+    def visible_to(self, organization):
+        """processes created by or addressed to the organization"""
+        return self.filter(models.Q(counterpart=organization) | models.Q(creator__organization=organization))
+
+
 class ChangeOPProcess(models.Model):
     title = models.CharField("Titulo", max_length=70)
-    created_at = models.DateTimeField("Fecha de creación", default=timezone.now)
+    created_at = models.DateTimeField("Fecha de creación", default=timezone.now, db_index=True)
     updated_at = models.DateTimeField("Fecha de la última actualización", default=timezone.now)
     counterpart = models.ForeignKey(Organization, related_name="change_op_processes", on_delete=models.PROTECT,
                                     verbose_name="Contraparte")
@@ -207,7 +255,10 @@ class ChangeOPProcess(models.Model):
                                 verbose_name="Usuario creador del proceso")
     status = models.ForeignKey('ChangeOPProcessStatus', related_name="+", on_delete=models.PROTECT,
                                verbose_name="Estado")
-    op_release_date = models.DateField("Fecha de implementación", blank=True, null=True)
+    op_release_date = models.DateField("Fecha de implementación", blank=True, null=True, db_index=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ChangeOPProcessManager()
 
     def __str__(self):
         return str(self.title)
@@ -215,6 +266,7 @@ class ChangeOPProcess(models.Model):
     class Meta:
         verbose_name = "Proceso de cambio de PO"
         verbose_name_plural = "Procesos de cambio de PO"
+        indexes = [GinIndex(fields=["search_vector"], name="changeopprocess_search_idx")]
 
 
 class ChangeOPProcessStatus(models.Model):
@@ -224,6 +276,8 @@ class ChangeOPProcessStatus(models.Model):
     name = models.CharField("Nombre", max_length=100)
     contract_type = models.ForeignKey(ContractType, related_name="change_op_process_statuses", on_delete=models.PROTECT,
                                       verbose_name="Tipo de Contrato", blank=False)
+    # processes in a closed status do not have deadlines to meet anymore
+    is_closed = models.BooleanField("Cerrado", default=False)
 
     def __str__(self):
         return str(self.name)
@@ -235,18 +289,57 @@ class ChangeOPProcessStatus(models.Model):
 
 class ChangeOPProcessDeadlineManager(models.Manager):
     def update_deadlines(self, change_op_process_obj):
-        # remove previous deadlines
-        change_op_process_obj.deadlines.all().delete()
-        # if we assigned an op_release_date, we will create new deadlines
-        if change_op_process_obj.op_release_date is not None:
-            for deadline_obj in OperationProgramStatus.objects.filter(
-                    contract_type=change_op_process_obj.contract_type):
-                deadline = change_op_process_obj.op_release_date - datetime.timedelta(days=deadline_obj.time_threshold)
-                deadline = datetime.datetime.fromisoformat(deadline.isoformat())
-                deadline = deadline.replace(hour=23, minute=59, second=59)
-                deadline = deadline.astimezone(timezone.get_default_timezone())
-                ChangeOPProcessDeadline.objects.create(change_op_process=change_op_process_obj,
-                                                       operation_program_deadline=deadline_obj, deadline=deadline)
+        self.recompute(ChangeOPProcess.objects.filter(pk=change_op_process_obj.pk))
+
+    def recompute(self, change_op_processes):
+        """
+        Rebuild deadlines of every process in queryset with one statement. A deadline is the end of the day
+        `time_threshold` days before release date of process, for each operation program status of its contract type.
+        Deadlines that do not move keep their reminder and breach dates, deadlines of closed processes are resolved
+        """
+        processes_query, params = change_op_processes.values("pk").query.sql_with_params()
+        query = """
+            WITH deleted AS (
+                DELETE FROM {deadline_table} WHERE change_op_process_id IN ({processes_query})
+                RETURNING change_op_process_id, operation_program_deadline_id, deadline, reminded_at, breached_at,
+                          resolved_at
+            ), new AS (
+                SELECT process.id AS change_op_process_id, status.id AS operation_program_deadline_id,
+                       ((process.op_release_date - status.time_threshold) + TIME '23:59:59') AT TIME ZONE %s
+                           AS deadline,
+                       process_status.is_closed
+                FROM {process_table} process
+                JOIN {process_status_table} process_status ON process_status.id = process.status_id
+                JOIN {status_table} status ON status.contract_type_id = process.contract_type_id
+                WHERE process.id IN ({processes_query}) AND process.op_release_date IS NOT NULL
+            )
+            INSERT INTO {deadline_table} (change_op_process_id, operation_program_deadline_id, deadline, reminded_at,
+                                          breached_at, resolved_at)
+            SELECT new.change_op_process_id, new.operation_program_deadline_id, new.deadline, deleted.reminded_at,
+                   deleted.breached_at, CASE WHEN new.is_closed THEN COALESCE(deleted.resolved_at, NOW()) END
+            FROM new
+            LEFT JOIN deleted ON deleted.change_op_process_id = new.change_op_process_id AND
+                                 deleted.operation_program_deadline_id = new.operation_program_deadline_id AND
+                                 deleted.deadline = new.deadline
+        """.format(deadline_table=self.model._meta.db_table, process_table=ChangeOPProcess._meta.db_table,
+                   status_table=OperationProgramStatus._meta.db_table,
+                   process_status_table=ChangeOPProcessStatus._meta.db_table, processes_query=processes_query)
+        with connection.cursor() as cursor:
+            cursor.execute(query, [*params, settings.TIME_ZONE, *params])
+            return cursor.rowcount
+
+    def get_open(self, until):
+        """
+        Deadlines before until that are not breached or resolved yet, the others are left out of the partial index
+        """
+        return self.filter(breached_at__isnull=True, resolved_at__isnull=True, deadline__lt=until)
+
+    def update_resolution(self, change_op_process_obj):
+        """Deadlines are resolved while process is in a closed status, they are open again if it is reopened"""
+        deadlines = self.filter(change_op_process=change_op_process_obj)
+        if change_op_process_obj.status.is_closed:
+            return deadlines.filter(resolved_at__isnull=True).update(resolved_at=timezone.now())
+        return deadlines.filter(resolved_at__isnull=False).update(resolved_at=None)
 
 
 class ChangeOPProcessDeadline(models.Model):
@@ -256,9 +349,80 @@ class ChangeOPProcessDeadline(models.Model):
     change_op_process = models.ForeignKey(ChangeOPProcess, related_name="deadlines",
                                           on_delete=models.PROTECT, null=False, blank=False,
                                           verbose_name="Proceso de cambio de PO")
+    reminded_at = models.DateTimeField("Fecha de recordatorio", null=True, blank=True)
+    breached_at = models.DateTimeField("Fecha de incumplimiento", null=True, blank=True)
+    # set while process is in a closed status
+    resolved_at = models.DateTimeField("Fecha de cierre", null=True, blank=True)
 
     objects = ChangeOPProcessDeadlineManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["deadline"], name="deadline_open_idx",
+                         condition=Q(breached_at__isnull=True, resolved_at__isnull=True)),
+            # upcoming deadlines of visible processes are read in date order
+            models.Index(fields=["deadline", "change_op_process"], name="deadline_process_idx"),
+        ]
+
+
+class ChangeOPRequestManager(SearchVectorManager):
+    search_fields = [("title", "A")]
+
+    def get_search_vector(self, obj):
+        # reason is searched by its label and routes as they are written
+        return super().get_search_vector(obj) + \
+               SearchVector(models.Value(obj.get_reason_display()), weight="B", config=SEARCH_CONFIG) + \
+               SearchVector(models.Func("related_routes", models.Value(" "), function="array_to_string",
+                                        output_field=models.TextField()), weight="B", config="simple")
+
+    def get_related_request_ids(self, obj, depth=None):
+        """
+        Ids of requests reachable from obj through related requests, obj included.
+        It walks the graph with one recursive query, UNION discards rows already found so cycles end the recursion.
+        If depth is given, only requests up to `depth` hops away are returned.
+        """
+        through = self.model.related_requests.through._meta
+        from_column = through.get_field("from_changeoprequest").column
+        to_column = through.get_field("to_changeoprequest").column
+
+        if depth is None:
+            query = """
+                WITH RECURSIVE graph(id) AS (
+                    SELECT %s::bigint
+                    UNION
+                    SELECT edge.{to_column} FROM graph JOIN {table} edge ON edge.{from_column} = graph.id
+                )
+                SELECT id FROM graph
+            """
+            params = [obj.pk]
+        else:
+            query = """
+                WITH RECURSIVE graph(id, depth) AS (
+                    SELECT %s::bigint, 0
+                    UNION
+                    SELECT edge.{to_column}, graph.depth + 1
+                    FROM graph JOIN {table} edge ON edge.{from_column} = graph.id
+                    WHERE graph.depth < %s
+                )
+                SELECT DISTINCT id FROM graph
+            """
+            params = [obj.pk, depth]
+        query = query.format(table=connection.ops.quote_name(through.db_table), from_column=from_column,
+                             to_column=to_column)
+
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_related_request_edges(self, request_ids):
+        """pairs of related requests among request_ids, each relation is returned once"""
+        through = self.model.related_requests.through
+        return list(through.objects.filter(
+            from_changeoprequest__in=request_ids, to_changeoprequest__in=request_ids,
+            from_changeoprequest__lt=models.F("to_changeoprequest")).
+            order_by("from_changeoprequest", "to_changeoprequest").
+            values_list("from_changeoprequest", "to_changeoprequest"))
+
 
 class ChangeOPRequest(models.Model):
     title = models.CharField("Titulo", max_length=50)
@@ -317,6 +481,9 @@ class ChangeOPRequest(models.Model):
                                           on_delete=models.PROTECT, null=False, blank=False,
                                           verbose_name="Proceso de cambio de PO")
     related_routes = ArrayField(models.CharField(max_length=30, blank=True))
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ChangeOPRequestManager()
 
     def __str__(self):
         return str(self.title)
@@ -324,6 +491,10 @@ class ChangeOPRequest(models.Model):
     class Meta:
         verbose_name = "Solicitud de modificación de PO"
         verbose_name_plural = "Solicitudes de modificación de PO"
+        indexes = [
+            GinIndex(fields=["search_vector"], name="changeoprequest_search_idx"),
+            GinIndex(fields=["related_routes"], name="changeoprequest_routes_idx"),
+        ]
 
 
 class ChangeOPRequestStatus(models.Model):
@@ -416,6 +587,10 @@ class ChangeOPProcessLog(models.Model):
         verbose_name_plural = "Logs de estado de proceso"
 
 
+class ChangeOPProcessMessageManager(SearchVectorManager):
+    search_fields = [("message", "B")]
+
+
 class ChangeOPProcessMessage(models.Model):
     created_at = models.DateTimeField("Fecha de creación", default=timezone.now)
     creator = models.ForeignKey(User, related_name="change_op_process_messages", on_delete=models.PROTECT, blank=False,
@@ -424,6 +599,9 @@ class ChangeOPProcessMessage(models.Model):
     change_op_process = models.ForeignKey(ChangeOPProcess, related_name="change_op_process_messages",
                                           on_delete=models.PROTECT, null=False, verbose_name="¨Proceso de cambio de PO")
     related_requests = models.ManyToManyField(ChangeOPRequest)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ChangeOPProcessMessageManager()
 
     def __str__(self):
         return str(self.message)
@@ -431,29 +609,303 @@ class ChangeOPProcessMessage(models.Model):
     class Meta:
         verbose_name = "Mensaje de proceso de cambio de PO"
         verbose_name_plural = "Mensajes de proceso de cambio de PO"
+        indexes = [GinIndex(fields=["search_vector"], name="changeopprocessmsg_search_idx")]
 
 
 def get_upload_to(instance, filename):
     return '{0}/{1}'.format(instance.change_op_process_message.change_op_process_id, filename)
 
 
+def get_sha256(file):
+    sha256 = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def get_blob_upload_to(instance, filename):
+    return 'blobs/{0}/{1}/{2}'.format(instance.sha256[:2], instance.sha256[2:4], instance.sha256)
+
+
+def get_preview_upload_to(instance, filename):
+    return 'previews/{0}/{1}/{2}.jpg'.format(instance.sha256[:2], instance.sha256[2:4], instance.sha256)
+
+
+class FileBlobManager(models.Manager):
+
+    def lock(self, sha256):
+        """
+        Lock content with sha256 until the end of current transaction, a blob being created can not be seen by others
+        until it is committed, so its row can not be locked
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [int(sha256[:15], 16)])
+
+    def acquire(self, file, sha256=None):
+        """
+        Blob with the content of file, the content is written only the first time it is seen.
+        Upload handlers give sha256 computed while the file was received, otherwise it is computed here
+        """
+        if sha256 is None:
+            sha256 = getattr(file, "sha256", None) or get_sha256(file)
+        with transaction.atomic():
+            self.lock(sha256)
+            blob, created = self.select_for_update().get_or_create(sha256=sha256, defaults=dict(size=file.size))
+            if not blob.file:
+                name = get_blob_upload_to(blob, sha256)
+                if blob.file.storage.exists(name):
+                    # content left by a transaction rolled back after it was written
+                    blob.file.name = name
+                else:
+                    blob.file.save(sha256, file, save=False)
+            blob.ref_count = F("ref_count") + 1
+            blob.save()
+            blob.refresh_from_db()
+        return blob
+
+    def acquire_stored(self, sha256, size, stored_name):
+        """
+        Blob with content written in storage by a client under stored_name, the content is copied to the name given
+        by get_blob_upload_to only the first time it is seen
+        """
+        with transaction.atomic():
+            self.lock(sha256)
+            blob, created = self.select_for_update().get_or_create(sha256=sha256, defaults=dict(size=size))
+            if not blob.file:
+                name = get_blob_upload_to(blob, sha256)
+                if not blob.file.storage.exists(name):
+                    blob.file.storage.copy(stored_name, name)
+                blob.file.name = name
+            blob.ref_count = F("ref_count") + 1
+            blob.save()
+            blob.refresh_from_db()
+        return blob
+
+    def release(self, blob):
+        """
+        Remove one reference to blob, file is deleted when nobody uses it
+        """
+        with transaction.atomic():
+            blob = self.select_for_update().get(pk=blob.pk)
+            blob.ref_count = max(blob.ref_count - 1, 0)
+            if blob.ref_count == 0:
+                names = [field_file.name for field_file in [blob.file, blob.preview] if field_file]
+                storage = blob.file.storage
+                blob.delete()
+                transaction.on_commit(lambda: self.delete_unused_files(blob.sha256, storage, names))
+            else:
+                blob.save()
+
+    def delete_unused_files(self, sha256, storage, names):
+        """Delete files of a released blob unless its content was acquired again after it was released"""
+        with transaction.atomic():
+            self.lock(sha256)
+            if not self.filter(sha256=sha256).exists():
+                for name in names:
+                    storage.delete(name)
+
+
+class FileBlob(models.Model):
+    """
+    Content of an attached file stored once under its SHA-256, message files with the same content share it
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField(help_text="The size, in bytes, of the content.")
+    file = models.FileField("Archivo", upload_to=get_blob_upload_to, storage=get_attachment_storage, max_length=200)
+    ref_count = models.PositiveIntegerField("Referencias", default=0)
+    created_at = models.DateTimeField("Fecha de creación", default=timezone.now)
+    # filled by process_file_blob_job after the blob is created
+    mime_type = models.CharField("Tipo MIME", max_length=100, blank=True, default="")
+    page_count = models.PositiveIntegerField("Páginas", null=True, blank=True)
+    preview = models.FileField("Vista previa", upload_to=get_preview_upload_to, storage=get_attachment_storage,
+                               max_length=200, blank=True)
+    processed_at = models.DateTimeField("Fecha de procesamiento", null=True, blank=True)
+    processing_error = models.TextField("Error de procesamiento", blank=True, default="")
+
+    objects = FileBlobManager()
+
+    def __str__(self):
+        return str(self.sha256)
+
+    class Meta:
+        verbose_name = "Contenido de archivo"
+        verbose_name_plural = "Contenidos de archivos"
+
+
+class ChangeOPProcessMessageFileManager(models.Manager):
+
+    def create_from_file(self, file, change_op_process_message, filename=None, size=None, sha256=None):
+        blob = FileBlob.objects.acquire(file, sha256=sha256)
+        return self.create(filename=filename or file.name, size=size if size is not None else file.size, blob=blob,
+                           change_op_process_message=change_op_process_message)
+
+    def create_from_upload(self, upload, change_op_process_message):
+        if upload.direct:
+            blob = FileBlob.objects.acquire_stored(upload.sha256, upload.size, upload.get_storage_name())
+        else:
+            with upload.get_file() as file:
+                blob = FileBlob.objects.acquire(file, sha256=upload.sha256 or None)
+        return self.create(filename=upload.filename, size=upload.size, blob=blob,
+                           change_op_process_message=change_op_process_message)
+
+
 class ChangeOPProcessMessageFile(models.Model):
     filename = models.CharField(max_length=128, null=False)
     size = models.IntegerField(null=False, help_text="The size, in bytes, of the uploaded file.")
-    file = models.FileField("Archivo", upload_to=get_upload_to)
+    blob = models.ForeignKey(FileBlob, related_name="change_op_process_message_files", on_delete=models.PROTECT,
+                             verbose_name="Contenido")
     change_op_process_message = models.ForeignKey(ChangeOPProcessMessage,
                                                   related_name="change_op_process_message_files",
                                                   on_delete=models.PROTECT,
                                                   verbose_name="Mensaje de proceso de cambio de PO")
 
+    objects = ChangeOPProcessMessageFileManager()
+
+    @property
+    def file(self):
+        return self.blob.file
+
     def __str__(self):
-        return str(self.file)
+        return str(self.filename)
 
     class Meta:
         verbose_name = "Archivo asociado a un mensaje de proceso de cambio de PO"
         verbose_name_plural = "Archivos asociados a mensajes de procesos de cambio de PO"
 
 
+class CompletedUploadFile(File):
+    """File already on disk, storage moves it to its final location instead of copying it"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class ChangeOPProcessMessageUpload(models.Model):
+    """
+    Resumable upload of a file that will be attached to a message. Chunks are written in place on a partial file
+    until the upload is completed, then the file is moved to a ChangeOPProcessMessageFile when the message is posted.
+    Direct uploads are sent by the client to storage under a name of their own, only metadata is kept here. Content is
+    copied to its blob when the message is posted, so a client only gets content it has uploaded.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField("Fecha de creación", default=timezone.now)
+    updated_at = models.DateTimeField("Fecha de actualización", default=timezone.now)
+    creator = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE, verbose_name="Usuario")
+    change_op_process = models.ForeignKey(ChangeOPProcess, related_name="change_op_process_message_uploads",
+                                          on_delete=models.CASCADE, verbose_name="Proceso de cambio de PO")
+    filename = models.CharField(max_length=128, null=False)
+    size = models.BigIntegerField(help_text="The size, in bytes, of the whole file.")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received without gaps from the beginning of the file.")
+    completed = models.BooleanField(default=False)
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    direct = models.BooleanField(default=False, help_text="File is uploaded by the client straight to storage.")
+
+    @property
+    def path(self):
+        return os.path.join(settings.UPLOAD_SESSION_ROOT, '{0}.part'.format(self.id))
+
+    def write_chunk(self, stream, start, length):
+        """
+        Write `length` bytes read from stream at position `start` of partial file, it returns bytes written
+        """
+        os.makedirs(settings.UPLOAD_SESSION_ROOT, exist_ok=True)
+        written = 0
+        mode = 'r+b' if os.path.exists(self.path) else 'wb'
+        with open(self.path, mode) as part_file:
+            part_file.seek(start)
+            while written < length:
+                data = stream.read(min(64 * 1024, length - written))
+                if not data:
+                    break
+                part_file.write(data)
+                written += len(data)
+        self.offset = max(self.offset, start + written)
+        self.updated_at = timezone.now()
+        return written
+
+    def compute_sha256(self):
+        with open(self.path, 'rb') as part_file:
+            self.sha256 = get_sha256(File(part_file))
+
+    def get_storage_name(self):
+        return 'uploads/{0}'.format(self.id)
+
+    def get_file(self):
+        return CompletedUploadFile(open(self.path, 'rb'), name=self.filename)
+
+    def delete(self, *args, **kwargs):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if self.direct:
+            storage = FileBlob._meta.get_field('file').storage
+            name = self.get_storage_name()
+            transaction.on_commit(lambda: storage.delete(name))
+        return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return str(self.filename)
+
+    class Meta:
+        verbose_name = "Carga de archivo para mensaje de proceso de cambio de PO"
+        verbose_name_plural = "Cargas de archivos para mensajes de procesos de cambio de PO"
+
+
+class NotificationEventManager(models.Manager):
+
+    def add(self, event_type, user, change_op_process, description):
+        """Event to notify, it has to be added in the same transaction as the change it describes"""
+        return self.create(type=event_type, user=user, change_op_process=change_op_process, description=description)
+
+    def get_recipients(self, change_op_process):
+        """Contacts registered by the organizations involved in process"""
+        organizations = [change_op_process.counterpart_id, change_op_process.creator.organization_id]
+        return User.objects.filter(counter_part_contact__organization__in=organizations, is_active=True). \
+            exclude(email="").distinct()
+
+
+class NotificationEvent(models.Model):
+    """
+    Outbox of workflow changes to notify by email. Events are written with the change and a worker sends them in
+    digests, so requests never wait for the mail server
+    """
+    created_at = models.DateTimeField("Fecha de creación", default=timezone.now)
+    STATUS_CHANGE = "status_change"
+    OP_CHANGE = "op_change"
+    NEW_MESSAGE = "new_message"
+    NEW_CHANGE_OP_REQUEST = "new_change_op_request"
+    CHANGE_OP_REQUEST_CHANGE = "change_op_request_change"
+    OPERATION_PROGRAM_CHANGE = "operation_program_change"
+    TYPE_CHOICES = (
+        (STATUS_CHANGE, "Cambio de estado"),
+        (OP_CHANGE, "Cambio de programa de operación"),
+        (NEW_MESSAGE, "Nuevo mensaje"),
+        (NEW_CHANGE_OP_REQUEST, "Nueva solicitud de cambio"),
+        (CHANGE_OP_REQUEST_CHANGE, "Cambio en solicitud de cambio"),
+        (OPERATION_PROGRAM_CHANGE, "Modificación de programa de operación"),
+    )
+    type = models.CharField(max_length=50, choices=TYPE_CHOICES)
+    user = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE, verbose_name="Usuario")
+    change_op_process = models.ForeignKey(ChangeOPProcess, related_name="notification_events",
+                                          on_delete=models.CASCADE, verbose_name="Proceso de cambio de PO")
+    description = models.TextField("Descripción")
+    processed_at = models.DateTimeField("Fecha de envío", null=True, blank=True)
+
+    objects = NotificationEventManager()
+
+    def __str__(self):
+        return '{0} -> {1}: {2}'.format(self.change_op_process_id, self.created_at, self.type)
+
+    class Meta:
+        verbose_name = "Evento a notificar"
+        verbose_name_plural = "Eventos a notificar"
+        indexes = [
+            # worker only reads pending events
+            models.Index(fields=["id"], name="notificationevent_pending_idx", condition=Q(processed_at__isnull=True)),
+        ]
+
+
 class RouteDictionary(models.Model):
     """ Operation program to know routes available """
     ts_code = models.CharField("Código TS", max_length=30, unique=True)
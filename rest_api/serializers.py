@@ -1,3 +1,6 @@
+import re
+
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.models import Group
 from django.contrib.auth.password_validation import validate_password
@@ -5,11 +8,13 @@ from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import ChoiceField
+from rest_framework.reverse import reverse
 
 from rest_api.models import User as ApiUser, OperationProgram, OperationProgramType, Organization, ContractType, \
     ChangeOPRequest, ChangeOPRequestStatus, OPChangeLog, OperationProgramStatus, \
     ChangeOPProcessMessageFile, ChangeOPProcessMessage, ChangeOPProcess, ChangeOPProcessStatus, \
-    ChangeOPProcessLog, ChangeOPRequestLog, RouteDictionary, ChangeOPProcessDeadline
+    ChangeOPProcessLog, ChangeOPRequestLog, RouteDictionary, ChangeOPProcessDeadline, ChangeOPProcessMessageUpload
+from rqworkers.models import SendMailJobExecution
 
 
 class ContractTypeSerializer(serializers.HyperlinkedModelSerializer):
@@ -48,7 +53,7 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ["url", "email", "first_name", "last_name", "organization", "role", "access_to_ops", "access_to_users",
-                  "access_to_organizations", "access_to_upload_route_dictionary"]
+                  "access_to_organizations", "access_to_upload_route_dictionary", "notification_frequency"]
 
     organization = OrganizationSerializer(many=False, read_only=True)
 
@@ -209,14 +214,47 @@ class ChangeOPRequestCreateWithStatusAndOPSerializer(serializers.HyperlinkedMode
 class ChangeOPProcessMessageFileSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = ChangeOPProcessMessageFile
-        fields = "__all__"
-        ordering = ["-file"]
+        exclude = ["blob"]
+        ordering = ["-id"]
 
+    file = serializers.FileField(read_only=True)
+    sha256 = serializers.CharField(source="blob.sha256", read_only=True)
+    mime_type = serializers.CharField(source="blob.mime_type", read_only=True)
+    page_count = serializers.IntegerField(source="blob.page_count", read_only=True)
     extension = serializers.SerializerMethodField()
+    download_url = serializers.HyperlinkedIdentityField(view_name="changeopprocessmessagefile-download")
+    preview_url = serializers.SerializerMethodField()
 
     def get_extension(self, obj):
         return obj.filename.split(".")[-1].lower()
 
+    def get_preview_url(self, obj):
+        if not obj.blob.preview:
+            return None
+        return reverse("changeopprocessmessagefile-preview", kwargs=dict(pk=obj.pk),
+                       request=self.context.get("request"))
+
+
+class ChangeOPProcessMessageUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChangeOPProcessMessageUpload
+        fields = ["id", "filename", "size", "sha256", "direct", "offset", "completed", "created_at", "updated_at"]
+        read_only_fields = ["direct", "offset", "completed", "created_at", "updated_at"]
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise ValidationError("Archivo no puede ser vacío")
+        if value > settings.MESSAGE_FILE_MAX_SIZE:
+            raise ValidationError("Archivo no puede tener un tamaño superior a {0} MB.".format(
+                settings.MESSAGE_FILE_MAX_SIZE // (1024 * 1024)))
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and re.match(r"^[0-9a-f]{64}$", value) is None:
+            raise ValidationError("SHA-256 debe tener 64 caracteres hexadecimales")
+        return value
+
 
 class CreateChangeOPProcessMessageSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
@@ -239,6 +277,14 @@ class ChangeOPRequestDetailMiniSerializer(serializers.HyperlinkedModelSerializer
         return ""
 
 
+class RouteChangeOPRequestSerializer(ChangeOPRequestDetailMiniSerializer):
+    class Meta(ChangeOPRequestDetailMiniSerializer.Meta):
+        fields = ["id", "url", "operation_program", "title", "created_at", "reason", "related_routes",
+                  "get_reason_display", "status", "change_op_process"]
+
+    status = ChangeOPRequestStatusSerializer(many=False, read_only=True)
+
+
 class ChangeOPProcessMessageSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = ChangeOPProcessMessage
@@ -310,7 +356,7 @@ class ChangeOPProcessDeadlineSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ChangeOPProcessDeadline
-        fields = ['deadline', 'name']
+        fields = ['deadline', 'name', 'breached_at']
 
 
 class ChangeOPProcessSerializer(serializers.HyperlinkedModelSerializer):
@@ -413,3 +459,33 @@ class RouteDictionarySerializer(serializers.ModelSerializer):
     class Meta:
         model = RouteDictionary
         fields = ['ts_code']
+
+
+class SearchResultSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    id = serializers.IntegerField(source="hit_id")
+    change_op_process = serializers.IntegerField(source="process_id")
+    text = serializers.CharField()
+    created_at = serializers.DateTimeField(source="created")
+    rank = serializers.FloatField()
+
+
+class DeadlineSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="operation_program_deadline.name", read_only=True)
+    change_op_process_title = serializers.CharField(source="change_op_process.title", read_only=True)
+
+    class Meta:
+        model = ChangeOPProcessDeadline
+        fields = ["id", "deadline", "name", "operation_program_deadline", "breached_at", "change_op_process",
+                  "change_op_process_title"]
+
+
+class JobExecutionSerializer(serializers.ModelSerializer):
+    # same keys as JobExecution.get_dictionary
+    statusName = serializers.CharField(source="get_status_display", read_only=True)
+    error = serializers.CharField(source="errorMessage", read_only=True)
+
+    class Meta:
+        model = SendMailJobExecution
+        fields = ["id", "jobId", "enqueueTimestamp", "executionStart", "executionEnd", "status", "statusName", "error",
+                  "subject"]
@@ -0,0 +1,79 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from redis.exceptions import RedisError
+
+from rest_api.models import ChangeOPProcess, ChangeOPRequest, ChangeOPProcessMessage, ChangeOPProcessMessageFile, \
+    FileBlob, NotificationEvent, OperationProgramStatus, ChangeOPProcessDeadline
+from rqworkers.tasks import process_file_blob_job, send_notification_events_job
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=ChangeOPProcess)
+@receiver(post_save, sender=ChangeOPRequest)
+@receiver(post_save, sender=ChangeOPProcessMessage)
+def update_search_vector(sender, instance, **kwargs):
+    sender.objects.update_search_vector(instance)
+
+
+@receiver(pre_save, sender=OperationProgramStatus)
+def keep_deadline_fields(sender, instance, raw=False, **kwargs):
+    instance._previous_deadline_fields = None
+    if not raw and instance.pk is not None:
+        instance._previous_deadline_fields = sender.objects.filter(pk=instance.pk).values_list(
+            "time_threshold", "contract_type_id").first()
+
+
+@receiver(post_save, sender=OperationProgramStatus)
+def recompute_deadlines(sender, instance, created, raw=False, **kwargs):
+    """
+    Threshold changes move deadlines of every process with the same contract type, fixtures loaded on every start and
+    changes of other fields do not recompute anything
+    """
+    if raw:
+        return
+    previous = getattr(instance, "_previous_deadline_fields", None)
+    if not created and previous == (instance.time_threshold, instance.contract_type_id):
+        return
+    contract_types = {instance.contract_type_id}
+    if previous is not None:
+        # deadlines of status leave processes of old contract type
+        contract_types.add(previous[1])
+    ChangeOPProcessDeadline.objects.recompute(ChangeOPProcess.objects.filter(contract_type__in=contract_types,
+                                                                             op_release_date__isnull=False))
+
+
+@receiver(post_delete, sender=ChangeOPProcessMessageFile)
+def release_file_blob(sender, instance, **kwargs):
+    FileBlob.objects.release(instance.blob)
+
+
+def enqueue_file_blob_processing(file_blob_pk):
+    try:
+        process_file_blob_job.delay(file_blob_pk)
+    except RedisError as e:
+        # file is available anyway, it can be processed later with processattachments command
+        logger.error("processing of file blob %s could not be enqueued: %s", file_blob_pk, e)
+
+
+@receiver(post_save, sender=FileBlob)
+def schedule_file_blob_processing(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: enqueue_file_blob_processing(instance.pk))
+
+
+def enqueue_notification_events():
+    try:
+        send_notification_events_job.delay()
+    except RedisError as e:
+        # events stay in outbox until next drain or sendnotifications command
+        logger.error("notification events could not be enqueued: %s", e)
+
+
+@receiver(post_save, sender=NotificationEvent)
+def schedule_notification_events(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(enqueue_notification_events)
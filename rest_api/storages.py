@@ -0,0 +1,166 @@
+import base64
+import datetime
+import hashlib
+import hmac
+from urllib.parse import quote, urlsplit
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+
+def get_attachment_storage():
+    """Storage of attached files, it is chosen with ATTACHMENT_STORAGE setting"""
+    return import_string(settings.ATTACHMENT_STORAGE)()
+
+
+def aws_quote(value, safe="-_.~"):
+    return quote(value, safe=safe)
+
+
+def hmac_sha256(key, message):
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def get_presigned_url(method, url, access_key, secret_key, region, expires, headers=None, params=None, now=None):
+    """
+    Sign url with AWS signature version 4 as query parameters, so it can be used without credentials until it
+    expires. Headers given have to be sent as they are by whoever uses the url.
+    """
+    now = now or datetime.datetime.utcnow()
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = "{0}/{1}/s3/aws4_request".format(amz_date[:8], region)
+    parts = urlsplit(url)
+    headers = {key.lower(): str(value).strip() for key, value in (headers or {}).items()}
+    headers["host"] = parts.netloc
+    signed_headers = ";".join(sorted(headers))
+
+    query = dict(params or {})
+    query.update({
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": "{0}/{1}".format(access_key, scope),
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires),
+        "X-Amz-SignedHeaders": signed_headers,
+    })
+    canonical_query = "&".join("{0}={1}".format(aws_quote(key), aws_quote(value))
+                               for key, value in sorted(query.items()))
+    canonical_request = "\n".join([
+        method,
+        aws_quote(parts.path or "/", safe="/-_.~"),
+        canonical_query,
+        "".join("{0}:{1}\n".format(key, headers[key]) for key in sorted(headers)),
+        signed_headers,
+        "UNSIGNED-PAYLOAD",
+    ])
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()])
+    signing_key = ("AWS4" + secret_key).encode("utf-8")
+    for value in [amz_date[:8], region, "s3", "aws4_request"]:
+        signing_key = hmac_sha256(signing_key, value)
+    signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    return "{0}://{1}{2}?{3}&X-Amz-Signature={4}".format(parts.scheme, parts.netloc, aws_quote(parts.path, "/-_.~"),
+                                                          canonical_query, signature)
+
+
+class S3File(File):
+    """Body of an object read while it is downloaded"""
+
+    def __init__(self, response, name):
+        super().__init__(response.raw, name)
+        self.response = response
+        self.size = int(response.headers.get("Content-Length", 0))
+
+    def close(self):
+        self.response.close()
+
+
+@deconstructible
+class S3Storage(Storage):
+    """
+    Storage in a S3 compatible service (AWS S3, MinIO), objects are addressed with path style urls.
+    Every request is made with a presigned url, the same kind of url given to clients to upload files directly.
+    Names are content addressed so an existing object is overwritten instead of getting a new name.
+    """
+
+    def __init__(self, endpoint_url=None, bucket_name=None, access_key=None, secret_key=None, region=None,
+                 expiration=None):
+        self.endpoint_url = (endpoint_url or settings.S3_ENDPOINT_URL).rstrip("/")
+        self.bucket_name = bucket_name or settings.S3_BUCKET_NAME
+        self.access_key = access_key or settings.S3_ACCESS_KEY_ID
+        self.secret_key = secret_key or settings.S3_SECRET_ACCESS_KEY
+        self.region = region or settings.S3_REGION
+        self.expiration = expiration or settings.S3_PRESIGNED_URL_EXPIRATION
+
+    def get_presigned_url(self, method, name, headers=None, params=None, expires=None):
+        url = "{0}/{1}/{2}".format(self.endpoint_url, self.bucket_name, name)
+        return get_presigned_url(method, url, self.access_key, self.secret_key, self.region,
+                                 expires or self.expiration, headers=headers, params=params)
+
+    def get_presigned_upload(self, name, size, sha256):
+        """
+        Url and headers a client needs to upload a file with a PUT request. Size and checksum are signed, so the
+        service rejects any other content
+        """
+        headers = {
+            "Content-Length": str(size),
+            "x-amz-checksum-sha256": base64.b64encode(bytes.fromhex(sha256)).decode("ascii"),
+        }
+        return dict(url=self.get_presigned_url("PUT", name, headers=headers), method="PUT", headers=headers)
+
+    def request(self, method, name, headers=None, **kwargs):
+        url = self.get_presigned_url(method, name, headers=headers)
+        return requests.request(method, url, headers=headers, timeout=settings.S3_REQUEST_TIMEOUT, **kwargs)
+
+    def head(self, name):
+        response = self.request("HEAD", name)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response
+
+    def _open(self, name, mode="rb"):
+        response = self.request("GET", name, stream=True)
+        if response.status_code == 404:
+            raise FileNotFoundError(name)
+        response.raise_for_status()
+        return S3File(response, name)
+
+    def _save(self, name, content):
+        headers = {"Content-Length": str(content.size)}
+        content.seek(0)
+        self.request("PUT", name, headers=headers, data=content).raise_for_status()
+        return name
+
+    def copy(self, source, name):
+        """Copy an object inside the bucket without downloading it"""
+        headers = {"x-amz-copy-source": aws_quote("/{0}/{1}".format(self.bucket_name, source), safe="/-_.~")}
+        self.request("PUT", name, headers=headers).raise_for_status()
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def delete(self, name):
+        response = self.request("DELETE", name)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def exists(self, name):
+        return self.head(name) is not None
+
+    def size(self, name):
+        response = self.head(name)
+        if response is None:
+            raise FileNotFoundError(name)
+        return int(response.headers["Content-Length"])
+
+    def url(self, name, filename=None):
+        params = None
+        if filename is not None:
+            params = {"response-content-disposition": "attachment; filename*=utf-8''{0}".format(quote(filename))}
+        return self.get_presigned_url("GET", name, params=params)
@@ -1,14 +1,20 @@
+import hashlib
+import io
 import json
+import zipfile
 from collections import OrderedDict
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.test.client import RequestFactory
 from django.urls import reverse
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND, \
-    HTTP_405_METHOD_NOT_ALLOWED, HTTP_403_FORBIDDEN, HTTP_400_BAD_REQUEST
+    HTTP_405_METHOD_NOT_ALLOWED, HTTP_403_FORBIDDEN, HTTP_400_BAD_REQUEST, HTTP_409_CONFLICT, \
+    HTTP_413_REQUEST_ENTITY_TOO_LARGE
 
 from rest_api.models import OperationProgramType, ChangeOPProcess, ChangeOPRequest, ChangeOPProcessLog, \
-    ChangeOPProcessStatus, ChangeOPProcessMessage, ChangeOPRequestLog
+    ChangeOPProcessStatus, ChangeOPProcessMessage, ChangeOPRequestLog, ChangeOPProcessMessageFile, \
+    ChangeOPProcessMessageUpload, FileBlob, NotificationEvent, ChangeOPProcessDeadline
 from rest_api.serializers import ChangeOPProcessSerializer
 from rest_api.tests.test_views_base import BaseTestCase
 
@@ -69,6 +75,19 @@ class ChangeOPProcessViewSetTest(BaseTestCase):
         url = reverse("changeopprocess-update-change-op-requests", kwargs=dict(pk=pk))
         return self._make_request(client, self.PUT_REQUEST, url, data, status_code)
 
+    def change_op_process_create_upload(self, client, pk, data, status_code=HTTP_201_CREATED):
+        url = reverse("changeopprocess-create-upload", kwargs=dict(pk=pk))
+        return self._make_request(client, self.POST_REQUEST, url, data, status_code, json_process=True)
+
+    def change_op_process_upload_chunk(self, client, pk, upload_id, chunk, content_range, status_code=HTTP_200_OK):
+        url = reverse("changeopprocess-upload", kwargs=dict(pk=pk, upload_id=upload_id))
+        return self._make_request(client, self.PUT_REQUEST, url, chunk, status_code, json_process=True,
+                                  content_type="application/octet-stream", HTTP_CONTENT_RANGE=content_range)
+
+    def change_op_process_finalize_upload(self, client, pk, upload_id, status_code=HTTP_200_OK):
+        url = reverse("changeopprocess-finalize-upload", kwargs=dict(pk=pk, upload_id=upload_id))
+        return self._make_request(client, self.POST_REQUEST, url, {}, status_code, json_process=True)
+
     # ------------------------------ tests ----------------------------------------
     def test_list_with_user_related_to_owner_organization(self):
         self.login_dtpm_viewer_user()
@@ -104,6 +123,47 @@ class ChangeOPProcessViewSetTest(BaseTestCase):
         )
         self.assertJSONEqual(json.dumps(response.data), json.dumps(expected_response))
 
+    def test_list_change_op_requests_count(self):
+        self.login_dtpm_viewer_user()
+        self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="second request")
+        self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="third request")
+        empty_change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                         self.op1_contract_type, title="empty process")
+
+        response = self.change_op_process_list(self.client, {"search": self.op1_organization.name})
+
+        counts = {result["id"]: result["change_op_requests_count"] for result in response.data["results"]}
+        self.assertDictEqual({self.change_op_process.pk: 3, empty_change_op_process.pk: 0}, counts)
+
+    def test_list_filtered_by_status(self):
+        self.login_dtpm_viewer_user()
+        self.create_op_process(self.dtpm_viewer_user, self.op1_organization, self.op1_contract_type, status_id=2)
+
+        response = self.change_op_process_list(self.client, {"status": 2})
+        self.assertEqual(1, response.data["count"])
+        self.assertEqual(2, response.data["results"][0]["status"]["id"])
+
+    def test_list_filtered_by_op_release_date_range(self):
+        self.login_dtpm_viewer_user()
+        change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                   self.op1_contract_type)
+        change_op_process.op_release_date = "2031-06-01"
+        change_op_process.save()
+
+        response = self.change_op_process_list(self.client, {"op_release_date_after": "2031-01-01",
+                                                             "op_release_date_before": "2031-12-31"})
+        self.assertEqual(1, response.data["count"])
+        self.assertEqual(change_op_process.pk, response.data["results"][0]["id"])
+
+    def test_list_filtered_by_full_text(self):
+        self.login_dtpm_viewer_user()
+        self.create_op_process(self.dtpm_viewer_user, self.op1_organization, self.op1_contract_type,
+                               title="Ajuste de frecuencias")
+
+        response = self.change_op_process_list(self.client, {"q": "frecuencia"})
+        self.assertEqual(1, response.data["count"])
+        self.assertEqual("Ajuste de frecuencias", response.data["results"][0]["title"])
+
     def test_list_with_user_related_to_counterpart_organization(self):
         self.login_op1_viewer_user()
         response = self.change_op_process_list(self.client, {})
@@ -351,8 +411,14 @@ class ChangeOPProcessViewSetTest(BaseTestCase):
             self.assertEqual(3, len(files))
             for file_obj in files:
                 self.assertIn(file_obj.filename, ['filename.xlsx', 'filename.docx'])
-                file_obj.file.delete()
             self.assertEqual(1, message_obj.related_requests.count())
+        # files with the same content share one blob
+        self.assertEqual(2, FileBlob.objects.count())
+        blob = FileBlob.objects.get(sha256=hashlib.sha256(b'text content').hexdigest())
+        self.assertEqual(2, blob.ref_count)
+        self.assertEqual(2, blob.change_op_process_message_files.count())
+        for blob in FileBlob.objects.all():
+            blob.file.delete()
 
     def test_add_message_without_files(self):
         self.login_op1_viewer_user()
@@ -371,6 +437,10 @@ class ChangeOPProcessViewSetTest(BaseTestCase):
             files = message.change_op_process_message_files.all()
             self.assertEqual(0, len(files))
 
+        event = NotificationEvent.objects.get()
+        self.assertEqual(NotificationEvent.NEW_MESSAGE, event.type)
+        self.assertIn('yes, another custom message', event.description)
+
     def test_add_message_without_content(self):
         self.login_op1_viewer_user()
         data = {
@@ -382,6 +452,201 @@ class ChangeOPProcessViewSetTest(BaseTestCase):
                                            status_code=HTTP_400_BAD_REQUEST)
         self.assertEqual(0, ChangeOPProcessMessage.objects.filter(change_op_process=self.change_op_process).count())
 
+    @override_settings(MESSAGE_FILE_MAX_SIZE=10)
+    def test_add_message_with_file_bigger_than_limit(self):
+        self.login_op1_viewer_user()
+        data = {
+            "message": "message with big file",
+            "files": [SimpleUploadedFile('small.pdf', b'0123456789'), SimpleUploadedFile('big.pdf', b'0' * 11)],
+            "related_requests": json.dumps([self.change_op_request.id])
+        }
+        response = self.change_op_process_add_message(self.client, self.change_op_process.pk, data,
+                                                      status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn('big.pdf', response.data['detail'])
+        self.assertEqual(0, ChangeOPProcessMessage.objects.filter(change_op_process=self.change_op_process).count())
+        self.assertEqual(0, ChangeOPProcessMessageFile.objects.count())
+
+    @override_settings(MESSAGE_MAX_SIZE=15)
+    def test_add_message_with_files_bigger_than_limit(self):
+        self.login_op1_viewer_user()
+        data = {
+            "message": "message with many files",
+            "files": [SimpleUploadedFile('file1.pdf', b'0123456789'), SimpleUploadedFile('file2.pdf', b'0123456789')],
+            "related_requests": json.dumps([self.change_op_request.id])
+        }
+        self.change_op_process_add_message(self.client, self.change_op_process.pk, data,
+                                           status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(0, ChangeOPProcessMessage.objects.filter(change_op_process=self.change_op_process).count())
+
+    def test_add_message_with_resumable_upload(self):
+        self.login_op1_viewer_user()
+        content = b'0123456789' * 10
+        upload = self.change_op_process_create_upload(self.client, self.change_op_process.pk,
+                                                      {"filename": "filename.pdf", "size": len(content)})
+        self.assertEqual(0, upload["offset"])
+
+        self.change_op_process_upload_chunk(self.client, self.change_op_process.pk, upload["id"], content[:60],
+                                            "bytes 0-59/100")
+        # chunk after a gap is rejected with the offset where client has to resume
+        response = self.change_op_process_upload_chunk(self.client, self.change_op_process.pk, upload["id"],
+                                                       content[80:], "bytes 80-99/100", HTTP_409_CONFLICT)
+        self.assertEqual("60", response["offset"])
+        self.change_op_process_finalize_upload(self.client, self.change_op_process.pk, upload["id"],
+                                               HTTP_409_CONFLICT)
+        # resending bytes already received is allowed
+        upload = self.change_op_process_upload_chunk(self.client, self.change_op_process.pk, upload["id"],
+                                                     content[50:], "bytes 50-99/100")
+        self.assertEqual(100, upload["offset"])
+        upload = self.change_op_process_finalize_upload(self.client, self.change_op_process.pk, upload["id"])
+        self.assertTrue(upload["completed"])
+
+        data = {
+            "message": "message with uploaded file",
+            "uploads": json.dumps([upload["id"]]),
+            "related_requests": json.dumps([self.change_op_request.id])
+        }
+        self.change_op_process_add_message(self.client, self.change_op_process.pk, data)
+
+        self.assertEqual(0, ChangeOPProcessMessageUpload.objects.count())
+        file_obj = ChangeOPProcessMessageFile.objects.get(
+            change_op_process_message__change_op_process=self.change_op_process)
+        self.assertEqual("filename.pdf", file_obj.filename)
+        self.assertEqual(100, file_obj.size)
+        self.assertEqual(hashlib.sha256(content).hexdigest(), file_obj.blob.sha256)
+        with file_obj.file.open('rb') as file:
+            self.assertEqual(content, file.read())
+        file_obj.file.delete()
+
+    def test_add_message_with_content_already_stored(self):
+        self.login_op1_viewer_user()
+        file_obj = self.add_message_file('report.pdf', b'pdf content')
+        data = {
+            "message": "same file again",
+            "files": [SimpleUploadedFile('copy.pdf', b'pdf content', content_type='application/pdf')],
+            "related_requests": json.dumps([self.change_op_request.id])
+        }
+        self.change_op_process_add_message(self.client, self.change_op_process.pk, data)
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(2, blob.ref_count)
+        self.assertEqual(['copy.pdf', 'report.pdf'],
+                         sorted(blob.change_op_process_message_files.values_list('filename', flat=True)))
+
+        # content is deleted with its last reference
+        file_name = blob.file.name
+        ChangeOPProcessMessageFile.objects.filter(filename='copy.pdf').delete()
+        self.assertEqual(1, FileBlob.objects.get().ref_count)
+        with self.captureOnCommitCallbacks(execute=True):
+            file_obj.delete()
+        self.assertEqual(0, FileBlob.objects.count())
+        self.assertFalse(blob.file.storage.exists(file_name))
+
+    def test_content_acquired_again_before_it_is_deleted(self):
+        self.login_op1_viewer_user()
+        file_obj = self.add_message_file('report.pdf', b'pdf content')
+        file_name = file_obj.blob.file.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            file_obj.delete()
+        # same content is posted between release of the blob and deletion of its file
+        self.add_message_file('copy.pdf', b'pdf content')
+        for callback in callbacks:
+            callback()
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(file_name, blob.file.name)
+        self.assertTrue(blob.file.storage.exists(file_name))
+        blob.file.delete()
+
+    def test_add_message_with_unfinished_upload(self):
+        self.login_op1_viewer_user()
+        upload = self.change_op_process_create_upload(self.client, self.change_op_process.pk,
+                                                      {"filename": "filename.pdf", "size": 10})
+        data = {
+            "message": "message with uploaded file",
+            "uploads": json.dumps([upload["id"]]),
+            "related_requests": json.dumps([self.change_op_request.id])
+        }
+        self.change_op_process_add_message(self.client, self.change_op_process.pk, data,
+                                           status_code=HTTP_400_BAD_REQUEST)
+        self.assertEqual(0, ChangeOPProcessMessage.objects.filter(change_op_process=self.change_op_process).count())
+        ChangeOPProcessMessageUpload.objects.get(pk=upload["id"]).delete()
+
+    def test_create_upload_bigger_than_limit(self):
+        self.login_op1_viewer_user()
+        self.change_op_process_create_upload(self.client, self.change_op_process.pk,
+                                             {"filename": "filename.pdf", "size": 1024 * 1024 * 301},
+                                             HTTP_400_BAD_REQUEST)
+
+    def add_message_file(self, filename, content):
+        message_obj = ChangeOPProcessMessage.objects.create(creator=self.op1_viewer_user, message="message",
+                                                            change_op_process=self.change_op_process)
+        return ChangeOPProcessMessageFile.objects.create_from_file(SimpleUploadedFile(filename, content), message_obj)
+
+    def test_download_message_file(self):
+        self.login_dtpm_viewer_user()
+        file_obj = self.add_message_file('report.pdf', b'pdf content')
+        url = reverse("changeopprocessmessagefile-download", kwargs=dict(pk=file_obj.pk))
+
+        response = self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_200_OK)
+        self.assertEqual(b'pdf content', b''.join(response.streaming_content))
+        self.assertEqual('application/pdf', response['Content-Type'])
+        self.assertEqual('attachment; filename="report.pdf"', response['Content-Disposition'])
+        self.assertIn('private', response['Cache-Control'])
+        file_obj.file.delete()
+
+    @override_settings(USE_X_ACCEL_REDIRECT=True)
+    def test_download_message_file_with_x_accel_redirect(self):
+        self.login_op1_viewer_user()
+        file_obj = self.add_message_file('planificación.xlsx', b'xlsx content')
+        url = reverse("changeopprocessmessagefile-download", kwargs=dict(pk=file_obj.pk))
+
+        response = self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_200_OK)
+        self.assertEqual(b'', response.content)
+        sha256 = hashlib.sha256(b'xlsx content').hexdigest()
+        self.assertEqual('/protected-files/blobs/{0}/{1}/{2}'.format(sha256[:2], sha256[2:4], sha256),
+                         response['X-Accel-Redirect'])
+        self.assertEqual("attachment; filename*=utf-8''planificaci%C3%B3n.xlsx", response['Content-Disposition'])
+        file_obj.file.delete()
+
+    def test_download_message_file_without_visibility(self):
+        file_obj = self.add_message_file('report.pdf', b'pdf content')
+        url = reverse("changeopprocessmessagefile-download", kwargs=dict(pk=file_obj.pk))
+
+        self.login_op2_viewer_user()
+        self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_404_NOT_FOUND)
+        self.client.logout()
+        self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_403_FORBIDDEN)
+        file_obj.file.delete()
+
+    def test_download_attachments_zip(self):
+        self.login_op1_viewer_user()
+        file_objs = [self.add_message_file('report.pdf', b'pdf content'),
+                     self.add_message_file('notes.txt', b'text content ' * 100),
+                     self.add_message_file('notes.txt', b'another text')]
+        url = reverse("changeopprocess-attachments-zip", kwargs=dict(pk=self.change_op_process.pk))
+
+        response = self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_200_OK)
+        self.assertEqual('application/zip', response['Content-Type'])
+        self.assertEqual('attachment; filename="proceso_{0}.zip"'.format(self.change_op_process.pk),
+                         response['Content-Disposition'])
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zip_file:
+            zip_infos = zip_file.infolist()
+            self.assertEqual(3, len(zip_infos))
+            self.assertEqual(zipfile.ZIP_STORED, zip_infos[0].compress_type)
+            self.assertEqual(zipfile.ZIP_DEFLATED, zip_infos[1].compress_type)
+            self.assertTrue(zip_infos[0].filename.endswith('/report.pdf'))
+            self.assertEqual(b'pdf content', zip_file.read(zip_infos[0]))
+            self.assertEqual(b'text content ' * 100, zip_file.read(zip_infos[1]))
+            self.assertEqual(b'another text', zip_file.read(zip_infos[2]))
+        for file_obj in file_objs:
+            file_obj.file.delete()
+
+    def test_download_attachments_zip_without_visibility(self):
+        url = reverse("changeopprocess-attachments-zip", kwargs=dict(pk=self.change_op_process.pk))
+
+        self.login_op2_viewer_user()
+        self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_404_NOT_FOUND)
+
     def test_update(self):
         self.login_op1_viewer_user()
         self.change_op_process_patch(self.client, self.change_op_process.pk, {}, HTTP_405_METHOD_NOT_ALLOWED)
@@ -469,6 +734,31 @@ class ChangeOPProcessViewSetTest(BaseTestCase):
         self.assertDictEqual(dict(value=previous_status_name), log_obj.previous_data)
         self.assertDictEqual(dict(value=new_status_obj.name), log_obj.new_data)
 
+        event = NotificationEvent.objects.get()
+        self.assertEqual(NotificationEvent.STATUS_CHANGE, event.type)
+        self.assertEqual(self.op1_viewer_user, event.user)
+        self.assertEqual(self.change_op_process, event.change_op_process)
+        self.assertIsNone(event.processed_at)
+
+    def test_change_status_resolves_deadlines(self):
+        self.login_op1_viewer_user()
+        self.change_op_process.op_release_date = "2031-06-01"
+        self.change_op_process.save()
+        ChangeOPProcessDeadline.objects.update_deadlines(self.change_op_process)
+        deadlines = self.change_op_process.deadlines
+
+        closed_status_obj = ChangeOPProcessStatus.objects.get(name="Rechazado")
+        self.change_op_process_change_status(self.client, self.change_op_process.pk, {"status": closed_status_obj.pk})
+        self.assertFalse(deadlines.filter(resolved_at__isnull=True).exists())
+
+        # deadlines keep resolved when they are recomputed
+        ChangeOPProcessDeadline.objects.update_deadlines(self.change_op_process)
+        self.assertFalse(deadlines.filter(resolved_at__isnull=True).exists())
+
+        # process is reopened
+        self.change_op_process_change_status(self.client, self.change_op_process.pk, {"status": 2})
+        self.assertFalse(deadlines.filter(resolved_at__isnull=False).exists())
+
     def test_change_status_not_found_request(self):
         self.login_dtpm_viewer_user()
         data = {"status": -1}
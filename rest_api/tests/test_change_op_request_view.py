@@ -0,0 +1,59 @@
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+
+from rest_api.models import OperationProgramType
+from rest_api.tests.test_views_base import BaseTestCase
+
+
+class ChangeOPRequestViewSetTest(BaseTestCase):
+
+    def setUp(self):
+        super(ChangeOPRequestViewSetTest, self).setUp()
+        self.op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=self.op_program)
+        # a -- b -- c -- a is a cycle and c -- d is a tail, e is not related
+        self.request_a = self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="a")
+        self.request_b = self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="b")
+        self.request_c = self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="c")
+        self.request_d = self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="d")
+        self.request_e = self.create_op_request(self.dtpm_viewer_user, self.change_op_process, title="e")
+        self.request_a.related_requests.add(self.request_b, self.request_c)
+        self.request_b.related_requests.add(self.request_c)
+        self.request_c.related_requests.add(self.request_d)
+
+    # ------------------------------ helper methods ------------------------------ #
+    def change_op_request_related_graph(self, client, pk, data, status_code=HTTP_200_OK):
+        url = reverse("changeoprequest-related-graph", kwargs=dict(pk=pk))
+        return self._make_request(client, self.GET_REQUEST, url, data, status_code, json_process=True)
+
+    # ------------------------------ tests ----------------------------------------
+    def test_related_graph(self):
+        self.login_dtpm_viewer_user()
+        response = self.change_op_request_related_graph(self.client, self.request_d.pk, {})
+
+        depths = {node["id"]: node["depth"] for node in response["nodes"]}
+        expected_depths = {self.request_a.pk: 2, self.request_b.pk: 2, self.request_c.pk: 1, self.request_d.pk: 0}
+        self.assertDictEqual(expected_depths, depths)
+        expected_edges = [[self.request_a.pk, self.request_b.pk], [self.request_a.pk, self.request_c.pk],
+                          [self.request_b.pk, self.request_c.pk], [self.request_c.pk, self.request_d.pk]]
+        self.assertListEqual(expected_edges, response["edges"])
+
+    def test_related_graph_with_depth(self):
+        self.login_dtpm_viewer_user()
+        response = self.change_op_request_related_graph(self.client, self.request_d.pk, {"depth": 1})
+
+        self.assertListEqual([self.request_c.pk, self.request_d.pk], [node["id"] for node in response["nodes"]])
+        self.assertListEqual([[self.request_c.pk, self.request_d.pk]], response["edges"])
+
+    def test_related_graph_without_related_requests(self):
+        self.login_dtpm_viewer_user()
+        response = self.change_op_request_related_graph(self.client, self.request_e.pk, {})
+
+        self.assertListEqual([self.request_e.pk], [node["id"] for node in response["nodes"]])
+        self.assertListEqual([], response["edges"])
+
+    def test_related_graph_with_invalid_depth(self):
+        self.login_dtpm_viewer_user()
+        self.change_op_request_related_graph(self.client, self.request_d.pk, {"depth": "one"}, HTTP_400_BAD_REQUEST)
+        self.change_op_request_related_graph(self.client, self.request_d.pk, {"depth": -1}, HTTP_400_BAD_REQUEST)
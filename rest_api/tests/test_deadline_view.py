@@ -0,0 +1,66 @@
+import datetime
+
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+
+from rest_api.models import OperationProgramType, ChangeOPProcessDeadline
+from rest_api.tests.test_views_base import BaseTestCase
+
+
+class DeadlineAPIViewTest(BaseTestCase):
+
+    def setUp(self):
+        super(DeadlineAPIViewTest, self).setUp()
+        self.op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        # deadlines are 120, 90, 28 and 0 days before release date
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=self.op_program,
+                                                        title="Proceso OP1")
+        self.change_op_process.op_release_date = datetime.date(2023, 5, 1)
+        self.change_op_process.save()
+        ChangeOPProcessDeadline.objects.update_deadlines(self.change_op_process)
+        self.other_change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op2_organization,
+                                                              self.op2_contract_type, op=self.op_program)
+        self.other_change_op_process.op_release_date = datetime.date(2023, 5, 10)
+        self.other_change_op_process.save()
+        ChangeOPProcessDeadline.objects.update_deadlines(self.other_change_op_process)
+
+    # ------------------------------ helper methods ------------------------------ #
+    def deadlines(self, client, data, status_code=HTTP_200_OK):
+        url = reverse("deadlines")
+        return self._make_request(client, self.GET_REQUEST, url, data, status_code, json_process=True)
+
+    # ------------------------------ tests ----------------------------------------
+    def test_deadlines_in_range(self):
+        self.login_dtpm_viewer_user()
+        response = self.deadlines(self.client, {"from": "2023-04-03", "to": "2023-05-01"})
+
+        self.assertEqual(5, response["count"])
+        results = [(result["change_op_process"], result["name"]) for result in response["results"]]
+        self.assertListEqual([(self.change_op_process.pk, "Etapa 3: Revisión específica"),
+                              (self.other_change_op_process.pk, "Etapa 2: Evaluación de Admisibilidad"),
+                              (self.other_change_op_process.pk, "Etapa 3: Planificación Táctica"),
+                              (self.other_change_op_process.pk, "Etapa 4: Programación de Transporte"),
+                              (self.change_op_process.pk, "Etapa 4: Cerrado")], results)
+        self.assertEqual("Proceso OP1", response["results"][0]["change_op_process_title"])
+        self.assertListEqual(["Etapa 3: Revisión específica", "Etapa 4: Cerrado",
+                              "Etapa 2: Evaluación de Admisibilidad", "Etapa 3: Planificación Táctica",
+                              "Etapa 4: Programación de Transporte"],
+                             [count["name"] for count in response["counts"]])
+        self.assertTrue(all(count["count"] == 1 for count in response["counts"]))
+
+    def test_deadlines_of_visible_processes(self):
+        self.login_op1_viewer_user()
+        response = self.deadlines(self.client, {"from": "2022-01-01"})
+
+        self.assertEqual(4, response["count"])
+        self.assertTrue(all(result["change_op_process"] == self.change_op_process.pk
+                            for result in response["results"]))
+
+    def test_deadlines_with_invalid_date(self):
+        self.login_dtpm_viewer_user()
+        self.deadlines(self.client, {"from": "01-04-2023"}, HTTP_400_BAD_REQUEST)
+        self.deadlines(self.client, {"to": "2023-02-30"}, HTTP_400_BAD_REQUEST)
+
+    def test_deadlines_without_active_session(self):
+        self.deadlines(self.client, {}, HTTP_403_FORBIDDEN)
@@ -0,0 +1,138 @@
+import io
+import tempfile
+import zipfile
+from unittest import mock
+
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+
+from rest_api.file_processing import sniff_mime_type, get_zip_mime_type, count_office_pages, count_pdf_pages, \
+    process_file_blob
+from rest_api.models import OperationProgramType, ChangeOPProcessMessage, ChangeOPProcessMessageFile, FileBlob
+from rest_api.tests.test_views_base import BaseTestCase
+
+
+def make_zip(files):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    return content.getvalue()
+
+
+def make_png(size=(800, 600)):
+    content = io.BytesIO()
+    Image.new("RGBA", size, (200, 10, 10, 128)).save(content, format="PNG")
+    return content.getvalue()
+
+
+class FileProcessingTest(SimpleTestCase):
+
+    def test_sniff_mime_type(self):
+        self.assertEqual("application/pdf", sniff_mime_type(b"%PDF-1.7\n", "report.xlsx"))
+        self.assertEqual("image/png", sniff_mime_type(make_png()[:100], "image.jpg"))
+        self.assertEqual("application/vnd.ms-excel",
+                         sniff_mime_type(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1\x00\x00", "planilla.xls"))
+        self.assertEqual("text/csv", sniff_mime_type("ruta;código\n506;T506".encode("utf-8"), "rutas.csv"))
+        self.assertEqual("text/plain", sniff_mime_type(b"just text", "notes"))
+        self.assertEqual("application/octet-stream", sniff_mime_type(b"\x00\x01\x02binary", "data.txt"))
+
+    def test_office_files(self):
+        xlsx = io.BytesIO(make_zip({
+            "[Content_Types].xml": "<Types/>",
+            "xl/workbook.xml": '<workbook><sheets><sheet name="a"/><sheet name="b"/></sheets></workbook>',
+        }))
+        mime_type = get_zip_mime_type(xlsx, "application/zip")
+        self.assertEqual("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", mime_type)
+        self.assertEqual(2, count_office_pages(xlsx, mime_type))
+
+        docx = io.BytesIO(make_zip({
+            "[Content_Types].xml": "<Types/>",
+            "word/document.xml": "<document/>",
+            "docProps/app.xml": "<Properties><Pages>7</Pages></Properties>",
+        }))
+        mime_type = get_zip_mime_type(docx, "application/zip")
+        self.assertEqual("application/vnd.openxmlformats-officedocument.wordprocessingml.document", mime_type)
+        self.assertEqual(7, count_office_pages(docx, mime_type))
+
+        self.assertEqual("application/zip", get_zip_mime_type(io.BytesIO(make_zip({"a.txt": "a"})),
+                                                              "application/zip"))
+
+    @mock.patch("rest_api.file_processing.shutil.which", return_value=None)
+    @mock.patch("rest_api.file_processing.READ_CHUNK_SIZE", 64)
+    def test_count_pdf_pages_without_poppler(self, which_mock):
+        content = b"%PDF-1.4\n1 0 obj << /Type /Pages /Kids [2 0 R 3 0 R 4 0 R] /Count 3 >> endobj\n"
+        for index in range(3):
+            content += b"x" * 50 + b"<< /Type /Page /Parent 1 0 R >>\n"
+        with tempfile.NamedTemporaryFile() as pdf_file:
+            pdf_file.write(content)
+            pdf_file.flush()
+            self.assertEqual(3, count_pdf_pages(pdf_file.name))
+
+
+class FileBlobProcessingTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=self.op_program)
+        self.message = ChangeOPProcessMessage.objects.create(creator=self.op1_viewer_user, message="message",
+                                                             change_op_process=self.change_op_process)
+
+    def tearDown(self):
+        for blob in FileBlob.objects.all():
+            blob.preview.delete()
+            blob.file.delete()
+        super().tearDown()
+
+    def test_processing_is_enqueued_when_content_is_new(self):
+        with mock.patch("rest_api.signals.process_file_blob_job.delay") as delay_mock:
+            with self.captureOnCommitCallbacks(execute=True):
+                file_obj = ChangeOPProcessMessageFile.objects.create_from_file(
+                    SimpleUploadedFile("a.txt", b"content"), self.message)
+            with self.captureOnCommitCallbacks(execute=True):
+                ChangeOPProcessMessageFile.objects.create_from_file(SimpleUploadedFile("b.txt", b"content"),
+                                                                    self.message)
+        delay_mock.assert_called_once_with(file_obj.blob.pk)
+
+    def test_process_image(self):
+        file_obj = ChangeOPProcessMessageFile.objects.create_from_file(
+            SimpleUploadedFile("image.jpg", make_png()), self.message)
+
+        blob = process_file_blob(file_obj.blob)
+        self.assertEqual("image/png", blob.mime_type)
+        self.assertEqual(1, blob.page_count)
+        self.assertEqual("", blob.processing_error)
+        self.assertIsNotNone(blob.processed_at)
+        with blob.preview.open("rb") as preview, Image.open(preview) as image:
+            self.assertEqual("JPEG", image.format)
+            self.assertEqual((320, 240), image.size)
+
+        self.login_op1_viewer_user()
+        url = reverse("changeopprocessmessagefile-detail", kwargs=dict(pk=file_obj.pk))
+        data = self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_200_OK, json_process=True)
+        self.assertEqual("image/png", data["mime_type"])
+        self.assertEqual(1, data["page_count"])
+        self.assertTrue(data["preview_url"].endswith(reverse("changeopprocessmessagefile-preview",
+                                                             kwargs=dict(pk=file_obj.pk))))
+
+        response = self._make_request(self.client, self.GET_REQUEST, data["preview_url"], {}, HTTP_200_OK)
+        self.assertEqual("image/jpeg", response["Content-Type"])
+        self.assertEqual('attachment; filename="image.jpg"', response["Content-Disposition"])
+
+    def test_process_file_with_wrong_checksum(self):
+        file_obj = ChangeOPProcessMessageFile.objects.create_from_file(
+            SimpleUploadedFile("notes.txt", b"text"), self.message, sha256="0" * 64)
+
+        blob = process_file_blob(file_obj.blob)
+        self.assertEqual("text/plain", blob.mime_type)
+        self.assertIn("SHA-256", blob.processing_error)
+        self.assertFalse(blob.preview)
+
+        self.login_op1_viewer_user()
+        url = reverse("changeopprocessmessagefile-preview", kwargs=dict(pk=file_obj.pk))
+        self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_404_NOT_FOUND)
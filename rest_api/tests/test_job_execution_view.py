@@ -0,0 +1,80 @@
+import datetime
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+
+from rest_api.tests.test_views_base import BaseTestCase
+from rqworkers.models import SendMailJobExecution
+
+
+class JobExecutionViewSetTest(BaseTestCase):
+
+    def setUp(self):
+        super(JobExecutionViewSetTest, self).setUp()
+        self.dtpm_admin_user.is_staff = True
+        self.dtpm_admin_user.save()
+        start = timezone.make_aware(datetime.datetime(2023, 5, 1, 10))
+        second = datetime.timedelta(seconds=1)
+        self.finished = SendMailJobExecution.objects.create(
+            enqueueTimestamp=start, executionStart=start + 10 * second, executionEnd=start + 70 * second,
+            status=SendMailJobExecution.FINISHED, subject="Aviso 1", body="body")
+        self.failed = SendMailJobExecution.objects.create(
+            enqueueTimestamp=start + 3600 * second, executionStart=start + 3630 * second,
+            executionEnd=start + 3650 * second, status=SendMailJobExecution.FAILED, subject="Aviso 2", body="body",
+            errorMessage="1 de 2 correos no fueron enviados")
+        self.enqueued = SendMailJobExecution.objects.create(
+            enqueueTimestamp=start + 7200 * second, status=SendMailJobExecution.ENQUEUED, subject="Aviso 3",
+            body="body")
+
+    # ------------------------------ helper methods ------------------------------ #
+    def job_executions(self, client, data, status_code=HTTP_200_OK):
+        url = reverse("sendmailjobexecution-list")
+        return self._make_request(client, self.GET_REQUEST, url, data, status_code, json_process=True)
+
+    def metrics(self, client, data, status_code=HTTP_200_OK):
+        url = reverse("sendmailjobexecution-metrics")
+        return self._make_request(client, self.GET_REQUEST, url, data, status_code, json_process=True)
+
+    # ------------------------------ tests ----------------------------------------
+    def test_list(self):
+        self.login_dtpm_admin_user()
+        response = self.job_executions(self.client, {})
+
+        self.assertEqual(3, response["count"])
+        self.assertListEqual([self.enqueued.pk, self.failed.pk, self.finished.pk],
+                             [result["id"] for result in response["results"]])
+        self.assertEqual("Finalización con error", response["results"][1]["statusName"])
+        self.assertEqual("1 de 2 correos no fueron enviados", response["results"][1]["error"])
+
+        response = self.job_executions(self.client, {"status": [SendMailJobExecution.FAILED,
+                                                                SendMailJobExecution.ENQUEUED]})
+        self.assertListEqual([self.enqueued.pk, self.failed.pk], [result["id"] for result in response["results"]])
+
+        response = self.job_executions(self.client, {"enqueueTimestamp_before": "2023-05-01T11:30:00-04:00"})
+        self.assertListEqual([self.failed.pk, self.finished.pk], [result["id"] for result in response["results"]])
+
+    def test_metrics(self):
+        self.login_dtpm_admin_user()
+        response = self.metrics(self.client, {})
+
+        self.assertEqual(3, response["total"])
+        self.assertEqual(1, response[SendMailJobExecution.FINISHED])
+        self.assertEqual(1, response[SendMailJobExecution.FAILED])
+        self.assertEqual(1, response[SendMailJobExecution.ENQUEUED])
+        self.assertEqual(0.5, response["failure_rate"])
+        self.assertAlmostEqual(20, response["queue_wait_avg"])
+        self.assertAlmostEqual(29, response["queue_wait_p95"])
+        self.assertAlmostEqual(30, response["queue_wait_max"])
+        self.assertAlmostEqual(40, response["run_time_avg"])
+        self.assertAlmostEqual(60, response["run_time_max"])
+
+        response = self.metrics(self.client, {"status": SendMailJobExecution.ENQUEUED})
+        self.assertEqual(1, response["total"])
+        self.assertIsNone(response["failure_rate"])
+        self.assertIsNone(response["queue_wait_avg"])
+
+    def test_only_staff_users(self):
+        self.login_dtpm_viewer_user()
+        self.job_executions(self.client, {}, HTTP_403_FORBIDDEN)
+        self.metrics(self.client, {}, HTTP_403_FORBIDDEN)
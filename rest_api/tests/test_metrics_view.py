@@ -0,0 +1,54 @@
+from unittest import mock
+
+import django_rq
+import fakeredis
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
+
+from rest_api.tests.test_views_base import BaseTestCase
+from rqworkers.jobs import handle_job_exception
+
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsViewTest(BaseTestCase):
+
+    def setUp(self):
+        super(MetricsViewTest, self).setUp()
+        self.connection = fakeredis.FakeStrictRedis()
+        self.queue = django_rq.get_queue("low", connection=self.connection)
+        get_queue = django_rq.get_queue
+        patcher = mock.patch("rqworkers.metrics.django_rq.get_queue",
+                             side_effect=lambda name: get_queue(name, connection=self.connection))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # ------------------------------ helper methods ------------------------------ #
+    def metrics(self, status_code=HTTP_200_OK, token="secret"):
+        return self._make_request(self.client, self.GET_REQUEST, reverse("metrics"), {}, status_code,
+                                  HTTP_AUTHORIZATION="Bearer {0}".format(token))
+
+    # ------------------------------ tests ----------------------------------------
+    def test_metrics(self):
+        self.login_dtpm_viewer_user()
+        self._make_request(self.client, self.GET_REQUEST, reverse("changeopprocess-list"), {}, HTTP_200_OK)
+        self.queue.enqueue("rqworkers.tasks.process_file_blob_job", 0)
+        failed_job = self.queue.enqueue("rqworkers.tasks.process_file_blob_job", 1)
+        handle_job_exception(failed_job, ValueError, ValueError("wrong"), None)
+
+        content = self.metrics().content.decode()
+
+        self.assertIn('opct_http_request_duration_seconds_count{method="GET",status="200",'
+                      'view="changeopprocess-list"}', content)
+        self.assertIn('opct_http_request_queries_count{view="changeopprocess-list"}', content)
+        self.assertIn("opct_rq_up 1.0", content)
+        self.assertIn('opct_rq_queue_jobs{queue="low"} 2.0', content)
+        self.assertIn('opct_rq_queue_jobs{queue="high"} 0.0', content)
+        self.assertIn('opct_rq_registry_jobs{queue="low",registry="failed"} 0.0', content)
+        self.assertIn('opct_rq_job_failures_total{job="rqworkers.tasks.process_file_blob_job",queue="low"} 1.0',
+                      content)
+
+    def test_token_is_required(self):
+        self.metrics(HTTP_403_FORBIDDEN, token="wrong")
+        with self.settings(METRICS_TOKEN=""):
+            self.metrics(HTTP_404_NOT_FOUND, token="")
@@ -1,3 +1,7 @@
+import datetime
+from unittest import mock
+
+from django.core.management import call_command
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.request import Request
@@ -5,7 +9,8 @@ from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CON
     HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
 from rest_framework.test import APIRequestFactory
 
-from rest_api.models import OperationProgram, OPChangeLog, OperationProgramType
+from rest_api.models import OperationProgram, OPChangeLog, OperationProgramType, OperationProgramStatus, \
+    ChangeOPProcessDeadline
 from rest_api.serializers import OperationProgramDetailSerializer
 from rest_api.tests.test_views_base import BaseTestCase
 
@@ -124,6 +129,67 @@ class OperationProgramViewSetTest(BaseTestCase):
         self.assertJSONEqual('{"date": "2022-01-03", "op_type": "Modificado"}', op_change_data_log.new_data)
         self.assertEqual(self.dtpm_admin_user, op_change_data_log.user)
 
+    def test_update_moves_deadlines_of_processes(self):
+        change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                   self.op1_contract_type, op=self.op_program)
+        change_op_process.op_release_date = self.op_program.start_at
+        change_op_process.save()
+        ChangeOPProcessDeadline.objects.update_deadlines(change_op_process)
+        change_op_process.deadlines.update(breached_at=timezone.now())
+        self.login_dtpm_admin_user()
+
+        data = {
+            "start_at": "2022-01-03",
+            "op_type": reverse("operationprogramtype-detail", kwargs=dict(pk=1)),
+        }
+        self.operation_program_patch(self.client, self.op_program.pk, data)
+
+        change_op_process.refresh_from_db()
+        self.assertEqual(datetime.date(2022, 1, 3), change_op_process.op_release_date)
+        deadlines = change_op_process.deadlines.select_related("operation_program_deadline")
+        self.assertEqual(4, len(deadlines))
+        for deadline in deadlines:
+            local_deadline = timezone.localtime(deadline.deadline)
+            self.assertEqual(datetime.date(2022, 1, 3) - datetime.timedelta(
+                days=deadline.operation_program_deadline.time_threshold), local_deadline.date())
+            self.assertEqual(datetime.time(23, 59, 59), local_deadline.time())
+            self.assertIsNone(deadline.breached_at)
+
+        # breaches of deadlines that do not move are kept
+        change_op_process.deadlines.update(breached_at=timezone.now())
+        ChangeOPProcessDeadline.objects.update_deadlines(change_op_process)
+        self.assertEqual(4, change_op_process.deadlines.filter(breached_at__isnull=False).count())
+
+    def test_threshold_change_moves_deadlines(self):
+        change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                   self.op1_contract_type, op=self.op_program)
+        change_op_process.op_release_date = self.op_program.start_at
+        change_op_process.save()
+        ChangeOPProcessDeadline.objects.update_deadlines(change_op_process)
+        change_op_process.deadlines.update(breached_at=timezone.now())
+
+        status_obj = OperationProgramStatus.objects.get(contract_type=self.op1_contract_type, time_threshold=28)
+        status_obj.time_threshold = 30
+        status_obj.save()
+
+        deadline = change_op_process.deadlines.get(operation_program_deadline=status_obj)
+        self.assertEqual(datetime.date(2021, 12, 2), timezone.localtime(deadline.deadline).date())
+        self.assertIsNone(deadline.breached_at)
+        self.assertEqual(3, change_op_process.deadlines.filter(breached_at__isnull=False).count())
+
+    def test_other_changes_do_not_recompute_deadlines(self):
+        status_obj = OperationProgramStatus.objects.get(contract_type=self.op1_contract_type, time_threshold=28)
+        with mock.patch.object(ChangeOPProcessDeadline.objects, "recompute") as recompute_mock:
+            status_obj.name = "Etapa renombrada"
+            status_obj.save()
+            # fixtures are loaded on every start
+            call_command("loaddata", "operationprogramstatuses", verbosity=0)
+
+            recompute_mock.assert_not_called()
+            status_obj.time_threshold = 30
+            status_obj.save()
+            recompute_mock.assert_called_once()
+
     def test_update_without_group_permissions(self):
         self.login_dtpm_viewer_user()
         self.operation_program_patch(self.client, self.op_program.pk, {}, HTTP_403_FORBIDDEN)
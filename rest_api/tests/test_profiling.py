@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import FileResponse
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.status import HTTP_200_OK
+
+from rest_api.models import OperationProgramType, ChangeOPProcessMessage, ChangeOPProcessMessageFile
+from rest_api.tests.test_views_base import BaseTestCase
+
+
+class ProfilingMiddlewareTest(BaseTestCase):
+
+    def setUp(self):
+        super(ProfilingMiddlewareTest, self).setUp()
+        self.dtpm_admin_user.is_staff = True
+        self.dtpm_admin_user.save()
+        op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=op_program)
+
+    def get_process(self, data, **headers):
+        url = reverse("changeopprocess-detail", kwargs=dict(pk=self.change_op_process.pk))
+        return self._make_request(self.client, self.GET_REQUEST, url, data, HTTP_200_OK, **headers)
+
+    def test_staff_user_gets_profile_report(self):
+        self.login_dtpm_admin_user()
+        response = self.get_process({"profile": "all"})
+
+        self.assertEqual("text/plain; charset=utf-8", response["Content-Type"])
+        self.assertEqual("200", response["X-Profiled-Status"])
+        report = response.content.decode()
+        self.assertIn("(changeopprocess-detail) answered 200", report)
+        self.assertIn("cProfile, top 30 functions by cumulative time", report)
+        self.assertIn("tracemalloc", report)
+
+    def test_profile_is_asked_with_header_and_api_token(self):
+        token = Token.objects.create(user=self.dtpm_admin_user)
+        response = self.get_process({}, HTTP_X_PROFILE="memory", HTTP_AUTHORIZATION="Token {0}".format(token.key))
+
+        report = response.content.decode()
+        self.assertIn("tracemalloc", report)
+        self.assertNotIn("cProfile", report)
+
+    def test_streamed_response_is_closed(self):
+        message_obj = ChangeOPProcessMessage.objects.create(creator=self.dtpm_admin_user, message="message",
+                                                            change_op_process=self.change_op_process)
+        file_obj = ChangeOPProcessMessageFile.objects.create_from_file(SimpleUploadedFile("report.pdf", b"content"),
+                                                                       message_obj)
+        self.login_dtpm_admin_user()
+        url = reverse("changeopprocessmessagefile-download", kwargs=dict(pk=file_obj.pk))
+
+        with mock.patch.object(FileResponse, "close", autospec=True) as close_mock:
+            response = self._make_request(self.client, self.GET_REQUEST, url, {"profile": "cpu"}, HTTP_200_OK)
+
+        self.assertEqual("200", response["X-Profiled-Status"])
+        self.assertIsInstance(close_mock.call_args.args[0], FileResponse)
+        file_obj.file.delete()
+
+    def test_other_users_get_view_response(self):
+        self.login_dtpm_viewer_user()
+        response = self.get_process({"profile": "cpu"})
+
+        self.assertEqual("application/json", response["Content-Type"])
+        self.assertNotIn("X-Profiled-Status", response)
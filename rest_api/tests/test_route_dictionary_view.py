@@ -3,6 +3,7 @@ import os
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 
@@ -28,6 +29,10 @@ class RouteDictionaryViewSetTest(BaseTestCase):
         return self._make_request(client, self.POST_REQUEST, url, data, status_code, format='multipart',
                                   json_process=True)
 
+    def action_change_op_requests(self, client, ts_code, data, status_code=status.HTTP_200_OK):
+        url = reverse('routedictionary-change-op-requests', kwargs=dict(ts_code=ts_code))
+        return self._make_request(client, self.GET_REQUEST, url, data, status_code, json_process=True)
+
     # ------------------------------ tests ----------------------------------------
     def test_upload_file_without_permission(self):
         self.login_op1_viewer_user()
@@ -85,6 +90,19 @@ class RouteDictionaryViewSetTest(BaseTestCase):
         }
         self.action_update_definitions(self.client, data)
 
+    @override_settings(MESSAGE_FILE_MAX_SIZE=10, MESSAGE_MAX_SIZE=10)
+    def test_upload_file_is_not_limited_as_message_files(self):
+        self.login_op1_viewer_user()
+        self.add_permission_to_op1_viewer_user()
+
+        file_path = os.path.join(settings.BASE_DIR, 'rest_api', 'tests', 'route_dictionary.csv.gz')
+        with open(file_path, 'rb') as csv_file:
+            file_obj = SimpleUploadedFile('filename.csv.gz', csv_file.read(), content_type='text/csv')
+        data = {
+            "files": [file_obj],
+        }
+        self.action_update_definitions(self.client, data)
+
     def test_upload_zip_file(self):
         """
         upload gz file
@@ -99,3 +117,36 @@ class RouteDictionaryViewSetTest(BaseTestCase):
             "files": [file_obj],
         }
         self.action_update_definitions(self.client, data)
+
+    def test_change_op_requests_related_to_route(self):
+        self.login_op1_viewer_user()
+        change_op_request = self.create_op_request(self.dtpm_viewer_user, self.change_op_process,
+                                                   related_routes=['T506 00I', 'T507 00R'])
+        self.create_op_request(self.dtpm_viewer_user, self.change_op_process, related_routes=['T507 00R'],
+                               status_id=2)
+
+        response = self.action_change_op_requests(self.client, 'T506 00I', {})
+        self.assertEqual(1, response['count'])
+        self.assertEqual(change_op_request.pk, response['results'][0]['id'])
+
+        response = self.action_change_op_requests(self.client, 'T507 00R', {})
+        self.assertEqual(2, response['count'])
+
+    def test_change_op_requests_related_to_route_filtered_by_status(self):
+        self.login_op1_viewer_user()
+        self.create_op_request(self.dtpm_viewer_user, self.change_op_process, related_routes=['T507 00R'])
+        change_op_request = self.create_op_request(self.dtpm_viewer_user, self.change_op_process,
+                                                   related_routes=['T507 00R'], status_id=2)
+
+        response = self.action_change_op_requests(self.client, 'T507 00R', {'status': 2})
+        self.assertEqual(1, response['count'])
+        self.assertEqual(change_op_request.pk, response['results'][0]['id'])
+
+        self.action_change_op_requests(self.client, 'T507 00R', {'status': -1}, status.HTTP_400_BAD_REQUEST)
+
+    def test_change_op_requests_related_to_route_without_visibility(self):
+        self.login_op2_viewer_user()
+        self.create_op_request(self.dtpm_viewer_user, self.change_op_process, related_routes=['T506 00I'])
+
+        response = self.action_change_op_requests(self.client, 'T506 00I', {})
+        self.assertEqual(0, response['count'])
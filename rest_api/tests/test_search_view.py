@@ -0,0 +1,60 @@
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+
+from rest_api.models import OperationProgramType, ChangeOPProcessMessage
+from rest_api.tests.test_views_base import BaseTestCase
+
+
+class SearchAPIViewTest(BaseTestCase):
+
+    def setUp(self):
+        super(SearchAPIViewTest, self).setUp()
+        self.op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=self.op_program,
+                                                        title="Extensión servicio Quilicura")
+        self.change_op_request = self.create_op_request(self.dtpm_viewer_user, self.change_op_process,
+                                                        title="Nuevo trazado Quilicura",
+                                                        related_routes=['T506 00I'])
+        self.message = ChangeOPProcessMessage.objects.create(creator=self.op1_viewer_user,
+                                                             message="Adjuntamos el trazado propuesto para Maipú",
+                                                             change_op_process=self.change_op_process)
+
+    # ------------------------------ helper methods ------------------------------ #
+    def search(self, client, data, status_code=HTTP_200_OK):
+        url = reverse("search")
+        return self._make_request(client, self.GET_REQUEST, url, data, status_code, json_process=True)
+
+    # ------------------------------ tests ----------------------------------------
+    def test_search_ranks_hits_from_every_source(self):
+        self.login_dtpm_viewer_user()
+        response = self.search(self.client, {"q": "trazado"})
+
+        hits = [(hit["type"], hit["id"]) for hit in response["results"]]
+        self.assertEqual(2, response["count"])
+        # title matches weight more than message body
+        self.assertListEqual([("change_op_request", self.change_op_request.pk),
+                              ("change_op_process_message", self.message.pk)], hits)
+        self.assertEqual(self.change_op_process.pk, response["results"][1]["change_op_process"])
+
+    def test_search_uses_stemming(self):
+        self.login_op1_viewer_user()
+        response = self.search(self.client, {"q": "extensiones"})
+        self.assertEqual(1, response["count"])
+        self.assertEqual("change_op_process", response["results"][0]["type"])
+
+    def test_search_by_reason_and_route(self):
+        self.login_dtpm_viewer_user()
+        response = self.search(self.client, {"q": "Modificación"})
+        self.assertEqual(1, response["count"])
+        response = self.search(self.client, {"q": "T506"})
+        self.assertEqual(1, response["count"])
+
+    def test_search_only_returns_visible_processes(self):
+        self.login_op2_viewer_user()
+        response = self.search(self.client, {"q": "Quilicura"})
+        self.assertEqual(0, response["count"])
+
+    def test_search_without_text(self):
+        self.login_dtpm_viewer_user()
+        self.search(self.client, {"q": " "}, HTTP_400_BAD_REQUEST)
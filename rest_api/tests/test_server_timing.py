@@ -0,0 +1,57 @@
+import re
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+
+from opct.middleware import RequestTimings
+from rest_api.models import OperationProgramType
+from rest_api.tests.test_views_base import BaseTestCase
+
+
+class RequestTimingsTest(SimpleTestCase):
+
+    def test_repeated_statements(self):
+        timings = RequestTimings()
+        for sql in ["SELECT a WHERE id = %s", "SELECT b", "SELECT a WHERE id = %s", "SELECT a WHERE id = %s"]:
+            timings(lambda *args: None, sql, [1], False, {})
+
+        self.assertEqual(4, timings.query_count)
+        self.assertListEqual([(3, "SELECT a WHERE id = %s")], timings.get_repeated_statements())
+        self.assertRegex(timings.get_header(0.25),
+                         r'^db;dur=[\d.]+;desc="4 queries", serializer;dur=0\.0, total;dur=250\.0$')
+
+
+class ServerTimingMiddlewareTest(BaseTestCase):
+
+    def setUp(self):
+        super(ServerTimingMiddlewareTest, self).setUp()
+        op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        for index in range(3):
+            self.create_op_process(self.dtpm_viewer_user, self.op1_organization, self.op1_contract_type,
+                                   op=op_program)
+
+    def get_processes(self):
+        url = reverse("changeopprocess-list")
+        return self._make_request(self.client, self.GET_REQUEST, url, {}, HTTP_200_OK)
+
+    def test_server_timing_header(self):
+        self.login_dtpm_viewer_user()
+        with self.assertNoLogs("opct.middleware"):
+            response = self.get_processes()
+
+        match = re.match(r'^db;dur=([\d.]+);desc="(\d+) queries", serializer;dur=([\d.]+), total;dur=([\d.]+)$',
+                         response["Server-Timing"])
+        self.assertIsNotNone(match)
+        self.assertGreater(int(match.group(2)), 0)
+        self.assertGreater(float(match.group(3)), 0)
+        self.assertGreaterEqual(float(match.group(4)), float(match.group(1)))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_requests_are_logged(self):
+        self.login_dtpm_viewer_user()
+        with self.assertLogs("opct.middleware", "WARNING") as logs:
+            self.get_processes()
+
+        self.assertEqual(1, len(logs.records))
+        self.assertIn("slow request GET /api/change-op-processes/ (changeopprocess-list)", logs.output[0])
@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload, MemoryFileUploadHandler, \
+    TemporaryFileUploadHandler
+
+from opct.metrics import observe_upload
+from rest_api.exceptions import UploadTooLarge
+
+
+def to_megabytes(size):
+    return size // (1024 * 1024)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    Enforce MESSAGE_FILE_MAX_SIZE per file and MESSAGE_MAX_SIZE for all files of a request while the body is read.
+    It has to be the first upload handler: when a limit is exceeded it stops the upload before other handlers write
+    the chunk, the parser closes the open files (removing temporary files) and the request fails with
+    UploadTooLarge.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.file_size = 0
+        self.total_size = 0
+        self.start = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.start = time.monotonic()
+        # body can not fit, reject it without reading anything
+        if content_length > settings.MESSAGE_MAX_SIZE + settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+            raise UploadTooLarge("Los archivos no pueden tener un tamaño total superior a {0} MB.".format(
+                to_megabytes(settings.MESSAGE_MAX_SIZE)))
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file_size = 0
+        if self.content_length is not None and self.content_length > settings.MESSAGE_FILE_MAX_SIZE:
+            self.stop_file_too_large()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_size += len(raw_data)
+        self.total_size += len(raw_data)
+        if self.file_size > settings.MESSAGE_FILE_MAX_SIZE:
+            self.stop_file_too_large()
+        if self.total_size > settings.MESSAGE_MAX_SIZE:
+            self.error = "Los archivos no pueden tener un tamaño total superior a {0} MB.".format(
+                to_megabytes(settings.MESSAGE_MAX_SIZE))
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def stop_file_too_large(self):
+        self.error = 'Archivo "{0}" no puede tener un tamaño superior a {1} MB.'.format(
+            self.file_name, to_megabytes(settings.MESSAGE_FILE_MAX_SIZE))
+        raise StopUpload(connection_reset=True)
+
+    def file_complete(self, file_size):
+        return None
+
+    def upload_complete(self):
+        if self.error is not None:
+            raise UploadTooLarge(self.error)
+        if self.total_size:
+            observe_upload("multipart", self.total_size, time.monotonic() - self.start)
+
+
+class Sha256UploadHandlerMixin:
+    """
+    Compute SHA-256 of each file while it is received, it is available as `sha256` attribute of the uploaded file
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        result = super().receive_data_chunk(raw_data, start)
+        # None means the chunk was kept by this handler
+        if result is None:
+            self.sha256.update(raw_data)
+        return result
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class Sha256MemoryFileUploadHandler(Sha256UploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class Sha256TemporaryFileUploadHandler(Sha256UploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def get_message_upload_handlers(request):
+    """
+    Upload handlers of message files, they replace the default ones before the request body is read
+    """
+    return [SizeLimitUploadHandler(request), Sha256MemoryFileUploadHandler(request),
+            Sha256TemporaryFileUploadHandler(request)]
@@ -1,27 +1,53 @@
+import io
 import json
 import logging
-
+import mimetypes
+import os
+import re
+import time
+import zipfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
-from django.db.models import Q, Count
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from django.forms.models import model_to_dict
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, ParseError, ValidationError
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_409_CONFLICT
 
+from opct.metrics import observe_upload
+from rest_api.exceptions import CustomValidation
+from rest_api.filters import ChangeOPProcessFilter
 from rest_api.models import OperationProgram, ChangeOPRequest, ChangeOPRequestStatus, \
     ChangeOPProcessMessage, ChangeOPProcessMessageFile, ChangeOPProcess, ChangeOPProcessStatus, \
-    ChangeOPProcessLog, OPChangeLog, ChangeOPRequestLog, ChangeOPProcessDeadline
+    ChangeOPProcessLog, OPChangeLog, ChangeOPRequestLog, ChangeOPProcessDeadline, ChangeOPProcessMessageUpload, \
+    FileBlob, NotificationEvent
 from rest_api.serializers import OPChangeLogSerializer, ChangeOPProcessMessageSerializer, \
     CreateChangeOPProcessMessageSerializer, ChangeOPProcessMessageFileSerializer, ChangeOPProcessSerializer, \
     ChangeOPProcessStatusSerializer, ChangeOPProcessDetailSerializer, ChangeOPProcessCreateSerializer, \
-    ChangeOPProcessLogSerializer, ChangeOPRequestCreateWithStatusAndOPSerializer
+    ChangeOPProcessLogSerializer, ChangeOPRequestCreateWithStatusAndOPSerializer, ChangeOPProcessMessageUploadSerializer
+from rest_api.upload_handlers import get_message_upload_handlers
 
 logger = logging.getLogger(__name__)
 
+# formats already compressed, they are stored in zip bundles without compressing them again
+COMPRESSED_EXTENSIONS = {".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".xlsx", ".xlsm", ".docx", ".pptx",
+                         ".ods", ".odt", ".kmz", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".mp4", ".avi",
+                         ".mov", ".pdf"}
+ZIP_CHUNK_SIZE = 64 * 1024
+
+CONTENT_RANGE_REGEX = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+UPLOAD_ID_PATH = r"uploads/(?P<upload_id>[0-9a-f-]+)"
+
 
 class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
                              viewsets.GenericViewSet):
@@ -29,18 +55,27 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
     API endpoint that allows Change OP Process to be viewed, created and updated.
     """
     queryset = ChangeOPProcess.objects.order_by("-created_at")
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_class = ChangeOPProcessFilter
     search_fields = ["id", "title", 'counterpart__name', 'creator__organization__name', 'contract_type__name']
 
+    def initialize_request(self, request, *args, **kwargs):
+        # message files are limited and hashed while they are received, other requests keep default handlers
+        if self.action_map.get(request.method.lower()) == "add_message":
+            request.upload_handlers = get_message_upload_handlers(request)
+        return super().initialize_request(request, *args, **kwargs)
+
     def get_queryset(self):
-        queryset = ChangeOPProcess.objects.order_by("-created_at")
-        user = self.request.user
-        user_organization = user.organization
-        queryset = self.filter_queryset(queryset).filter(
-            Q(counterpart=user_organization) | Q(creator__organization=user_organization))
+        queryset = ChangeOPProcess.objects.visible_to(self.request.user.organization).order_by("-created_at")
 
         if self.action == 'list':
-            return queryset.annotate(change_op_requests_count=Count('change_op_requests'))
+            # correlated subquery keeps the count independent of the joins added by visibility and search filters
+            change_op_requests_count = ChangeOPRequest.objects.filter(change_op_process=OuterRef('pk')).order_by(). \
+                values('change_op_process').annotate(count=Count('pk')).values('count')
+            return queryset.annotate(
+                change_op_requests_count=Coalesce(Subquery(change_op_requests_count, output_field=IntegerField()), 0))
+        elif self.action == 'retrieve':
+            return queryset.prefetch_related("change_op_process_messages__change_op_process_message_files__blob")
         return queryset
 
     def get_serializer_class(self):
@@ -81,26 +116,31 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
         if previous_operation_program is not None and new_operation_program_key == previous_operation_program.pk:
             return Response(serializer.data, status=HTTP_200_OK)
 
-        obj.operation_program = new_operation_program
-        if update_deadlines or new_op_release_date is None:
-            obj.op_release_date = new_op_release_date
-        obj.save()
-
-        if update_deadlines or new_op_release_date is None:
-            ChangeOPProcessDeadline.objects.update_deadlines(obj)
+        with transaction.atomic():
+            obj.operation_program = new_operation_program
+            if update_deadlines or new_op_release_date is None:
+                obj.op_release_date = new_op_release_date
+            obj.save()
 
-        if update_deadlines:
-            log_type = ChangeOPProcessLog.OP_CHANGE_WITH_DEADLINE_UPDATED
-        else:
-            log_type = ChangeOPProcessLog.OP_CHANGE
-        previous_data = dict(date='', type='')
-        if previous_operation_program is not None:
-            previous_data = dict(date=str(previous_operation_program.start_at),
-                                 type=previous_operation_program.op_type.name)
-        ChangeOPProcessLog.objects.create(
-            created_at=timezone.now(), user=request.user, change_op_process=obj, type=log_type,
-            previous_data=previous_data,
-            new_data=new_log_data)
+            if update_deadlines or new_op_release_date is None:
+                ChangeOPProcessDeadline.objects.update_deadlines(obj)
+
+            if update_deadlines:
+                log_type = ChangeOPProcessLog.OP_CHANGE_WITH_DEADLINE_UPDATED
+            else:
+                log_type = ChangeOPProcessLog.OP_CHANGE
+            previous_data = dict(date='', type='')
+            if previous_operation_program is not None:
+                previous_data = dict(date=str(previous_operation_program.start_at),
+                                     type=previous_operation_program.op_type.name)
+            ChangeOPProcessLog.objects.create(
+                created_at=timezone.now(), user=request.user, change_op_process=obj, type=log_type,
+                previous_data=previous_data,
+                new_data=new_log_data)
+            NotificationEvent.objects.add(
+                NotificationEvent.OP_CHANGE, request.user, obj,
+                "Programa de operación cambió de {0} a {1}".format(
+                    previous_data["date"] or "ninguno", new_log_data["date"] or "ninguno"))
         return Response(serializer.data, status=HTTP_200_OK)
 
     @action(detail=True, methods=["put"], url_path="change-status")
@@ -111,12 +151,17 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
         try:
             new_status = ChangeOPProcessStatus.objects.get(pk=new_status_key)
             previous_status = obj.status
-            obj.status = new_status
-            obj.save()
-            ChangeOPProcessLog.objects.create(created_at=timezone.now(), user=request.user,
-                                              type=ChangeOPProcessLog.STATUS_CHANGE,
-                                              previous_data=dict(value=previous_status.name),
-                                              new_data=dict(value=new_status.name), change_op_process=obj)
+            with transaction.atomic():
+                obj.status = new_status
+                obj.save()
+                ChangeOPProcessDeadline.objects.update_resolution(obj)
+                ChangeOPProcessLog.objects.create(created_at=timezone.now(), user=request.user,
+                                                  type=ChangeOPProcessLog.STATUS_CHANGE,
+                                                  previous_data=dict(value=previous_status.name),
+                                                  new_data=dict(value=new_status.name), change_op_process=obj)
+                NotificationEvent.objects.add(
+                    NotificationEvent.STATUS_CHANGE, request.user, obj,
+                    "Estado cambió de \"{0}\" a \"{1}\"".format(previous_status.name, new_status.name))
             serializer = ChangeOPProcessSerializer(queryset, context={"request": request}, many=True)
             return Response(serializer.data, status=HTTP_200_OK)
         except ChangeOPProcessStatus.DoesNotExist:
@@ -129,23 +174,40 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
             with transaction.atomic():
                 message = request.data.get("message", "")
                 files = request.FILES.getlist("files", [])
+                uploads = json.loads(request.data.get("uploads", "[]"))
                 related_requests = json.loads(request.data.get("related_requests", "[]"))
                 if len(related_requests) == 0:
                     raise ValidationError('Mensaje debe estar relacionado a una o más solicitudes de modificación')
-                if message == "" and len(files) == 0:
+                if message == "" and len(files) == 0 and len(uploads) == 0:
                     raise ValidationError('Mensaje no puede ser vacío')
 
+                # everything is validated before writing any file, so a rollback can not leave orphan files
+                for file in files:
+                    if file.size > settings.MESSAGE_FILE_MAX_SIZE:
+                        raise ValidationError('Archivo "{0}" no puede tener un tamaño superior a {1} MB.'.format(
+                            file.name, settings.MESSAGE_FILE_MAX_SIZE // (1024 * 1024)))
+                change_op_request_objs = list(ChangeOPRequest.objects.filter(change_op_process=obj,
+                                                                             pk__in=related_requests))
+                if len(change_op_request_objs) != len(set(related_requests)):
+                    raise ChangeOPRequest.DoesNotExist("ChangeOPRequest matching query does not exist.")
+                upload_objs = list(ChangeOPProcessMessageUpload.objects.filter(
+                    pk__in=uploads, creator=request.user, change_op_process=obj, completed=True))
+                if len(upload_objs) != len(set(uploads)):
+                    raise ValidationError('Uno de los archivos no existe o su carga no ha finalizado')
+
                 message_obj = ChangeOPProcessMessage.objects.create(creator=request.user, message=message,
                                                                     change_op_process=obj)
+                message_obj.related_requests.add(*change_op_request_objs)
                 for file in files:
-                    if file.size > 1024 * 1024 * 300:
-                        raise ValidationError(
-                            'Archivo "{0}" no puede tener un tamaño superior a 10 MB.'.format(file.name))
-                    ChangeOPProcessMessageFile.objects.create(filename=file.name, file=file, size=file.size,
-                                                              change_op_process_message=message_obj)
-                for related_request in related_requests:
-                    change_op_request_obj = ChangeOPRequest.objects.get(change_op_process=obj, pk=related_request)
-                    message_obj.related_requests.add(change_op_request_obj)
+                    ChangeOPProcessMessageFile.objects.create_from_file(file, message_obj)
+                for upload_obj in upload_objs:
+                    ChangeOPProcessMessageFile.objects.create_from_upload(upload_obj, message_obj)
+                    upload_obj.delete()
+                file_count = len(files) + len(upload_objs)
+                NotificationEvent.objects.add(
+                    NotificationEvent.NEW_MESSAGE, request.user, obj,
+                    "Nuevo mensaje{0}: {1}".format(" con {0} archivo(s)".format(file_count) if file_count else "",
+                                                   message[:200]))
         except ChangeOPRequest.DoesNotExist as e:
             logger.error(e)
             raise ParseError(detail="Una de las solicitudes de modificación no existe")
@@ -155,6 +217,119 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
 
         return Response(None, status=HTTP_201_CREATED)
 
+    def get_upload(self, change_op_process_obj, upload_id, for_update=False):
+        queryset = ChangeOPProcessMessageUpload.objects.filter(change_op_process=change_op_process_obj,
+                                                               creator=self.request.user)
+        if for_update:
+            queryset = queryset.select_for_update()
+        try:
+            return queryset.get(pk=upload_id)
+        except (ChangeOPProcessMessageUpload.DoesNotExist, DjangoValidationError):
+            raise NotFound()
+
+    def get_upload_data(self, upload_obj):
+        data = ChangeOPProcessMessageUploadSerializer(upload_obj).data
+        if upload_obj.direct and not upload_obj.completed:
+            data["upload"] = get_file_storage().get_presigned_upload(upload_obj.get_storage_name(), upload_obj.size,
+                                                                     upload_obj.sha256)
+        return data
+
+    @action(detail=True, methods=["post"], url_path="uploads")
+    def create_upload(self, request, *args, **kwargs):
+        """
+        Start a resumable upload of a file for a future message. Send chunks with `PUT uploads/<id>/` and a
+        `Content-Range: bytes <start>-<end>/<size>` header, then call `POST uploads/<id>/finalize/`.
+        If `sha256` is given and storage accepts direct uploads, answer includes `upload` with the url, method and
+        headers to send the whole file straight to storage instead of sending chunks
+        """
+        obj = self.get_object()
+        serializer = ChangeOPProcessMessageUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        direct = supports_direct_upload(get_file_storage()) and bool(serializer.validated_data.get("sha256"))
+        upload_obj = serializer.save(creator=request.user, change_op_process=obj, direct=direct)
+        return Response(self.get_upload_data(upload_obj), status=HTTP_201_CREATED)
+
+    @action(detail=True, methods=["get"], url_path=UPLOAD_ID_PATH)
+    def upload(self, request, upload_id=None, *args, **kwargs):
+        upload_obj = self.get_upload(self.get_object(), upload_id)
+        return Response(self.get_upload_data(upload_obj), status=HTTP_200_OK)
+
+    @upload.mapping.put
+    def upload_chunk(self, request, upload_id=None, *args, **kwargs):
+        obj = self.get_object()
+        content_range = CONTENT_RANGE_REGEX.match(request.META.get("HTTP_CONTENT_RANGE", ""))
+        if content_range is None:
+            raise ParseError("Encabezado Content-Range inválido")
+        start, end, size = [int(value) for value in content_range.groups()]
+        length = end - start + 1
+        if length <= 0 or end >= size:
+            raise ParseError("Encabezado Content-Range inválido")
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            raise ParseError("Fragmento no puede tener un tamaño superior a {0} MB.".format(
+                settings.UPLOAD_CHUNK_MAX_SIZE // (1024 * 1024)))
+
+        with transaction.atomic():
+            upload_obj = self.get_upload(obj, upload_id, for_update=True)
+            if upload_obj.completed:
+                raise CustomValidation(detail="La carga del archivo ya finalizó", field="detail",
+                                       status_code=HTTP_409_CONFLICT)
+            if upload_obj.direct:
+                raise ParseError("El archivo se debe subir directamente al almacenamiento")
+            if size != upload_obj.size:
+                raise ParseError("El tamaño del archivo no coincide con el de la carga")
+            if start > upload_obj.offset:
+                # client has to resume from the offset already received
+                raise CustomValidation(detail=upload_obj.offset, field="offset", status_code=HTTP_409_CONFLICT)
+            chunk_start = time.monotonic()
+            written = upload_obj.write_chunk(request.stream, start, length)
+            observe_upload("chunk", written, time.monotonic() - chunk_start)
+            upload_obj.save()
+
+        return Response(ChangeOPProcessMessageUploadSerializer(upload_obj).data, status=HTTP_200_OK)
+
+    @upload.mapping.delete
+    def delete_upload(self, request, upload_id=None, *args, **kwargs):
+        upload_obj = self.get_upload(self.get_object(), upload_id)
+        upload_obj.delete()
+        return Response(None, status=HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"], url_path=UPLOAD_ID_PATH + "/finalize")
+    def finalize_upload(self, request, upload_id=None, *args, **kwargs):
+        obj = self.get_object()
+        with transaction.atomic():
+            upload_obj = self.get_upload(obj, upload_id, for_update=True)
+            if upload_obj.direct and not upload_obj.completed:
+                try:
+                    upload_obj.offset = get_file_storage().size(upload_obj.get_storage_name())
+                except FileNotFoundError:
+                    upload_obj.offset = 0
+                if upload_obj.offset != upload_obj.size:
+                    # storage has not received the file yet
+                    raise CustomValidation(detail=0, field="offset", status_code=HTTP_409_CONFLICT)
+            if upload_obj.offset != upload_obj.size:
+                raise CustomValidation(detail=upload_obj.offset, field="offset", status_code=HTTP_409_CONFLICT)
+            if not upload_obj.completed and not upload_obj.direct:
+                upload_obj.compute_sha256()
+            upload_obj.completed = True
+            upload_obj.updated_at = timezone.now()
+            upload_obj.save()
+
+        return Response(self.get_upload_data(upload_obj), status=HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="attachments.zip")
+    def attachments_zip(self, request, *args, **kwargs):
+        """
+        Every file of process messages in one zip file, it is built while it is sent
+        """
+        obj = self.get_object()
+        message_file_objs = ChangeOPProcessMessageFile.objects.filter(change_op_process_message__change_op_process=obj). \
+            select_related("change_op_process_message", "blob").order_by("change_op_process_message__created_at", "id")
+        response = StreamingHttpResponse(stream_zip(message_file_objs.iterator()), content_type="application/zip")
+        response["Content-Disposition"] = get_content_disposition("proceso_{0}.zip".format(obj.pk))
+        # let nginx send bytes as soon as they are generated
+        response["X-Accel-Buffering"] = "no"
+        return response
+
     @action(detail=True, methods=["post"], url_path="create-change-op-request")
     def create_change_op_request(self, request, *args, **kwargs):
         obj = self.get_object()
@@ -165,22 +340,25 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
 
             serializer = ChangeOPRequestCreateWithStatusAndOPSerializer(data=change_op_request)
             serializer.is_valid(raise_exception=True)
-            copr = serializer.save(creator=request.user, change_op_process=obj)
-
-            copr.related_requests.set(related_requests)
-            operation_program_data = dict(date="", type="")
-            if copr.operation_program:
-                operation_program_data = dict(date=copr.operation_program.start_at.strftime('%d-%m-%Y'),
-                                              type=copr.operation_program.op_type.name)
-            ChangeOPRequestLog.objects.create(created_at=timezone.now(), user=request.user,
-                                              change_op_request=copr,
-                                              type=ChangeOPRequestLog.CHANGE_OP_REQUEST_CREATION,
-                                              previous_data=dict(),
-                                              new_data=dict(title=copr.title,
-                                                            reason=copr.get_reason_display(),
-                                                            related_routes=", ".join(copr.related_routes),
-                                                            operation_program=operation_program_data,
-                                                            status=copr.status.name))
+            with transaction.atomic():
+                copr = serializer.save(creator=request.user, change_op_process=obj)
+
+                copr.related_requests.set(related_requests)
+                operation_program_data = dict(date="", type="")
+                if copr.operation_program:
+                    operation_program_data = dict(date=copr.operation_program.start_at.strftime('%d-%m-%Y'),
+                                                  type=copr.operation_program.op_type.name)
+                ChangeOPRequestLog.objects.create(created_at=timezone.now(), user=request.user,
+                                                  change_op_request=copr,
+                                                  type=ChangeOPRequestLog.CHANGE_OP_REQUEST_CREATION,
+                                                  previous_data=dict(),
+                                                  new_data=dict(title=copr.title,
+                                                                reason=copr.get_reason_display(),
+                                                                related_routes=", ".join(copr.related_routes),
+                                                                operation_program=operation_program_data,
+                                                                status=copr.status.name))
+                NotificationEvent.objects.add(NotificationEvent.NEW_CHANGE_OP_REQUEST, request.user, obj,
+                                              "Nueva solicitud de cambio: {0}".format(copr.title))
 
             return Response(None, status=HTTP_200_OK)
         except ChangeOPRequestStatus.DoesNotExist:
@@ -255,14 +433,130 @@ class ChangeOPProcessViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
             raise NotFound()
 
 
+def get_content_disposition(filename):
+    try:
+        filename.encode("ascii")
+        return 'attachment; filename="{0}"'.format(filename.replace("\\", "\\\\").replace('"', '\\"'))
+    except UnicodeEncodeError:
+        return "attachment; filename*=utf-8''{0}".format(quote(filename))
+
+
+def get_file_storage():
+    return FileBlob._meta.get_field("file").storage
+
+
+def supports_direct_upload(storage):
+    return hasattr(storage, "get_presigned_upload")
+
+
+def get_attachment_response(field_file, filename, content_type=None):
+    """
+    Response to download a message file. Storages with direct access redirect to a presigned url, with
+    X-Accel-Redirect nginx sends the bytes from its internal location and answers range and conditional requests,
+    otherwise Django streams the file.
+    """
+    content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    storage = field_file.storage
+    if supports_direct_upload(storage):
+        response = HttpResponseRedirect(storage.url(field_file.name, filename=filename))
+        response["Cache-Control"] = "private, no-store"
+        return response
+    if settings.USE_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(settings.PROTECTED_MEDIA_URL + field_file.name)
+    else:
+        response = FileResponse(field_file.open("rb"), content_type=content_type)
+    response["Content-Disposition"] = get_content_disposition(filename)
+    response["Cache-Control"] = "private, max-age={0}".format(settings.ATTACHMENT_CACHE_MAX_AGE)
+    return response
+
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Unseekable file where zipfile writes, its content is taken out after each write to send it"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def get_zip_name(message_file_obj, used_names):
+    message_obj = message_file_obj.change_op_process_message
+    folder = "{0}_{1}".format(timezone.localtime(message_obj.created_at).strftime("%Y-%m-%d_%H%M%S"),
+                              message_obj.pk)
+    name, extension = os.path.splitext(message_file_obj.filename)
+    zip_name = "{0}/{1}{2}".format(folder, name, extension)
+    index = 1
+    while zip_name in used_names:
+        index += 1
+        zip_name = "{0}/{1} ({2}){3}".format(folder, name, index, extension)
+    used_names.add(zip_name)
+    return zip_name
+
+
+def stream_zip(message_file_objs):
+    """
+    Generator of a zip file with message files, it reads and sends one chunk at a time so memory use is constant
+    """
+    buffer = ZipStreamBuffer()
+    used_names = set()
+    with zipfile.ZipFile(buffer, mode="w") as zip_file:
+        for message_file_obj in message_file_objs:
+            zip_info = zipfile.ZipInfo(get_zip_name(message_file_obj, used_names),
+                                       timezone.localtime(message_file_obj.change_op_process_message.created_at).
+                                       timetuple()[:6])
+            zip_info.file_size = message_file_obj.size
+            if os.path.splitext(message_file_obj.filename)[1].lower() in COMPRESSED_EXTENSIONS:
+                zip_info.compress_type = zipfile.ZIP_STORED
+            else:
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+            with message_file_obj.file.open("rb") as source, zip_file.open(zip_info, mode="w") as entry:
+                for chunk in iter(lambda: source.read(ZIP_CHUNK_SIZE), b""):
+                    entry.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+    # central directory
+    yield buffer.pop()
+
+
 class ChangeOPProcessMessageFileViewset(viewsets.ReadOnlyModelViewSet):
     """
-    API endpoint that allows ChangeOPProcessMessageFile to be viewed.
+    API endpoint that allows ChangeOPProcessMessageFile to be viewed and downloaded.
+    Only files of processes visible by user organization are available.
     """
 
     queryset = ChangeOPProcessMessageFile.objects.all()
     serializer_class = ChangeOPProcessMessageFileSerializer
 
+    def get_queryset(self):
+        visible_processes = ChangeOPProcess.objects.visible_to(self.request.user.organization).values("pk")
+        return ChangeOPProcessMessageFile.objects.filter(
+            change_op_process_message__change_op_process__in=visible_processes).select_related("blob").order_by("id")
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, *args, **kwargs):
+        file_obj = self.get_object()
+        return get_attachment_response(file_obj.file, file_obj.filename, content_type=file_obj.blob.mime_type)
+
+    @action(detail=True, methods=["get"])
+    def preview(self, request, *args, **kwargs):
+        file_obj = self.get_object()
+        if not file_obj.blob.preview:
+            raise NotFound("Archivo no tiene vista previa")
+        filename = "{0}.jpg".format(file_obj.filename.rsplit(".", 1)[0])
+        return get_attachment_response(file_obj.blob.preview, filename, content_type="image/jpeg")
+
 
 class ChangeOPProcessLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -300,6 +594,11 @@ class ChangeOPProcessMessageViewSet(viewsets.ReadOnlyModelViewSet, mixins.Create
     queryset = ChangeOPProcessMessage.objects.all().order_by("-created_at")
     serializer_class = ChangeOPProcessMessageSerializer
 
+    def initialize_request(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) == "create":
+            request.upload_handlers = get_message_upload_handlers(request)
+        return super().initialize_request(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         # TODO: no se usa, fue reemplazado por una acción en el viewset de changeOPProcess
         serializer = CreateChangeOPProcessMessageSerializer(data=request.data, context={"request": request})
@@ -309,8 +608,7 @@ class ChangeOPProcessMessageViewSet(viewsets.ReadOnlyModelViewSet, mixins.Create
         try:
             files = request.FILES.getlist("files")
             for file in files:
-                ChangeOPProcessMessageFile.objects.create(filename=file.name, file=file,
-                                                          change_op_process_message=change_op_process_message)
+                ChangeOPProcessMessageFile.objects.create_from_file(file, change_op_process_message)
         except Exception as e:
             errors.append(e)
         headers = self.get_success_headers(serializer.data)
@@ -1,9 +1,12 @@
+from collections import defaultdict, deque
+
+from django.db import transaction
 from django.urls import reverse as reverse_url
 from django.utils import timezone
 from rest_framework import filters
 from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.status import (
@@ -11,9 +14,17 @@ from rest_framework.status import (
     HTTP_201_CREATED,
 )
 
-from rest_api.models import OperationProgram, ChangeOPRequest, ChangeOPRequestStatus, ChangeOPRequestLog
+from rest_api.models import OperationProgram, ChangeOPRequest, ChangeOPRequestStatus, ChangeOPRequestLog, \
+    NotificationEvent
 from rest_api.serializers import ChangeOPRequestSerializer, ChangeOPRequestStatusSerializer, \
-    ChangeOPRequestDetailSerializer, ChangeOPRequestCreateSerializer
+    ChangeOPRequestDetailSerializer, ChangeOPRequestCreateSerializer, ChangeOPRequestDetailMiniSerializer
+
+
+def add_notification_event(event_type, user, change_op_request, description):
+    # requests without process have nobody to notify
+    if change_op_request.change_op_process_id is not None:
+        NotificationEvent.objects.add(event_type, user, change_op_request.change_op_process,
+                                      "Solicitud \"{0}\": {1}".format(change_op_request.title, description))
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -43,7 +54,7 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
     serializer_class = ChangeOPRequestSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = [
-        "op__start_at",
+        "operation_program__start_at",
         "id",
         "title",
         "reason",
@@ -58,7 +69,6 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
         return self.get_paginated_response(serializer.data)
 
     def create(self, request, *args, **kwargs):
-        # TODO: send email
         contract_type_id = request.data["contract_type"].split("/")[-2]
         if contract_type_id == "3":
             contract_type_id = "2"
@@ -74,12 +84,9 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
             data=data, context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
-        change_op_request = serializer.save()
-        errors = []
-        try:
-            pass
-        except Exception as e:
-            errors.append(e)
+        with transaction.atomic():
+            change_op_request = serializer.save()
+            add_notification_event(NotificationEvent.NEW_CHANGE_OP_REQUEST, request.user, change_op_request, "creada")
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=HTTP_201_CREATED, headers=headers)
 
@@ -92,7 +99,6 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
 
     @action(detail=True, methods=["put"], url_path="change-op")
     def change_op(self, request, *args, **kwargs):
-        # TODO: send email
         obj = self.get_object()
         new_op_key = request.data.get("op")
         queryset = self.get_queryset()
@@ -112,12 +118,16 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
             else:
                 if new_op_key == previous_op:
                     return Response(serializer.data, status=HTTP_200_OK)
-            obj.op = new_op
-            obj.save()
-            ChangeOPRequestLog.objects.create(
-                created_at=timezone.now(), user=request.user, type=ChangeOPRequestLog.OP_CHANGE, change_op_request=obj,
-                previous_data=dict(date=str(previous_op.start_at), type=previous_op.op_type.name),
-                new_data=dict(date=str(new_op.start_at), type=new_op.op_type.name))
+            with transaction.atomic():
+                obj.op = new_op
+                obj.save()
+                ChangeOPRequestLog.objects.create(
+                    created_at=timezone.now(), user=request.user, type=ChangeOPRequestLog.OP_CHANGE,
+                    change_op_request=obj,
+                    previous_data=dict(date=str(previous_op.start_at), type=previous_op.op_type.name),
+                    new_data=dict(date=str(new_op.start_at), type=new_op.op_type.name))
+                add_notification_event(NotificationEvent.CHANGE_OP_REQUEST_CHANGE, request.user, obj,
+                                       "programa de operación cambió a {0}".format(new_op.start_at))
             return Response(serializer.data, status=HTTP_200_OK)
         except OperationProgram.DoesNotExist:
             raise NotFound()
@@ -130,11 +140,15 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
         try:
             new_status = ChangeOPRequestStatus.objects.get(pk=new_status_key)
             previous_status = obj.status
-            obj.status = new_status
-            obj.save()
-            ChangeOPRequestLog.objects.create(
-                created_at=timezone.now(), user=request.user, type=ChangeOPRequestLog.STATUS_CHANGE,
-                change_op_request=obj, previous_data=dict(value=previous_status), new_data=dict(value=new_status))
+            with transaction.atomic():
+                obj.status = new_status
+                obj.save()
+                ChangeOPRequestLog.objects.create(
+                    created_at=timezone.now(), user=request.user, type=ChangeOPRequestLog.STATUS_CHANGE,
+                    change_op_request=obj, previous_data=dict(value=previous_status), new_data=dict(value=new_status))
+                add_notification_event(NotificationEvent.CHANGE_OP_REQUEST_CHANGE, request.user, obj,
+                                       "estado cambió de \"{0}\" a \"{1}\"".format(previous_status.name,
+                                                                                     new_status.name))
             serializer = ChangeOPRequestSerializer(queryset, context={"request": request}, many=True)
             return Response(serializer.data, status=HTTP_200_OK)
         except ChangeOPRequestStatus.DoesNotExist:
@@ -174,3 +188,44 @@ class ChangeOPRequestViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
             return Response(None, status=HTTP_200_OK)
         except ChangeOPRequestStatus.DoesNotExist:
             raise NotFound()
+
+    @action(detail=True, methods=["get"], url_path="related-graph")
+    def related_graph(self, request, *args, **kwargs):
+        """
+        Requests connected to this one through related requests. Use `depth` to get only requests up to that
+        number of hops away, otherwise the whole connected component is returned.
+        """
+        obj = self.get_object()
+        depth = request.query_params.get("depth", None)
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                raise ParseError("Profundidad debe ser un número entero")
+            if depth < 0:
+                raise ParseError("Profundidad debe ser mayor o igual a cero")
+
+        request_ids = ChangeOPRequest.objects.get_related_request_ids(obj, depth)
+        edges = ChangeOPRequest.objects.get_related_request_edges(request_ids)
+
+        # hops from obj to every request in the graph
+        neighbours = defaultdict(list)
+        for from_id, to_id in edges:
+            neighbours[from_id].append(to_id)
+            neighbours[to_id].append(from_id)
+        depths = {obj.pk: 0}
+        pending = deque([obj.pk])
+        while pending:
+            current_id = pending.popleft()
+            for neighbour_id in neighbours[current_id]:
+                if neighbour_id not in depths:
+                    depths[neighbour_id] = depths[current_id] + 1
+                    pending.append(neighbour_id)
+
+        queryset = ChangeOPRequest.objects.filter(pk__in=request_ids).select_related("operation_program__op_type"). \
+            order_by("id")
+        nodes = ChangeOPRequestDetailMiniSerializer(queryset, context={"request": request}, many=True).data
+        for node in nodes:
+            node["depth"] = depths.get(node["id"])
+
+        return Response(dict(nodes=nodes, edges=edges), status=HTTP_200_OK)
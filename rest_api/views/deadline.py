@@ -0,0 +1,59 @@
+import datetime
+
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ParseError
+from rest_framework.generics import ListAPIView
+
+from rest_api.models import ChangeOPProcess, ChangeOPProcessDeadline
+from rest_api.serializers import DeadlineSerializer
+
+
+def get_date_param(query_params, name, default=None):
+    value = query_params.get(name)
+    if not value:
+        return default
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ParseError("Parámetro \"{0}\" debe ser una fecha con formato AAAA-MM-DD".format(name))
+    return date
+
+
+class DeadlineAPIView(ListAPIView):
+    """
+    API endpoint to list deadlines of processes visible by user organization, sorted by date.
+    Dates are filtered with `from` (today by default) and `to` query parameters, both included. Response includes
+    how many deadlines of each operation program status there are in range.
+    """
+    serializer_class = DeadlineSerializer
+
+    def get_queryset(self):
+        date_from = get_date_param(self.request.query_params, "from", timezone.localdate())
+        date_to = get_date_param(self.request.query_params, "to")
+
+        visible_process_ids = ChangeOPProcess.objects.visible_to(self.request.user.organization).values("pk")
+        queryset = ChangeOPProcessDeadline.objects.filter(
+            change_op_process__in=visible_process_ids,
+            deadline__gte=timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min)))
+        if date_to is not None:
+            queryset = queryset.filter(deadline__lt=timezone.make_aware(
+                datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min)))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        counts = queryset.order_by().values(
+            "operation_program_deadline").annotate(name=F("operation_program_deadline__name"), count=Count("pk")). \
+            order_by("operation_program_deadline")
+
+        page = self.paginate_queryset(queryset.select_related(
+            "operation_program_deadline", "change_op_process").order_by("deadline", "pk"))
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data["counts"] = [dict(id=row["operation_program_deadline"], name=row["name"], count=row["count"])
+                                   for row in counts]
+        return response
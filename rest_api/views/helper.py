@@ -1,5 +1,4 @@
 from django.contrib.auth import get_user_model
-from django.core.management import call_command
 from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
@@ -167,16 +166,3 @@ def verify(request):
     user_data = UserSerializer(model_user, context={"request": request}).data
     user_data.update({"token": token, "error": None})
     return JsonResponse(user_data, status=HTTP_200_OK)
-
-
-@api_view(["GET"])
-@permission_classes((AllowAny,))
-def send_email(request):
-    subject = "test"
-    body = """
-    Hola, este es un mensaje de prueba
-    """
-    users = User.objects.all()
-    call_command("sendemail", "--sync", subject, body, *[user.pk for user in users])
-
-    return JsonResponse({"user": str(request.user)}, status=HTTP_200_OK)
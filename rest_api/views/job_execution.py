@@ -0,0 +1,23 @@
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from rest_api.filters import JobExecutionFilter
+from rest_api.serializers import JobExecutionSerializer
+from rqworkers.models import SendMailJobExecution
+
+
+class JobExecutionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint to view email job executions, latest first. Only staff users can access it.
+    """
+    queryset = SendMailJobExecution.objects.all().order_by("-enqueueTimestamp", "-pk")
+    serializer_class = JobExecutionSerializer
+    permission_classes = [IsAdminUser]
+    filterset_class = JobExecutionFilter
+
+    @action(detail=False)
+    def metrics(self, request):
+        """Aggregate metrics of executions that match filters, times are given in seconds"""
+        return Response(self.filter_queryset(self.get_queryset()).get_metrics())
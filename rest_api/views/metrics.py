@@ -0,0 +1,30 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, Http404, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess
+
+from rqworkers.metrics import QueueCollector
+
+
+@require_GET
+def metrics(request):
+    """
+    Metrics in Prometheus text format, scrapers have to send `Authorization: Bearer <METRICS_TOKEN>` header.
+    Endpoint is disabled when METRICS_TOKEN is not set
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), "Bearer " + settings.METRICS_TOKEN):
+        return HttpResponseForbidden()
+
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # values written by every gunicorn worker
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(QueueCollector())
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import filters
 from rest_framework import viewsets
@@ -6,7 +7,8 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_409_CONFLICT, HTTP_204_NO_CONTENT
 
 from rest_api.exceptions import CustomValidation
-from rest_api.models import OperationProgram, OperationProgramType, OPChangeLog, OperationProgramStatus
+from rest_api.models import OperationProgram, OperationProgramType, OPChangeLog, OperationProgramStatus, \
+    NotificationEvent, ChangeOPProcessDeadline
 from rest_api.permissions import HasGroupPermission
 from rest_api.serializers import OperationProgramSerializer, OperationProgramTypeSerializer, \
     OperationProgramDetailSerializer, OPChangeLogSerializer, OperationProgramStatusSerializer, \
@@ -73,7 +75,6 @@ class OperationProgramViewSet(viewsets.ModelViewSet):
             raise NotFound()
 
     def update(self, request, *args, **kwargs):
-        # TODO: send email
         partial = kwargs.pop("partial", False)
         instance = self.get_object()
         latest_op_change_log = OPChangeLog.objects.filter(operation_program=instance).order_by("-created_at").first()
@@ -86,16 +87,28 @@ class OperationProgramViewSet(viewsets.ModelViewSet):
         serializer = OperationProgramCreateSerializer(instance, context={"request": request}, data=request.data,
                                                       partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
-
-        new_data = previous_data.copy()
-        new_data["date"] = instance.start_at.isoformat()
-        new_data["op_type"] = instance.op_type.name
-        try:
+        previous_start_at = instance.start_at
+        with transaction.atomic():
+            self.perform_update(serializer)
+            if instance.start_at != previous_start_at:
+                # processes released with operation program are moved with it
+                instance.change_op_processes.filter(op_release_date=previous_start_at).update(
+                    op_release_date=instance.start_at)
+                ChangeOPProcessDeadline.objects.recompute(
+                    instance.change_op_processes.filter(op_release_date=instance.start_at))
+
+            new_data = previous_data.copy()
+            new_data["date"] = instance.start_at.isoformat()
+            new_data["op_type"] = instance.op_type.name
+            # update is rolled back with its events when change can not be logged
             OPChangeLog.objects.create(created_at=timezone.now(), user=request.user, previous_data=previous_data,
                                        new_data=new_data, operation_program=instance)
-        except Exception as e:
-            print(e)
+            if previous_data != new_data:
+                description = "Programa de operación {0} ({1}) ahora es {2} ({3})".format(
+                    previous_data["date"], previous_data["op_type"], new_data["date"], new_data["op_type"])
+                for change_op_process in instance.change_op_processes.all():
+                    NotificationEvent.objects.add(NotificationEvent.OPERATION_PROGRAM_CHANGE, request.user,
+                                                  change_op_process, description)
         if getattr(instance, "_prefetched_objects_cache", None):
             # If 'prefetch_related' has been applied to a queryset, we need to
             # forcibly invalidate the prefetch cache on the instance.
@@ -2,6 +2,7 @@ import csv
 import gzip
 import io
 import os
+import time
 import zipfile
 
 from django.contrib import messages
@@ -13,14 +14,17 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ParseError
+from rest_framework.exceptions import ParseError, ValidationError
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from rest_api.models import RouteDictionary
+from opct.metrics import observe_import
+from rest_api.filters import ChangeOPRequestFilter
+from rest_api.models import RouteDictionary, ChangeOPRequest, ChangeOPProcess
 from rest_api.permissions import HasGroupPermission
-from rest_api.serializers import RouteDictionarySerializer
+from rest_api.serializers import RouteDictionarySerializer, RouteChangeOPRequestSerializer
+from rest_api.views.change_op_request import StandardResultsSetPagination
 
 
 def upload_csv_op_dictionary(csv_file: InMemoryUploadedFile) -> dict:
@@ -29,6 +33,7 @@ def upload_csv_op_dictionary(csv_file: InMemoryUploadedFile) -> dict:
     Args:
         csv_file: csv op dictionary InMemoryUploadedFile
     """
+    start = time.monotonic()
     file_name_extension = os.path.splitext(csv_file.name)[1]
     if file_name_extension == ".gz":
         csv_file = gzip.open(csv_file)
@@ -45,7 +50,9 @@ def upload_csv_op_dictionary(csv_file: InMemoryUploadedFile) -> dict:
 
     previous_ts_code_in_file = set()
     previous_ts_code_in_db = RouteDictionary.objects.values_list('ts_code', flat=True)
+    rows = 0
     for row in csv_reader:
+        rows += 1
         attributes = dict(ts_code=row['COD_TS'],
                           user_route_code=row['COD_USUARI'],
                           service_name=row['SERVICE_NA'],
@@ -72,6 +79,7 @@ def upload_csv_op_dictionary(csv_file: InMemoryUploadedFile) -> dict:
         RouteDictionary.objects.bulk_create(to_create)
         RouteDictionary.objects.bulk_update(objs_to_update,
                                             ['user_route_code', 'service_name', 'operator', 'updated_at'])
+    observe_import("route_dictionary", rows, time.monotonic() - start)
 
     return {'created': len(to_create), 'updated': len(objs_to_update)}
 
@@ -136,3 +144,22 @@ class RouteDictionaryViewSet(viewsets.ReadOnlyModelViewSet):
                 raise ParseError(message)
 
         return Response(message, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path=r"(?P<ts_code>[^/]+)/change-op-requests")
+    def change_op_requests(self, request, ts_code=None, *args, **kwargs):
+        """
+        Change OP requests visible by user organization that affect the route, it can be filtered by status
+        """
+        visible_processes = ChangeOPProcess.objects.visible_to(request.user.organization).values("pk")
+        queryset = ChangeOPRequest.objects.filter(related_routes__contains=[ts_code],
+                                                  change_op_process__in=visible_processes). \
+            select_related("operation_program__op_type", "status__contract_type").order_by("-created_at")
+        filterset = ChangeOPRequestFilter(request.query_params, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        queryset = filterset.qs
+
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = RouteChangeOPRequestSerializer(page, context={"request": request}, many=True)
+        return paginator.get_paginated_response(serializer.data)
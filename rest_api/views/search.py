@@ -0,0 +1,56 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Value, CharField, TextField
+from django.db.models.functions import Substr
+from rest_framework.exceptions import ParseError
+from rest_framework.generics import ListAPIView
+
+from rest_api.models import ChangeOPProcess, ChangeOPRequest, ChangeOPProcessMessage, SEARCH_CONFIG
+from rest_api.serializers import SearchResultSerializer
+
+CHANGE_OP_PROCESS = "change_op_process"
+CHANGE_OP_REQUEST = "change_op_request"
+CHANGE_OP_PROCESS_MESSAGE = "change_op_process_message"
+
+# max length of message text returned on each hit
+MESSAGE_PREVIEW_LENGTH = 200
+
+
+def get_hits(queryset, hit_type, process_id, text, query):
+    """
+    Rows of the search union. Every queryset has to expose the same annotations in the same order.
+    """
+    return queryset.filter(search_vector=query).annotate(
+        type=Value(hit_type, output_field=CharField()),
+        hit_id=F("pk"),
+        process_id=F(process_id),
+        text=text,
+        created=F("created_at"),
+        rank=SearchRank(F("search_vector"), query),
+    ).values("type", "hit_id", "process_id", "text", "created", "rank")
+
+
+class SearchAPIView(ListAPIView):
+    """
+    API endpoint to search change OP processes, change OP requests and messages by text.
+    Hits are ranked and limited to processes visible by user organization.
+    """
+    serializer_class = SearchResultSerializer
+
+    def get_queryset(self):
+        text = self.request.query_params.get("q", "").strip()
+        if text == "":
+            raise ParseError("Debe indicar un texto a buscar")
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+
+        visible_processes = ChangeOPProcess.objects.visible_to(self.request.user.organization)
+        visible_process_ids = visible_processes.values("pk")
+
+        process_hits = get_hits(visible_processes, CHANGE_OP_PROCESS, "pk",
+                                F("title"), query)
+        request_hits = get_hits(ChangeOPRequest.objects.filter(change_op_process__in=visible_process_ids),
+                                CHANGE_OP_REQUEST, "change_op_process_id", F("title"), query)
+        message_hits = get_hits(ChangeOPProcessMessage.objects.filter(change_op_process__in=visible_process_ids),
+                                CHANGE_OP_PROCESS_MESSAGE, "change_op_process_id",
+                                Substr("message", 1, MESSAGE_PREVIEW_LENGTH, output_field=TextField()), query)
+
+        return process_hits.union(request_hits, message_hits, all=True).order_by("-rank", "-created")
@@ -0,0 +1,72 @@
+import datetime
+
+import django_rq
+from django.conf import settings
+from django.utils import timezone
+
+from rqworkers.jobs import get_retry
+
+DUE_KEY = "notification-digest:due"
+EVENTS_KEY = "notification-digest:events:{0}"
+FLUSH_JOB = "rqworkers.tasks.send_notification_digests_job"
+
+
+class NotificationDigest:
+    """
+    Notification events buffered per user in Redis until the user digest is due.
+    Events of each user are kept in a sorted set scored by creation time, users are kept in a sorted set scored by
+    the time their digest has to be sent. A flush job is scheduled when a user gets a new due time, so workers have
+    to run with scheduler
+    """
+
+    def __init__(self, connection=None):
+        self.queue_name = settings.RQ_JOB_QUEUES["send_notification_digests"]
+        self.connection = connection or django_rq.get_connection(self.queue_name)
+
+    @staticmethod
+    def get_events_key(user_pk):
+        return EVENTS_KEY.format(user_pk)
+
+    def schedule(self, due):
+        queue = django_rq.get_queue(self.queue_name, connection=self.connection)
+        queue.enqueue_at(due, FLUSH_JOB, retry=get_retry())
+
+    def add(self, user, events):
+        """Buffer events for user, adding the same event again has no effect"""
+        due = timezone.now() + datetime.timedelta(minutes=user.notification_frequency)
+        pipeline = self.connection.pipeline()
+        pipeline.zadd(self.get_events_key(user.pk), {event.pk: event.created_at.timestamp() for event in events})
+        # due time is kept while user has events waiting
+        pipeline.zadd(DUE_KEY, {user.pk: due.timestamp()}, nx=True)
+        _, scheduled = pipeline.execute()
+        if scheduled:
+            self.schedule(due)
+
+    def get_due_users(self, now):
+        return [int(user_pk) for user_pk in self.connection.zrangebyscore(DUE_KEY, "-inf", now.timestamp())]
+
+    def get_events(self, user_pk):
+        return [int(event_pk) for event_pk in self.connection.zrange(self.get_events_key(user_pk), 0, -1)]
+
+    def remove(self, user_pk, event_pks, frequency=0):
+        """
+        Remove events already sent. When other events arrived meanwhile user gets a new due time after frequency
+        minutes
+        """
+        events_key = self.get_events_key(user_pk)
+        due = timezone.now() + datetime.timedelta(minutes=frequency)
+
+        def remove_events(pipeline):
+            pending = set(pipeline.zrange(events_key, 0, -1)) - {str(event_pk).encode() for event_pk in event_pks}
+            pipeline.multi()
+            if event_pks:
+                pipeline.zrem(events_key, *event_pks)
+            if pending:
+                pipeline.zadd(DUE_KEY, {user_pk: due.timestamp()})
+            else:
+                pipeline.zrem(DUE_KEY, user_pk)
+            return bool(pending)
+
+        # transaction is run again if events are added while they are removed
+        if self.connection.transaction(remove_events, events_key, value_from_callable=True):
+            self.schedule(due)
@@ -0,0 +1,150 @@
+import logging
+import uuid
+from smtplib import SMTPException
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError
+from django.utils import timezone
+from django_rq import get_queue, job
+from redis.exceptions import RedisError
+from rq import Queue, Retry
+from rq.exceptions import DeserializationError, NoSuchJobError
+from rq.job import Job, JobStatus
+from rq.timeouts import JobTimeoutException
+
+from rqworkers.models import JobExecution
+
+logger = logging.getLogger(__name__)
+
+# failures of each job by queue, they are counted in Redis so every worker process adds to the same count
+FAILURES_KEY = "opct:worker:failures:{0}"
+
+# queues used before jobs were routed by RQ_JOB_QUEUES
+LEGACY_QUEUES = ("email_sender", "attachments")
+
+# errors that may not happen again, jobs failed by any other error are not retried
+TRANSIENT_ERRORS = (SMTPException, OSError, OperationalError, InterfaceError, RedisError, JobTimeoutException)
+
+
+def is_transient(exception):
+    # work horse killed leaves no exception in worker, it is retried too
+    return exception is None or isinstance(exception, TRANSIENT_ERRORS)
+
+
+def get_retry():
+    """Job is retried RQ_MAX_RETRIES times, each wait doubles the previous one"""
+    return Retry(max=settings.RQ_MAX_RETRIES,
+                 interval=[settings.RQ_RETRY_BACKOFF * 2 ** attempt for attempt in range(settings.RQ_MAX_RETRIES)])
+
+
+def opct_job(name):
+    """Job in queue assigned to name by RQ_JOB_QUEUES and retried with exponential backoff"""
+    return job(settings.RQ_JOB_QUEUES[name], retry=get_retry())
+
+
+def get_error_message(exception):
+    return "{0}: {1}".format(exception.__class__.__name__, exception)
+
+
+def update_job_executions(job_id, **values):
+    """Update executions recorded for job in every job execution model"""
+    try:
+        job_id = uuid.UUID(job_id)
+    except ValueError:
+        # job was not enqueued with a job execution
+        return
+    for model in apps.get_models():
+        if issubclass(model, JobExecution):
+            model.objects.filter(jobId=job_id).update(**values)
+
+
+def count_failure(job):
+    try:
+        func_name = job.func_name
+    except DeserializationError:
+        func_name = "unknown"
+    try:
+        job.connection.hincrby(FAILURES_KEY.format(job.origin), func_name)
+    except RedisError as e:
+        logger.error("failure of job %s could not be counted: %s", job.id, e)
+
+
+def record_job_failure(job, error):
+    """Executions of a job that is retried are enqueued again, they are failed when job goes to failed job registry"""
+    count_failure(job)
+    retrying = job.get_status(refresh=False) in (JobStatus.SCHEDULED, JobStatus.QUEUED)
+    try:
+        if retrying:
+            update_job_executions(job.id, status=JobExecution.ENQUEUED, executionEnd=None,
+                                  errorMessage="Reintento programado, quedan {0}: {1}".format(job.retries_left, error))
+        else:
+            update_job_executions(job.id, status=JobExecution.FAILED, executionEnd=timezone.now(), errorMessage=error)
+    except DatabaseError as e:
+        logger.error("executions of job %s could not be updated: %s", job.id, e)
+
+
+def handle_job_exception(job, exc_type, exc_value, traceback):
+    """Exception handler of workers"""
+    record_job_failure(job, get_error_message(exc_value))
+    return True
+
+
+def requeue_failed_jobs(queue, job_ids=None):
+    """Enqueue again jobs in failed job registry of queue, each one gets every retry again"""
+    registry = queue.failed_job_registry
+    requeued = []
+    for job_id in registry.get_job_ids():
+        if job_ids is not None and job_id not in job_ids:
+            continue
+        failed_job = queue.fetch_job(job_id)
+        if failed_job is None:
+            # job data expired
+            registry.remove(job_id)
+            continue
+        failed_job.retries_left = settings.RQ_MAX_RETRIES
+        registry.requeue(failed_job)
+        update_job_executions(failed_job.id, status=JobExecution.ENQUEUED, executionEnd=None)
+        requeued.append(failed_job)
+    return requeued
+
+
+def get_job_queue_name(rq_job):
+    """Queue assigned by RQ_JOB_QUEUES to the function of job, functions are named after their job: <name>_job"""
+    try:
+        name = rq_job.func_name.rsplit(".", 1)[-1]
+    except DeserializationError:
+        return "default"
+    if name.endswith("_job"):
+        name = name[:-len("_job")]
+    return settings.RQ_JOB_QUEUES.get(name, "default")
+
+
+def move_legacy_jobs(connection):
+    """
+    Move jobs waiting or scheduled in LEGACY_QUEUES to the queue of their job, scheduled ones keep their time and id
+    so periodic jobs are not scheduled twice. It returns jobs moved
+    """
+    moved = []
+    for legacy_name in LEGACY_QUEUES:
+        legacy_queue = Queue(legacy_name, connection=connection)
+        for legacy_job in legacy_queue.get_jobs():
+            legacy_queue.remove(legacy_job)
+            get_queue(get_job_queue_name(legacy_job), connection=connection).enqueue_job(legacy_job)
+            moved.append(legacy_job)
+
+        registry = legacy_queue.scheduled_job_registry
+        for job_id in registry.get_job_ids():
+            try:
+                legacy_job = Job.fetch(job_id, connection=connection)
+            except NoSuchJobError:
+                registry.remove(job_id)
+                continue
+            scheduled_time = registry.get_scheduled_time(job_id)
+            queue = get_queue(get_job_queue_name(legacy_job), connection=connection)
+            legacy_job.origin = queue.name
+            legacy_job.save()
+            queue.scheduled_job_registry.schedule(legacy_job, scheduled_time)
+            registry.remove(legacy_job)
+            moved.append(legacy_job)
+    return moved
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from rqworkers.tasks import purge_job_executions_job
+
+
+class Command(BaseCommand):
+    help = "delete old email job executions, purge is scheduled again periodically"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sync", action="store_true", help="purge executions whithout worker, next purge is not scheduled"
+        )
+
+    def handle(self, *args, **options):
+        if options["sync"]:
+            deleted = purge_job_executions_job(schedule=False)
+            self.stdout.write(self.style.SUCCESS("{0} job executions purged".format(deleted)))
+        else:
+            purge_job_executions_job.delay()
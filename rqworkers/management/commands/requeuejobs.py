@@ -0,0 +1,28 @@
+import django_rq
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rqworkers.jobs import requeue_failed_jobs
+
+
+class Command(BaseCommand):
+    help = "enqueue again jobs failed after every retry, they are kept in failed job registry of each queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queues", nargs="*", help="every queue by default")
+        parser.add_argument("--job-id", action="append", dest="job_ids", help="only this job, it can be repeated")
+        parser.add_argument("--list", action="store_true", help="show failed jobs without enqueuing them")
+
+    def handle(self, *args, **options):
+        for queue_name in options["queues"] or settings.RQ_QUEUES:
+            queue = django_rq.get_queue(queue_name)
+            if options["list"]:
+                for job_id in queue.failed_job_registry.get_job_ids():
+                    failed_job = queue.fetch_job(job_id)
+                    if failed_job is not None:
+                        error = (failed_job.exc_info or "").strip().splitlines()[-1:]
+                        self.stdout.write("{0}: {1} {2} {3}".format(queue_name, failed_job.id, failed_job.func_name,
+                                                                    "".join(error)))
+                continue
+            requeued = requeue_failed_jobs(queue, options["job_ids"])
+            self.stdout.write("{0}: {1} jobs enqueued again".format(queue_name, len(requeued)))
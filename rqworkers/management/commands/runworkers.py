@@ -0,0 +1,76 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django_rq import get_connection
+
+from rqworkers.jobs import move_legacy_jobs
+
+# seconds between checks of worker processes
+MONITOR_INTERVAL = 5
+
+
+def run_worker(queues, worker_class):
+    call_command("rqworker", *queues, worker_class=worker_class, with_scheduler=True)
+
+
+class Command(BaseCommand):
+    help = "run many worker processes, each one takes jobs from its queues in priority order"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queues", nargs="*",
+                            help="queues of every process in priority order, queues of RQ_WORKER_QUEUES by default")
+        parser.add_argument("--processes", type=int, default=None,
+                            help="number of worker processes when queues are given, one by default")
+        parser.add_argument("--worker-class", default=None, help="RQ_WORKER_CLASS by default")
+
+    def start_worker(self, queues, worker_class):
+        process = multiprocessing.Process(target=run_worker, args=(queues, worker_class), daemon=False)
+        process.start()
+        return process
+
+    def handle(self, *args, **options):
+        if options["queues"]:
+            worker_queues = [options["queues"]] * (options["processes"] or 1)
+        else:
+            worker_queues = settings.RQ_WORKER_QUEUES
+        worker_class = options["worker_class"] or settings.RQ_WORKER_CLASS
+
+        moved = move_legacy_jobs(get_connection())
+        if moved:
+            self.stdout.write("{0} jobs moved from old queues".format(len(moved)))
+        # workers are forked, they must not share database connections
+        connections.close_all()
+
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+            if signum != signal.SIGTERM:
+                # Ctrl+C reaches every process of the group, a second signal would stop jobs in progress
+                return
+            for process in processes:
+                if process.is_alive():
+                    # each worker ends its current job before it quits
+                    process.terminate()
+
+        processes = [self.start_worker(queues, worker_class) for queues in worker_queues]
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process, queues in zip(processes, worker_queues):
+            self.stdout.write("worker {0} listening on {1}".format(process.pid, ", ".join(queues)))
+
+        while not stopping:
+            for index, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    self.stderr.write("worker {0} exited with code {1}, starting it again".format(
+                        process.pid, process.exitcode))
+                    processes[index] = self.start_worker(worker_queues[index], worker_class)
+            time.sleep(MONITOR_INTERVAL)
+
+        for process in processes:
+            process.join()
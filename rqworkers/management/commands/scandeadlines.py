@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from rqworkers.tasks import scan_deadlines_job
+
+
+class Command(BaseCommand):
+    help = "send deadline reminders and mark breached deadlines, scan is scheduled again periodically"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sync", action="store_true", help="scan deadlines whithout worker, next scan is not scheduled"
+        )
+
+    def handle(self, *args, **options):
+        if options["sync"]:
+            scan_deadlines_job(schedule=False)
+        else:
+            scan_deadlines_job.delay()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from rest_api.models import NotificationEvent
+from rqworkers.tasks import send_notification_events_job, send_notification_digests_job
+
+
+class Command(BaseCommand):
+    help = "send notification events waiting in outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sync", action="store_true", help="drain outbox whithout worker"
+        )
+        parser.add_argument(
+            "--digests", action="store_true", help="send digests that are due too"
+        )
+
+    def handle(self, *args, **options):
+        pending = NotificationEvent.objects.filter(processed_at__isnull=True).count()
+        if options["sync"]:
+            send_notification_events_job()
+        else:
+            send_notification_events_job.delay()
+        if options["digests"]:
+            if options["sync"]:
+                send_notification_digests_job()
+            else:
+                send_notification_digests_job.delay()
+        self.stdout.write(self.style.SUCCESS("{0} pending events".format(pending)))
@@ -0,0 +1,19 @@
+import django_rq
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rqworkers.opctWorker import get_latency_stats
+
+
+class Command(BaseCommand):
+    help = "show jobs waiting and start latency of latest jobs in each queue"
+
+    def handle(self, *args, **options):
+        for queue_name in settings.RQ_QUEUES:
+            queue = django_rq.get_queue(queue_name)
+            stats = get_latency_stats(queue.connection, queue_name)
+            if stats is None:
+                latency = "sin datos"
+            else:
+                latency = "{count} trabajos, p50 {p50:.2f}s, p95 {p95:.2f}s, máx {max:.2f}s".format(**stats)
+            self.stdout.write("{0}: {1} encolados, latencia: {2}".format(queue_name, queue.count, latency))
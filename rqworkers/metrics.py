@@ -0,0 +1,52 @@
+import logging
+
+import django_rq
+from django.conf import settings
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from redis.exceptions import RedisError
+
+from rqworkers.jobs import FAILURES_KEY
+from rqworkers.opctWorker import get_latency_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_QUANTILES = [("0.5", "p50"), ("0.95", "p95"), ("1", "max")]
+
+
+class QueueCollector:
+    """
+    Prometheus collector of queues, registries, job start latency and job failures. Everything is read from Redis
+    when metrics are scraped, so values are the same whatever worker processes ran the jobs
+    """
+
+    def collect(self):
+        up = GaugeMetricFamily("opct_rq_up", "Redis could be read")
+        queue_jobs = GaugeMetricFamily("opct_rq_queue_jobs", "Jobs waiting in queue", labels=["queue"])
+        registry_jobs = GaugeMetricFamily("opct_rq_registry_jobs", "Jobs in each registry of queue, failed ones are "
+                                                                   "waiting to be requeued", labels=["queue", "registry"])
+        latency = GaugeMetricFamily("opct_rq_job_latency_seconds", "Time latest jobs waited in queue before they "
+                                                                   "started", labels=["queue", "quantile"])
+        failures = CounterMetricFamily("opct_rq_job_failures", "Failed job executions, retried ones included",
+                                       labels=["queue", "job"])
+        try:
+            for queue_name in settings.RQ_QUEUES:
+                queue = django_rq.get_queue(queue_name)
+                queue_jobs.add_metric([queue_name], queue.count)
+                for registry_name, registry in [("started", queue.started_job_registry),
+                                                ("scheduled", queue.scheduled_job_registry),
+                                                ("deferred", queue.deferred_job_registry),
+                                                ("failed", queue.failed_job_registry)]:
+                    registry_jobs.add_metric([queue_name, registry_name], registry.count)
+                stats = get_latency_stats(queue.connection, queue_name)
+                if stats is not None:
+                    for quantile, stat in LATENCY_QUANTILES:
+                        latency.add_metric([queue_name, quantile], stats[stat])
+                for job_name, count in queue.connection.hgetall(FAILURES_KEY.format(queue_name)).items():
+                    failures.add_metric([queue_name, job_name.decode()], int(count))
+        except RedisError as e:
+            logger.error("queue metrics could not be read: %s", e)
+            up.add_metric([], 0)
+            yield up
+            return
+        up.add_metric([], 1)
+        yield from [up, queue_jobs, registry_jobs, latency, failures]
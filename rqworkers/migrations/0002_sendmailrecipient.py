@@ -0,0 +1,33 @@
+# Generated by Django 3.2.14 on 2026-10-19 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rqworkers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SendMailRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Correo')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('sent', 'Enviado'), ('failed', 'Fallido')], default='pending', max_length=10, verbose_name='Estado')),
+                ('sentTimestamp', models.DateTimeField(null=True, verbose_name='Enviado')),
+                ('errorMessage', models.TextField(default='', verbose_name='Mensaje de error')),
+                ('jobExecution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='rqworkers.sendmailjobexecution', verbose_name='Trabajo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Destinatario de correo',
+                'verbose_name_plural': 'Destinatarios de correos',
+                'unique_together': {('jobExecution', 'user')},
+            },
+        ),
+    ]
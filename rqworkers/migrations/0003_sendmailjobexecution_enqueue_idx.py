@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-19 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rqworkers', '0002_sendmailrecipient'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sendmailjobexecution',
+            name='enqueueTimestamp',
+            field=models.DateTimeField(db_index=True, verbose_name='Encolado'),
+        ),
+    ]
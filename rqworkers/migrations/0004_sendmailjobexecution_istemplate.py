@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rqworkers', '0003_sendmailjobexecution_enqueue_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sendmailjobexecution',
+            name='isTemplate',
+            field=models.BooleanField(default=False, verbose_name='Plantilla'),
+        ),
+    ]
@@ -1,13 +1,53 @@
 from django.db import models
+from django.db.models import Avg, Count, F, Max, Q
 
 from rest_api.models import User
 
 
+class Epoch(models.Func):
+    """Seconds in an interval"""
+    template = "EXTRACT(EPOCH FROM %(expressions)s)"
+    output_field = models.FloatField()
+
+
+class Percentile(models.Aggregate):
+    function = "PERCENTILE_CONT"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = models.FloatField()
+
+
+class JobExecutionQuerySet(models.QuerySet):
+
+    def get_metrics(self):
+        """
+        Executions by status, failure rate of executions already ended and seconds they waited in queue and took to
+        run, everything is computed by database in one query
+        """
+        queue_wait = Epoch(F("executionStart") - F("enqueueTimestamp"))
+        run_time = Epoch(F("executionEnd") - F("executionStart"))
+        metrics = self.aggregate(
+            total=Count("pk"),
+            **{status: Count("pk", filter=Q(status=status)) for status, _ in JobExecution.STATUS_CHOICES},
+            queue_wait_avg=Avg(queue_wait),
+            queue_wait_p95=Percentile(queue_wait, percentile=0.95),
+            queue_wait_max=Max(queue_wait),
+            run_time_avg=Avg(run_time),
+            run_time_p95=Percentile(run_time, percentile=0.95),
+            run_time_max=Max(run_time),
+        )
+        ended = metrics[JobExecution.FINISHED] + metrics[JobExecution.FAILED]
+        metrics["failure_rate"] = metrics[JobExecution.FAILED] / ended if ended else None
+        return metrics
+
+
 class JobExecution(models.Model):
     """record about async execution"""
 
+    objects = JobExecutionQuerySet.as_manager()
+
     jobId = models.UUIDField("Identificador de trabajo", null=True)
-    enqueueTimestamp = models.DateTimeField("Encolado")
+    # executions are filtered and purged by this time
+    enqueueTimestamp = models.DateTimeField("Encolado", db_index=True)
     # time when execution started
     executionStart = models.DateTimeField("Inicio", null=True)
     # time when execution finished
@@ -57,7 +97,36 @@ class SendMailJobExecution(JobExecution):
     subject = models.TextField(verbose_name="Asunto")
     # email body
     body = models.TextField(verbose_name="Cuerpo del mensaje")
+    # subject and body built by the application are rendered as templates with recipient data, text given by users
+    # is sent as it is
+    isTemplate = models.BooleanField("Plantilla", default=False)
 
     class Meta:
         verbose_name = "Trabajo para enviar correo"
         verbose_name_plural = "Trabajos para enviar correos"
+
+
+class SendMailRecipient(models.Model):
+    """Delivery status of an email job for one user."""
+
+    jobExecution = models.ForeignKey(SendMailJobExecution, related_name="recipients", on_delete=models.CASCADE,
+                                     verbose_name="Trabajo")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuario")
+    # address used, user may change it later
+    email = models.EmailField("Correo")
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pendiente"),
+        (SENT, "Enviado"),
+        (FAILED, "Fallido"),
+    )
+    status = models.CharField("Estado", max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    sentTimestamp = models.DateTimeField("Enviado", null=True)
+    errorMessage = models.TextField("Mensaje de error", null=False, default="")
+
+    class Meta:
+        verbose_name = "Destinatario de correo"
+        verbose_name_plural = "Destinatarios de correos"
+        unique_together = ("jobExecution", "user")
@@ -1,14 +1,115 @@
-from rq import Worker
+import importlib
+import logging
+import sys
+import time
 
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, connections
+from django.template import engines
+from rq import Worker, SimpleWorker
 
-class OpctWorker(Worker):
-    """Worker that preloads the necessary imports to upload data"""
+from rqworkers.jobs import is_transient, record_job_failure
 
-    def __init__(self, queues, name=None, default_result_ttl=None, connection=None, exc_handler=None,
-                 exception_handlers=None, default_worker_ttl=None, job_class=None, queue_class=None):
-        print("Initializing OpctWorker...")
-        super(OpctWorker, self).__init__(queues, name=name, default_result_ttl=default_result_ttl,
-                                         connection=connection, exc_handler=exc_handler,
-                                         exception_handlers=exception_handlers, default_worker_ttl=default_worker_ttl,
-                                         job_class=job_class, queue_class=queue_class)
-        print("OpctWorker ready!")
+logger = logging.getLogger(__name__)
+
+# modules used by jobs, imported once in worker instead of in every work horse
+PRELOAD_MODULES = [
+    "PIL.Image",
+    "requests",
+    "rest_api.file_processing",
+    "rest_api.serializers",
+    "rest_api.storages",
+    "rqworkers.digest",
+    "rqworkers.tasks",
+]
+# latest job start latencies kept by queue
+LATENCY_KEY = "opct:worker:latency:{0}"
+LATENCY_SAMPLES = 1000
+
+
+def preload():
+    """Import modules and fill caches that every job would otherwise build again"""
+    start = time.monotonic()
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    from PIL import Image
+    # registers every image plugin
+    Image.init()
+    # builtin template tags used by email templates
+    engines["django"].from_string("{% templatetag openbrace %}")
+    for model in apps.get_models():
+        model._meta.get_fields()
+    ContentType.objects.get_for_models(*apps.get_models())
+    # work horses must not share the socket opened by the worker
+    connections.close_all()
+    logger.info("worker preloaded in %.2f seconds", time.monotonic() - start)
+
+
+def record_latency(connection, job):
+    """Time since job was enqueued until it started, in seconds"""
+    if job.enqueued_at is None:
+        return None
+    latency = max((job.started_at - job.enqueued_at).total_seconds(), 0)
+    key = LATENCY_KEY.format(job.origin)
+    with connection.pipeline() as pipeline:
+        pipeline.lpush(key, latency)
+        pipeline.ltrim(key, 0, LATENCY_SAMPLES - 1)
+        pipeline.execute()
+    return latency
+
+
+def get_latency_stats(connection, queue_name):
+    samples = sorted(float(value) for value in connection.lrange(LATENCY_KEY.format(queue_name), 0, -1))
+    if not samples:
+        return None
+    return dict(count=len(samples), p50=samples[len(samples) // 2],
+                p95=samples[min(int(len(samples) * 0.95), len(samples) - 1)], max=samples[-1])
+
+
+class OpctWorkerMixin:
+    """
+    Worker that preloads the necessary imports, records how long jobs wait before they start and only retries jobs
+    failed by transient errors
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        preload()
+
+    def prepare_job_execution(self, job):
+        super().prepare_job_execution(job)
+        latency = record_latency(self.connection, job)
+        if latency is not None and latency > settings.RQ_LATENCY_WARNING:
+            logger.warning("job %s waited %.2f seconds in queue %s", job.id, latency, job.origin)
+
+    def handle_job_failure(self, job, queue, started_job_registry=None, exc_string=""):
+        # called while exception raised by job is handled
+        exception = sys.exc_info()[1]
+        if not is_transient(exception):
+            job.retries_left = 0
+        super().handle_job_failure(job, queue, started_job_registry=started_job_registry, exc_string=exc_string)
+        if exception is None:
+            # work horse was killed, exception handlers are not called
+            record_job_failure(job, exc_string)
+            # next work horses must not share the connection opened here
+            connections.close_all()
+
+
+class OpctWorker(OpctWorkerMixin, Worker):
+    """Each job runs in a forked work horse, imports and caches loaded by worker are shared with it"""
+
+
+class OpctSimpleWorker(OpctWorkerMixin, SimpleWorker):
+    """
+    Jobs run in worker process, so database connection is reused between jobs until CONN_MAX_AGE. Connections
+    broken or too old are closed before and after each job, like Django does on each request.
+    """
+
+    def execute_job(self, job, queue):
+        close_old_connections()
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            close_old_connections()
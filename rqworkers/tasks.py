@@ -1,26 +1,336 @@
-from smtplib import SMTPException
+import datetime
+import logging
+import math
+import re
+import time
+from collections import defaultdict
+from smtplib import SMTPException, SMTPServerDisconnected
 
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template import Context, Template
 from django.utils import timezone
-from django_rq import job
+from django_rq import get_queue
+from redis.exceptions import RedisError
 
-from rqworkers.models import SendMailJobExecution
+from rest_api.file_processing import process_file_blob
+from rest_api.models import FileBlob, NotificationEvent, User, ChangeOPProcessDeadline
+from rqworkers.digest import NotificationDigest
+from rqworkers.jobs import opct_job, get_error_message, get_retry
+from rqworkers.models import SendMailJobExecution, SendMailRecipient
 
+logger = logging.getLogger(__name__)
 
-@job("email_sender")
+TEMPLATE_BRACES = {"{": "{% templatetag openbrace %}", "}": "{% templatetag closebrace %}"}
+
+
+def render(template, user):
+    # subject and body may use user data, for instance: Hola {{ user.first_name }}
+    return template.render(Context({"user": user}, autoescape=False))
+
+
+def send_message(connection, message):
+    """Send message through an open connection, it is opened again once if the server closed it"""
+    try:
+        return connection.send_messages([message])
+    except SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        return connection.send_messages([message])
+
+
+def send_emails(job_execution_obj):
+    new_users = job_execution_obj.users.exclude(pk__in=job_execution_obj.recipients.values("user_id")).order_by("pk")
+    SendMailRecipient.objects.bulk_create([SendMailRecipient(jobExecution=job_execution_obj, user=user, email=user.email)
+                                           for user in new_users])
+    recipients = list(job_execution_obj.recipients.exclude(status=SendMailRecipient.SENT).select_related("user").
+                      order_by("id"))
+
+    if job_execution_obj.isTemplate:
+        subject = Template(job_execution_obj.subject)
+        body = Template(job_execution_obj.body)
+    batch_size = settings.EMAIL_BATCH_SIZE
+    # when connection could not be opened or was lost, recipients not sent are kept as pending for next retry
+    with get_connection() as connection:
+        for index in range(0, len(recipients), batch_size):
+            batch = recipients[index:index + batch_size]
+            batch_start = time.monotonic()
+            for recipient in batch:
+                if job_execution_obj.isTemplate:
+                    message = EmailMessage(render(subject, recipient.user).strip(), render(body, recipient.user),
+                                           None, [recipient.email], connection=connection)
+                else:
+                    message = EmailMessage(job_execution_obj.subject.strip(), job_execution_obj.body, None,
+                                           [recipient.email], connection=connection)
+                try:
+                    send_message(connection, message)
+                    recipient.status = SendMailRecipient.SENT
+                    recipient.sentTimestamp = timezone.now()
+                    recipient.errorMessage = ""
+                except SMTPServerDisconnected:
+                    SendMailRecipient.objects.bulk_update(batch, ["status", "sentTimestamp", "errorMessage"])
+                    raise
+                except SMTPException as e:
+                    recipient.status = SendMailRecipient.FAILED
+                    recipient.errorMessage = str(e)
+            SendMailRecipient.objects.bulk_update(batch, ["status", "sentTimestamp", "errorMessage"])
+
+            if settings.EMAIL_RATE_LIMIT and index + batch_size < len(recipients):
+                pause = len(batch) / settings.EMAIL_RATE_LIMIT - (time.monotonic() - batch_start)
+                if pause > 0:
+                    time.sleep(pause)
+
+
+@opct_job("send_email")
 def send_email_job(job_execution_pk):
+    """
+    Send one personalized email to each user of job execution. Every message goes through the same SMTP connection,
+    recipients are processed in batches of EMAIL_BATCH_SIZE and sending is throttled to EMAIL_RATE_LIMIT messages per
+    second. Recipients already sent are skipped, so a job can be executed again after a failure.
+    """
     job_execution_obj = SendMailJobExecution.objects.get(pk=job_execution_pk)
     job_execution_obj.status = SendMailJobExecution.RUNNING
     job_execution_obj.executionStart = timezone.now()
+    job_execution_obj.errorMessage = ""
     job_execution_obj.save()
 
-    email_list = [user.email for user in job_execution_obj.users.all()]
     try:
-        send_mail(job_execution_obj.subject, job_execution_obj.body, None, email_list)
+        send_emails(job_execution_obj)
+    except Exception as e:
+        # execution is never left running, worker exception handler enqueues it again when job is retried
+        SendMailJobExecution.objects.filter(pk=job_execution_pk).update(
+            status=SendMailJobExecution.FAILED, errorMessage=get_error_message(e), executionEnd=timezone.now())
+        raise
+
+    failed = job_execution_obj.recipients.exclude(status=SendMailRecipient.SENT).count()
+    if failed == 0:
         job_execution_obj.status = SendMailJobExecution.FINISHED
-    except SMTPException as e:
+    else:
         job_execution_obj.status = SendMailJobExecution.FAILED
-        job_execution_obj.errorMessage = str(e)
+        job_execution_obj.errorMessage = "{0} de {1} correos no fueron enviados".format(
+            failed, job_execution_obj.recipients.count())
 
     job_execution_obj.executionEnd = timezone.now()
     job_execution_obj.save()
+
+
+@opct_job("process_file_blob")
+def process_file_blob_job(file_blob_pk):
+    try:
+        blob = FileBlob.objects.get(pk=file_blob_pk)
+    except FileBlob.DoesNotExist:
+        # content was deleted before it was processed
+        return
+    process_file_blob(blob)
+
+
+def escape_template(text):
+    """Text written by users is shown as it is when email is rendered as a template"""
+    return re.sub(r"[{}]", lambda match: TEMPLATE_BRACES[match.group()], text)
+
+
+def get_event_lines(events):
+    return ["{0} - {1}: {2}".format(timezone.localtime(event.created_at).strftime("%d-%m-%Y %H:%M"),
+                                    event.user.get_full_name() or event.user.email, event.description)
+            for event in events]
+
+
+def get_digest(change_op_process, events):
+    subject = 'Novedades en proceso de cambio de PO "{0}"'.format(change_op_process.title)
+    body = 'Hay novedades en el proceso de cambio de PO "{0}":\n\n{1}\n'.format(change_op_process.title,
+                                                                             "\n".join(get_event_lines(events)))
+    return escape_template(subject), "Hola {{ user.first_name }},\n\n" + escape_template(body)
+
+
+def get_user_digest(events):
+    """Email with events of many processes, they are grouped by process"""
+    events_by_process = defaultdict(list)
+    for event in events:
+        events_by_process[event.change_op_process].append(event)
+    if len(events_by_process) == 1:
+        return get_digest(*next(iter(events_by_process.items())))
+
+    subject = "Resumen de novedades en {0} procesos de cambio de PO".format(len(events_by_process))
+    sections = ['Proceso "{0}":\n{1}'.format(change_op_process.title, "\n".join(get_event_lines(process_events)))
+                for change_op_process, process_events in events_by_process.items()]
+    body = "Hay novedades en procesos de cambio de PO:\n\n{0}\n".format("\n\n".join(sections))
+    return escape_template(subject), "Hola {{ user.first_name }},\n\n" + escape_template(body)
+
+
+def create_send_email_job(subject, body, users):
+    """
+    Email job enqueued once current transaction is committed, subject and body are templates so text written by users
+    has to be escaped with escape_template
+    """
+    job_execution_obj = SendMailJobExecution.objects.create(
+        enqueueTimestamp=timezone.now(), status=SendMailJobExecution.ENQUEUED, subject=subject, body=body,
+        isTemplate=True)
+    job_execution_obj.users.add(*users)
+    transaction.on_commit(lambda: enqueue_send_email_job(job_execution_obj.pk))
+    return job_execution_obj
+
+
+def enqueue_send_email_job(job_execution_pk):
+    try:
+        rq_job = send_email_job.delay(job_execution_pk)
+    except RedisError as e:
+        logger.error("email job %s could not be enqueued: %s", job_execution_pk, e)
+        return
+    SendMailJobExecution.objects.filter(pk=job_execution_pk).update(jobId=rq_job.id)
+
+
+@opct_job("send_notification_events")
+def send_notification_events_job():
+    """
+    Drain outbox of notification events in batches. Users with immediate notifications get one email for events of
+    each process, events for other users are buffered in their digest. The user who made every change is not
+    notified about it.
+    """
+    while True:
+        with transaction.atomic():
+            # other workers skip the events taken here
+            events = list(NotificationEvent.objects.select_for_update(skip_locked=True, of=("self",)).
+                          filter(processed_at__isnull=True).select_related("user", "change_op_process__creator").
+                          order_by("id")[:settings.NOTIFICATION_BATCH_SIZE])
+            if not events:
+                return
+
+            events_by_process = defaultdict(list)
+            for event in events:
+                events_by_process[event.change_op_process].append(event)
+            digest_users = dict()
+            digest_events = defaultdict(list)
+            for change_op_process, process_events in events_by_process.items():
+                users = []
+                for user in NotificationEvent.objects.get_recipients(change_op_process):
+                    user_events = [event for event in process_events if event.user_id != user.pk]
+                    if not user_events:
+                        continue
+                    if user.notification_frequency == User.NOTIFICATION_IMMEDIATE:
+                        users.append(user)
+                    else:
+                        digest_users[user.pk] = user
+                        digest_events[user.pk].extend(user_events)
+                if users:
+                    create_send_email_job(*get_digest(change_op_process, process_events), users)
+
+            # events are buffered again if transaction fails, they are kept once by user
+            digest = NotificationDigest()
+            for user_pk, user_events in digest_events.items():
+                digest.add(digest_users[user_pk], user_events)
+
+            NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                processed_at=timezone.now())
+
+
+@opct_job("send_notification_digests")
+def send_notification_digests_job():
+    """Send digests that are due, each one is an email with events buffered for a user since the last one"""
+    digest = NotificationDigest()
+    user_pks = digest.get_due_users(timezone.now())
+    users = User.objects.in_bulk(user_pks)
+    for user_pk in user_pks:
+        user = users.get(user_pk)
+        event_pks = digest.get_events(user_pk)
+        if user is None:
+            # user was deleted
+            digest.remove(user_pk, event_pks)
+            continue
+        events = NotificationEvent.objects.filter(pk__in=event_pks).select_related("user", "change_op_process"). \
+            order_by("id")
+        if user.is_active and user.email and events:
+            with transaction.atomic():
+                create_send_email_job(*get_user_digest(events), [user])
+        digest.remove(user_pk, event_pks, user.notification_frequency)
+
+
+def get_deadline_email(change_op_process, deadlines, now):
+    lines = []
+    for deadline in deadlines:
+        date = timezone.localtime(deadline.deadline).strftime("%d-%m-%Y %H:%M")
+        lines.append("{0}: {1} el {2}".format(deadline.operation_program_deadline.name,
+                                              "venció" if deadline.deadline < now else "vence", date))
+    subject = 'Plazos del proceso de cambio de PO "{0}"'.format(change_op_process.title)
+    body = 'Plazos del proceso de cambio de PO "{0}":\n\n{1}\n'.format(change_op_process.title, "\n".join(lines))
+    return escape_template(subject), "Hola {{ user.first_name }},\n\n" + escape_template(body)
+
+
+def schedule_periodic_job(func, name, interval, now):
+    """
+    Next run is aligned to interval (seconds), so runs scheduled twice get the same job id and run once
+    """
+    next_run = datetime.datetime.fromtimestamp(math.floor(now.timestamp() / interval + 1) * interval,
+                                               tz=datetime.timezone.utc)
+    get_queue(settings.RQ_JOB_QUEUES[name]).enqueue_at(
+        next_run, func, job_id="{0}-{1}".format(name.replace("_", "-"), int(next_run.timestamp())), retry=get_retry())
+
+
+def schedule_deadline_scan(now):
+    schedule_periodic_job(scan_deadlines_job, "scan_deadlines", settings.DEADLINE_SCAN_INTERVAL, now)
+
+
+@opct_job("scan_deadlines")
+def scan_deadlines_job(schedule=True):
+    """
+    Remind creator and counterpart contacts of processes about deadlines in next DEADLINE_REMINDER_DAYS and mark
+    deadlines already passed as breached. Deadlines of closed processes met by the scan are marked as resolved. Only
+    deadlines neither breached nor resolved are scanned, so cost does not grow with history
+    """
+    now = timezone.now()
+    if schedule:
+        # next scan is scheduled even if this one fails
+        schedule_deadline_scan(now)
+
+    with transaction.atomic():
+        deadlines = ChangeOPProcessDeadline.objects.get_open(now + datetime.timedelta(
+            days=settings.DEADLINE_REMINDER_DAYS)).filter(Q(reminded_at__isnull=True) | Q(deadline__lt=now)). \
+            select_for_update(skip_locked=True, of=("self",)). \
+            select_related("change_op_process__status", "operation_program_deadline").order_by("deadline")
+
+        resolved = []
+        deadlines_by_process = defaultdict(list)
+        for deadline in deadlines:
+            if deadline.change_op_process.status.is_closed:
+                resolved.append(deadline.pk)
+            else:
+                deadlines_by_process[deadline.change_op_process].append(deadline)
+        for change_op_process, process_deadlines in deadlines_by_process.items():
+            contacts = NotificationEvent.objects.get_recipients(change_op_process).values("pk")
+            users = list(User.objects.filter(Q(pk=change_op_process.creator_id) | Q(pk__in=contacts),
+                                             is_active=True).exclude(email=""))
+            if users:
+                create_send_email_job(*get_deadline_email(change_op_process, process_deadlines, now), users)
+
+        scanned = [deadline for process_deadlines in deadlines_by_process.values() for deadline in process_deadlines]
+        breached = [deadline.pk for deadline in scanned if deadline.deadline < now]
+        ChangeOPProcessDeadline.objects.filter(pk__in=[deadline.pk for deadline in scanned]).update(reminded_at=now)
+        ChangeOPProcessDeadline.objects.filter(pk__in=breached).update(breached_at=now)
+        ChangeOPProcessDeadline.objects.filter(pk__in=resolved).update(resolved_at=now)
+
+
+@opct_job("purge_job_executions")
+def purge_job_executions_job(schedule=True):
+    """
+    Delete email job executions enqueued more than JOB_EXECUTION_RETENTION_DAYS ago with their recipients. Each batch
+    of JOB_EXECUTION_PURGE_BATCH_SIZE executions is deleted in its own transaction, so locks are held briefly
+    """
+    now = timezone.now()
+    if schedule:
+        schedule_periodic_job(purge_job_executions_job, "purge_job_executions",
+                              settings.JOB_EXECUTION_PURGE_INTERVAL, now)
+
+    old_executions = SendMailJobExecution.objects.filter(
+        enqueueTimestamp__lt=now - datetime.timedelta(days=settings.JOB_EXECUTION_RETENTION_DAYS)).order_by("pk")
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(old_executions.values_list("pk", flat=True)[:settings.JOB_EXECUTION_PURGE_BATCH_SIZE])
+            if not pks:
+                break
+            # only primary keys are loaded to collect related rows, they are deleted without loading them
+            SendMailJobExecution.objects.filter(pk__in=pks).only("pk").delete()
+        deleted += len(pks)
+    logger.info("%s job executions purged", deleted)
+    return deleted
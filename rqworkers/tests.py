@@ -1,3 +1,467 @@
-from django.test import TestCase
+import datetime
+import io
+import signal
+import uuid
+from smtplib import SMTPRecipientsRefused, SMTPConnectError
+from unittest import mock
 
-# Create your tests here.
+import django_rq
+import fakeredis
+from django.core import mail
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rq import Queue
+from rq.job import Job
+from rq.timeouts import JobTimeoutException
+
+from rest_api.models import User, NotificationEvent, OperationProgramType, ChangeOPProcessDeadline, \
+    ChangeOPProcessStatus
+from rest_api.tests.test_views_base import BaseTestCase
+from rqworkers.digest import NotificationDigest, DUE_KEY
+from rqworkers.jobs import get_retry, handle_job_exception, move_legacy_jobs
+from rqworkers.models import SendMailJobExecution, SendMailRecipient
+from rqworkers.opctWorker import OpctSimpleWorker, get_latency_stats
+from rqworkers.tasks import send_email_job, send_notification_events_job, send_notification_digests_job, \
+    scan_deadlines_job, purge_job_executions_job
+
+
+@override_settings(EMAIL_BATCH_SIZE=2, EMAIL_RATE_LIMIT=0)
+class SendEmailJobTest(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create(email="user{0}@op.com".format(index), first_name="User {0}".format(index))
+                      for index in range(5)]
+        self.job_execution_obj = SendMailJobExecution.objects.create(
+            enqueueTimestamp=timezone.now(), status=SendMailJobExecution.ENQUEUED, subject="Aviso",
+            body="Hola {{ user.first_name }}, hay novedades", isTemplate=True)
+        self.job_execution_obj.users.add(*self.users)
+
+    def test_send_one_message_per_user(self):
+        with mock.patch("rqworkers.tasks.get_connection", wraps=mail.get_connection) as get_connection_mock:
+            send_email_job(self.job_execution_obj.pk)
+
+        get_connection_mock.assert_called_once()
+        self.assertEqual(5, len(mail.outbox))
+        for user, message in zip(self.users, mail.outbox):
+            self.assertEqual([user.email], message.to)
+            self.assertEqual("Hola {0}, hay novedades".format(user.first_name), message.body)
+        self.job_execution_obj.refresh_from_db()
+        self.assertEqual(SendMailJobExecution.FINISHED, self.job_execution_obj.status)
+        self.assertEqual(5, self.job_execution_obj.recipients.filter(status=SendMailRecipient.SENT).count())
+
+    def test_text_is_not_rendered(self):
+        self.job_execution_obj.subject = "Aviso {% if"
+        self.job_execution_obj.body = "Use {{ variable }} en la plantilla"
+        self.job_execution_obj.isTemplate = False
+        self.job_execution_obj.save()
+
+        send_email_job(self.job_execution_obj.pk)
+
+        self.assertEqual(5, len(mail.outbox))
+        self.assertEqual("Aviso {% if", mail.outbox[0].subject)
+        self.assertEqual("Use {{ variable }} en la plantilla", mail.outbox[0].body)
+
+    def test_failed_recipients_are_recorded_and_sent_again(self):
+        send_messages = mail.get_connection().__class__.send_messages
+
+        def fail_for_user2(connection, messages):
+            if messages[0].to == ["user2@op.com"]:
+                raise SMTPRecipientsRefused({"user2@op.com": (550, b"mailbox unavailable")})
+            return send_messages(connection, messages)
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", fail_for_user2):
+            send_email_job(self.job_execution_obj.pk)
+
+        self.job_execution_obj.refresh_from_db()
+        self.assertEqual(SendMailJobExecution.FAILED, self.job_execution_obj.status)
+        self.assertEqual("1 de 5 correos no fueron enviados", self.job_execution_obj.errorMessage)
+        recipient = self.job_execution_obj.recipients.get(status=SendMailRecipient.FAILED)
+        self.assertEqual("user2@op.com", recipient.email)
+        self.assertIn("mailbox unavailable", recipient.errorMessage)
+        self.assertEqual(4, len(mail.outbox))
+
+        # only recipients not sent are processed again
+        self.job_execution_obj.errorMessage = ""
+        self.job_execution_obj.save()
+        send_email_job(self.job_execution_obj.pk)
+        self.assertEqual(5, len(mail.outbox))
+        self.assertEqual(["user2@op.com"], mail.outbox[-1].to)
+        self.job_execution_obj.refresh_from_db()
+        self.assertEqual(SendMailJobExecution.FINISHED, self.job_execution_obj.status)
+
+    @override_settings(EMAIL_RATE_LIMIT=10)
+    def test_sending_is_throttled(self):
+        with mock.patch("rqworkers.tasks.time.sleep") as sleep_mock:
+            send_email_job(self.job_execution_obj.pk)
+
+        # one pause between each batch of two messages
+        self.assertEqual(2, sleep_mock.call_count)
+        for call in sleep_mock.call_args_list:
+            self.assertLessEqual(call.args[0], 0.2)
+
+
+@override_settings(NOTIFICATION_BATCH_SIZE=2)
+class SendNotificationEventsJobTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=op_program, title="Ruta {506}")
+        self.other_change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                              self.op1_contract_type, op=op_program)
+        self.connection = fakeredis.FakeStrictRedis()
+        patcher = mock.patch("rqworkers.digest.django_rq.get_connection", return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self):
+        with mock.patch("rqworkers.tasks.send_email_job.delay") as delay_mock:
+            delay_mock.return_value.id = uuid.uuid4()
+            with self.captureOnCommitCallbacks(execute=True):
+                send_notification_events_job()
+        return delay_mock
+
+    def test_events_are_sent_in_one_email_per_process(self):
+        User.objects.update(notification_frequency=User.NOTIFICATION_IMMEDIATE)
+        NotificationEvent.objects.add(NotificationEvent.STATUS_CHANGE, self.op1_contact_user, self.change_op_process,
+                                      "Estado cambió a {{ user.email }}")
+        NotificationEvent.objects.add(NotificationEvent.NEW_MESSAGE, self.op1_contact_user, self.change_op_process,
+                                      "Nuevo mensaje")
+        NotificationEvent.objects.add(NotificationEvent.NEW_MESSAGE, self.op2_contact_user,
+                                      self.other_change_op_process, "Nuevo mensaje")
+
+        delay_mock = self.drain()
+
+        self.assertFalse(NotificationEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(2, delay_mock.call_count)
+        job_execution_obj = SendMailJobExecution.objects.get(subject__contains="506")
+        # author of every change is not notified
+        self.assertListEqual([self.op2_contact_user], list(job_execution_obj.users.all()))
+        self.assertEqual(delay_mock.return_value.id, job_execution_obj.jobId)
+        other_job_execution_obj = SendMailJobExecution.objects.exclude(pk=job_execution_obj.pk).get()
+        self.assertListEqual([self.op1_contact_user], list(other_job_execution_obj.users.all()))
+
+        # text written by users is not rendered
+        send_email_job(job_execution_obj.pk)
+        self.assertEqual('Novedades en proceso de cambio de PO "Ruta {506}"', mail.outbox[0].subject)
+        self.assertIn("Estado cambió a {{ user.email }}", mail.outbox[0].body)
+        self.assertTrue(mail.outbox[0].body.startswith("Hola "))
+
+    def test_events_are_buffered_in_user_digest(self):
+        self.op1_contact_user.notification_frequency = User.NOTIFICATION_DAILY
+        self.op1_contact_user.save()
+        status_event = NotificationEvent.objects.add(NotificationEvent.STATUS_CHANGE, self.op2_contact_user,
+                                                     self.change_op_process, "Estado cambió")
+        message_event = NotificationEvent.objects.add(NotificationEvent.NEW_MESSAGE, self.op2_contact_user,
+                                                      self.other_change_op_process, "Nuevo mensaje")
+        self.drain()
+        # event is kept once when it is drained again
+        digest = NotificationDigest()
+        digest.add(self.op1_contact_user, [status_event])
+
+        self.assertFalse(SendMailJobExecution.objects.exists())
+        self.assertListEqual([status_event.pk, message_event.pk], digest.get_events(self.op1_contact_user.pk))
+        # op2 contact user is author of every event and flush job is scheduled once
+        self.assertListEqual([], digest.get_events(self.op2_contact_user.pk))
+        self.assertEqual(1, self.connection.zcard("rq:scheduled:default"))
+
+        # digest is not due yet
+        with mock.patch("rqworkers.tasks.send_email_job.delay") as delay_mock:
+            send_notification_digests_job()
+        delay_mock.assert_not_called()
+
+        now = timezone.now() + datetime.timedelta(days=1, minutes=1)
+        with mock.patch("rqworkers.tasks.timezone.now", return_value=now), \
+                mock.patch("rqworkers.tasks.send_email_job.delay") as delay_mock:
+            delay_mock.return_value.id = uuid.uuid4()
+            with self.captureOnCommitCallbacks(execute=True):
+                send_notification_digests_job()
+
+        job_execution_obj = SendMailJobExecution.objects.get()
+        delay_mock.assert_called_once_with(job_execution_obj.pk)
+        self.assertListEqual([self.op1_contact_user], list(job_execution_obj.users.all()))
+        self.assertEqual("Resumen de novedades en 2 procesos de cambio de PO", job_execution_obj.subject)
+        self.assertIn('Proceso "Ruta {% templatetag openbrace %}506{% templatetag closebrace %}":',
+                      job_execution_obj.body)
+        self.assertIn("Nuevo mensaje", job_execution_obj.body)
+        self.assertListEqual([], digest.get_events(self.op1_contact_user.pk))
+        self.assertEqual(0, self.connection.zcard(DUE_KEY))
+
+    def test_digest_is_scheduled_again_when_events_arrive_while_it_is_sent(self):
+        digest = NotificationDigest()
+        event = NotificationEvent.objects.add(NotificationEvent.STATUS_CHANGE, self.op2_contact_user,
+                                              self.change_op_process, "Estado cambió")
+        other_event = NotificationEvent.objects.add(NotificationEvent.NEW_MESSAGE, self.op2_contact_user,
+                                                    self.change_op_process, "Nuevo mensaje")
+        digest.add(self.op1_contact_user, [event])
+        digest.add(self.op1_contact_user, [other_event])
+
+        digest.remove(self.op1_contact_user.pk, [event.pk], User.NOTIFICATION_HOURLY)
+
+        self.assertListEqual([other_event.pk], digest.get_events(self.op1_contact_user.pk))
+        self.assertEqual(1, self.connection.zcard(DUE_KEY))
+        self.assertEqual(2, self.connection.zcard("rq:scheduled:default"))
+
+
+@override_settings(DEADLINE_REMINDER_DAYS=3, DEADLINE_SCAN_INTERVAL=3600)
+class ScanDeadlinesJobTest(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        op_program = self.create_operation_program('2022-01-01', OperationProgramType.BASE)
+        self.change_op_process = self.create_op_process(self.dtpm_viewer_user, self.op1_organization,
+                                                        self.op1_contract_type, op=op_program)
+        # deadlines are 120, 90, 28 and 0 days before release date
+        self.change_op_process.op_release_date = timezone.localdate() + datetime.timedelta(days=30)
+        self.change_op_process.save()
+        ChangeOPProcessDeadline.objects.update_deadlines(self.change_op_process)
+
+    def scan(self):
+        with mock.patch("rqworkers.tasks.send_email_job.delay") as delay_mock:
+            delay_mock.return_value.id = uuid.uuid4()
+            with self.captureOnCommitCallbacks(execute=True):
+                scan_deadlines_job(schedule=False)
+        return delay_mock
+
+    def test_reminders_and_breaches(self):
+        delay_mock = self.scan()
+
+        job_execution_obj = SendMailJobExecution.objects.get()
+        delay_mock.assert_called_once_with(job_execution_obj.pk)
+        self.assertSetEqual({self.dtpm_viewer_user, self.op1_contact_user, self.op2_contact_user},
+                            set(job_execution_obj.users.all()))
+        self.assertIn("Etapa 1: Admisibilidad: venció", job_execution_obj.body)
+        self.assertIn("Etapa 3: Revisión específica: vence", job_execution_obj.body)
+        self.assertNotIn("Etapa 4", job_execution_obj.body)
+        deadlines = self.change_op_process.deadlines.order_by("deadline")
+        self.assertListEqual([True, True, False, False], [deadline.breached_at is not None for deadline in deadlines])
+        self.assertListEqual([True, True, True, False], [deadline.reminded_at is not None for deadline in deadlines])
+
+        # deadlines are notified once
+        delay_mock = self.scan()
+        delay_mock.assert_not_called()
+        self.assertEqual(1, SendMailJobExecution.objects.count())
+
+    def test_deadlines_of_closed_process_are_not_scanned(self):
+        self.change_op_process.status = ChangeOPProcessStatus.objects.get(is_closed=True, name="Rechazado")
+        self.change_op_process.save()
+
+        delay_mock = self.scan()
+
+        delay_mock.assert_not_called()
+        deadlines = self.change_op_process.deadlines
+        self.assertFalse(deadlines.filter(breached_at__isnull=False).exists())
+        # deadlines met by scan are resolved, so they are not scanned again
+        self.assertListEqual([True, True, True, False],
+                             [deadline.resolved_at is not None for deadline in deadlines.order_by("deadline")])
+
+    def test_next_scan_is_scheduled_once(self):
+        connection = fakeredis.FakeStrictRedis()
+        with mock.patch("rqworkers.tasks.get_queue",
+                        side_effect=lambda name: django_rq.get_queue(name, connection=connection)), \
+                mock.patch("rqworkers.tasks.send_email_job.delay"):
+            scan_deadlines_job()
+            scan_deadlines_job()
+
+        self.assertEqual(1, connection.zcard("rq:scheduled:default"))
+        next_run = connection.zrange("rq:scheduled:default", 0, -1, withscores=True)[0][1]
+        self.assertEqual(0, next_run % 3600)
+
+
+@override_settings(JOB_EXECUTION_RETENTION_DAYS=30, JOB_EXECUTION_PURGE_BATCH_SIZE=2)
+class PurgeJobExecutionsJobTest(TestCase):
+
+    def test_old_executions_are_purged_in_batches(self):
+        user = User.objects.create(email="user@op.com")
+        now = timezone.now()
+        executions = []
+        for days in [40, 35, 31, 29, 1]:
+            job_execution_obj = SendMailJobExecution.objects.create(
+                enqueueTimestamp=now - datetime.timedelta(days=days), status=SendMailJobExecution.FINISHED,
+                subject="Aviso", body="Hola")
+            job_execution_obj.users.add(user)
+            SendMailRecipient.objects.create(jobExecution=job_execution_obj, user=user, email=user.email,
+                                             status=SendMailRecipient.SENT)
+            executions.append(job_execution_obj)
+
+        # two batches and the last transaction that finds nothing
+        with self.assertNumQueries(2 * 7 + 3):
+            self.assertEqual(3, purge_job_executions_job(schedule=False))
+
+        self.assertListEqual([execution.pk for execution in executions[3:]],
+                             list(SendMailJobExecution.objects.order_by("pk").values_list("pk", flat=True)))
+        self.assertEqual(2, SendMailRecipient.objects.count())
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+
+class OpctWorkerTest(TestCase):
+
+    def setUp(self):
+        self.connection = fakeredis.FakeStrictRedis()
+        self.queue = django_rq.get_queue("low", connection=self.connection)
+
+    def test_job_start_latency_is_recorded(self):
+        with mock.patch("rqworkers.opctWorker.connections.close_all"):
+            worker = OpctSimpleWorker([self.queue], connection=self.connection)
+        # file blob does not exist, job ends without doing anything
+        self.queue.enqueue("rqworkers.tasks.process_file_blob_job", 0)
+        self.queue.enqueue("rqworkers.tasks.process_file_blob_job", 0)
+
+        with mock.patch("rqworkers.opctWorker.close_old_connections") as close_old_connections_mock:
+            worker.work(burst=True, logging_level="WARNING")
+
+        self.assertEqual(4, close_old_connections_mock.call_count)
+        self.assertEqual(2, self.queue.finished_job_registry.count)
+        stats = get_latency_stats(self.connection, "low")
+        self.assertEqual(2, stats["count"])
+        self.assertGreaterEqual(stats["max"], stats["p50"])
+        self.assertIsNone(get_latency_stats(self.connection, "high"))
+
+
+@override_settings(RQ_MAX_RETRIES=2, RQ_RETRY_BACKOFF=10)
+class JobRetryTest(TestCase):
+
+    def setUp(self):
+        self.connection = fakeredis.FakeStrictRedis()
+        self.queue = django_rq.get_queue("high", connection=self.connection)
+        with mock.patch("rqworkers.opctWorker.connections.close_all"):
+            self.worker = OpctSimpleWorker([self.queue], connection=self.connection,
+                                           exception_handlers=[handle_job_exception])
+        self.user = User.objects.create(email="user@op.com", first_name="User")
+        self.job_execution_obj = SendMailJobExecution.objects.create(
+            enqueueTimestamp=timezone.now(), status=SendMailJobExecution.ENQUEUED, subject="Aviso", body="Hola")
+        self.job_execution_obj.users.add(self.user)
+
+    def enqueue(self):
+        rq_job = self.queue.enqueue(send_email_job, self.job_execution_obj.pk, retry=get_retry())
+        self.job_execution_obj.jobId = rq_job.id
+        self.job_execution_obj.save()
+        return rq_job
+
+    def work(self, error=None):
+        with mock.patch("rqworkers.opctWorker.close_old_connections"), \
+                mock.patch("rqworkers.tasks.get_connection", side_effect=error, wraps=mail.get_connection):
+            self.worker.work(burst=True, logging_level="CRITICAL")
+        self.job_execution_obj.refresh_from_db()
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        rq_job = self.enqueue()
+        self.assertEqual([10, 20], rq_job.retry_intervals)
+
+        self.work(SMTPConnectError(421, "service not available"))
+        self.assertEqual(SendMailJobExecution.ENQUEUED, self.job_execution_obj.status)
+        self.assertIn("SMTPConnectError", self.job_execution_obj.errorMessage)
+        self.assertEqual(1, self.queue.scheduled_job_registry.count)
+        self.assertEqual(SendMailRecipient.PENDING, self.job_execution_obj.recipients.get().status)
+
+        # retry is enqueued by scheduler
+        self.queue.scheduled_job_registry.remove(rq_job)
+        self.queue.enqueue_job(rq_job)
+        self.work()
+        self.assertEqual(SendMailJobExecution.FINISHED, self.job_execution_obj.status)
+        self.assertEqual(1, len(mail.outbox))
+
+    def test_timed_out_jobs_are_retried(self):
+        self.enqueue()
+        self.work(JobTimeoutException("Task exceeded maximum timeout value (180 seconds)"))
+
+        self.assertEqual(SendMailJobExecution.ENQUEUED, self.job_execution_obj.status)
+        self.assertIn("JobTimeoutException", self.job_execution_obj.errorMessage)
+        self.assertEqual(1, self.queue.scheduled_job_registry.count)
+
+    def test_killed_work_horse_updates_execution(self):
+        rq_job = self.enqueue()
+        self.job_execution_obj.status = SendMailJobExecution.RUNNING
+        self.job_execution_obj.save()
+        rq_job.retries_left = 0
+
+        # worker handles the failure after the horse died, there is no exception and handlers are not called
+        with mock.patch("rqworkers.opctWorker.connections.close_all"):
+            self.worker.handle_job_failure(rq_job, self.queue, exc_string="Work-horse was terminated unexpectedly")
+
+        self.job_execution_obj.refresh_from_db()
+        self.assertEqual(SendMailJobExecution.FAILED, self.job_execution_obj.status)
+        self.assertEqual("Work-horse was terminated unexpectedly", self.job_execution_obj.errorMessage)
+        self.assertEqual(1, self.queue.failed_job_registry.count)
+
+    def test_permanent_errors_go_to_failed_jobs_until_they_are_requeued(self):
+        self.enqueue()
+        self.work(ValueError("wrong backend"))
+        self.assertEqual(SendMailJobExecution.FAILED, self.job_execution_obj.status)
+        self.assertEqual("ValueError: wrong backend", self.job_execution_obj.errorMessage)
+        self.assertIsNotNone(self.job_execution_obj.executionEnd)
+        self.assertEqual(0, self.queue.scheduled_job_registry.count)
+        self.assertEqual(1, self.queue.failed_job_registry.count)
+
+        get_queue = django_rq.get_queue
+        with mock.patch("rqworkers.management.commands.requeuejobs.django_rq.get_queue",
+                        side_effect=lambda name: get_queue(name, connection=self.connection)):
+            stdout = io.StringIO()
+            call_command("requeuejobs", "high", "--list", stdout=stdout)
+            self.assertIn("ValueError: wrong backend", stdout.getvalue())
+            call_command("requeuejobs", stdout=io.StringIO())
+
+        self.assertEqual(0, self.queue.failed_job_registry.count)
+        self.job_execution_obj.refresh_from_db()
+        self.assertEqual(SendMailJobExecution.ENQUEUED, self.job_execution_obj.status)
+        self.work()
+        self.assertEqual(SendMailJobExecution.FINISHED, self.job_execution_obj.status)
+        self.assertEqual("", self.job_execution_obj.errorMessage)
+
+
+class RunWorkersCommandTest(SimpleTestCase):
+
+    @override_settings(RQ_WORKER_QUEUES=[["high"], ["high", "default", "low"]],
+                       RQ_WORKER_CLASS="rqworkers.opctWorker.OpctWorker")
+    def test_workers_are_started_again_until_command_is_stopped(self):
+        handlers = dict()
+        processes = [mock.Mock(pid=index) for index in range(3)]
+        processes[0].is_alive.side_effect = [False, False]
+        processes[1].is_alive.return_value = True
+        processes[2].is_alive.return_value = True
+
+        def sleep(seconds):
+            handlers[signal.SIGTERM](signal.SIGTERM, None)
+
+        with mock.patch("rqworkers.management.commands.runworkers.multiprocessing.Process",
+                        side_effect=processes) as process_mock, \
+                mock.patch("rqworkers.management.commands.runworkers.signal.signal",
+                           side_effect=lambda signum, handler: handlers.update({signum: handler})), \
+                mock.patch("rqworkers.management.commands.runworkers.time.sleep", side_effect=sleep), \
+                mock.patch("rqworkers.management.commands.runworkers.get_connection",
+                           return_value=fakeredis.FakeStrictRedis()):
+            call_command("runworkers", stdout=io.StringIO(), stderr=io.StringIO())
+
+        # one process is kept for urgent jobs, it is started again with the same queues
+        self.assertEqual([["high"], ["high", "default", "low"], ["high"]],
+                         [call.kwargs["args"][0] for call in process_mock.call_args_list])
+        self.assertEqual("rqworkers.opctWorker.OpctWorker", process_mock.call_args.kwargs["args"][1])
+        processes[1].terminate.assert_called_once()
+        processes[2].terminate.assert_called_once()
+        for process in processes[1:]:
+            process.join.assert_called_once()
+
+    def test_jobs_of_old_queues_are_moved(self):
+        connection = fakeredis.FakeStrictRedis()
+        legacy_queue = Queue("email_sender", connection=connection)
+        legacy_queue.enqueue(send_email_job, 1)
+        next_run = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+        legacy_queue.enqueue_at(next_run, scan_deadlines_job, job_id="scan-deadlines-1893456000")
+        Queue("attachments", connection=connection).enqueue("rqworkers.tasks.process_file_blob_job", 1)
+
+        get_queue = django_rq.get_queue
+        with mock.patch("rqworkers.jobs.get_queue",
+                        side_effect=lambda name, connection: get_queue(name, connection=connection)):
+            self.assertEqual(3, len(move_legacy_jobs(connection)))
+
+        self.assertEqual(0, legacy_queue.count + legacy_queue.scheduled_job_registry.count)
+        self.assertEqual(["rqworkers.tasks.send_email_job"],
+                         [rq_job.func_name for rq_job in Queue("high", connection=connection).get_jobs()])
+        self.assertEqual(["rqworkers.tasks.process_file_blob_job"],
+                         [rq_job.func_name for rq_job in Queue("low", connection=connection).get_jobs()])
+        registry = Queue("default", connection=connection).scheduled_job_registry
+        self.assertEqual(["scan-deadlines-1893456000"], registry.get_job_ids())
+        self.assertEqual(next_run, registry.get_scheduled_time("scan-deadlines-1893456000"))
+        self.assertEqual("default", Job.fetch("scan-deadlines-1893456000", connection=connection).origin)